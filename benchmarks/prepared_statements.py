@@ -0,0 +1,102 @@
+"""
+Compare rebuilding hot queries on every call with prebuilt statements, with and
+without psycopg server-side prepared statements.
+
+Runs against DB_URL (an initialized database, e.g. after `mini-leaderboard init`)
+and leaves a few rows under the `bench-prepared` project behind:
+
+    python benchmarks/prepared_statements.py --calls 5000
+"""
+
+from __future__ import annotations
+
+import re
+import time
+
+import click
+from sqlalchemy import create_engine, func, select, text
+
+from mini_leaderboard.config import get_config
+from mini_leaderboard.controllers.leaderboard import DEFAULT_ORDER, RANKINGS
+from mini_leaderboard.controllers.vote import _ITEM_VOTE
+from mini_leaderboard.orm import Leaderboard, Vote
+
+PROJECT_ID = "bench-prepared"
+
+
+def rebuilt_item_vote(item_id: str):
+    return select(func.coalesce(func.sum(Vote.vote_count), 0)).where(
+        Vote.project_id == PROJECT_ID, Vote.item_id == item_id
+    ), {}
+
+
+def prebuilt_item_vote(item_id: str):
+    return _ITEM_VOTE, {"project_id": PROJECT_ID, "item_id": item_id}
+
+
+def rebuilt_first_page(page_size: int):
+    return (
+        select(Leaderboard)
+        .where(Leaderboard.project_id == PROJECT_ID)
+        .order_by(Leaderboard.score.desc(), Leaderboard.id_)
+        .limit(page_size + 1)
+    ), {}
+
+
+def prebuilt_first_page(page_size: int):
+    return RANKINGS[DEFAULT_ORDER].first_page, {"project_id": PROJECT_ID, "limit": page_size + 1}
+
+
+def planning_ms(connection, statement, params) -> float:
+    """Planning time Postgres spends on one unprepared execution of statement"""
+    sql = statement.params(params).compile(connection, compile_kwargs={"literal_binds": True})
+    plan = connection.exec_driver_sql(f"EXPLAIN (ANALYZE, SUMMARY) {sql}").scalars().all()
+    return float(re.search(r"Planning Time: ([\d.]+) ms", "\n".join(plan)).group(1))
+
+
+@click.command()
+@click.option("--calls", type=click.IntRange(min=1), default=2000)
+def main(calls):
+    db_url = get_config().get_db_url()
+    setup = create_engine(db_url)
+    with setup.begin() as connection:
+        connection.execute(text("DELETE FROM leaderboard WHERE project_id = :p"), {"p": PROJECT_ID})
+        connection.execute(text("DELETE FROM vote WHERE project_id = :p"), {"p": PROJECT_ID})
+        connection.execute(
+            Leaderboard.__table__.insert(),
+            [{"project_id": PROJECT_ID, "name": f"user-{i}", "score": i} for i in range(1000)],
+        )
+        connection.execute(
+            Vote.__table__.insert(),
+            [{"project_id": PROJECT_ID, "item_id": f"item-{i}", "vote_count": i} for i in range(1000)],
+        )
+        click.echo(
+            "Planning per unprepared execution: "
+            f"item vote {planning_ms(connection, *prebuilt_item_vote('item-1')):.3f}ms, "
+            f"first page {planning_ms(connection, *prebuilt_first_page(100)):.3f}ms"
+        )
+    setup.dispose()
+
+    cases = [
+        ("item vote", rebuilt_item_vote, prebuilt_item_vote, lambda i: f"item-{i % 1000}"),
+        ("first page", rebuilt_first_page, prebuilt_first_page, lambda i: 100),
+    ]
+    click.echo(f"{'query':<12}{'statement':<10}{'prepare':<10}{'us/call':>10}")
+    for threshold in (None, 0):
+        engine = create_engine(db_url, connect_args={"prepare_threshold": threshold})
+        with engine.connect() as connection:
+            for name, rebuilt, prebuilt, arg in cases:
+                for label, build in (("rebuilt", rebuilt), ("prebuilt", prebuilt)):
+                    # Warm up the compiled cache and the prepared statement
+                    for i in range(50):
+                        connection.execute(*build(arg(i))).all()
+                    started = time.perf_counter()
+                    for i in range(calls):
+                        connection.execute(*build(arg(i))).all()
+                    elapsed = (time.perf_counter() - started) / calls * 1e6
+                    click.echo(f"{name:<12}{label:<10}{'off' if threshold is None else 'on':<10}{elapsed:>10.1f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
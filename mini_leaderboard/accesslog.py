@@ -0,0 +1,67 @@
+"""
+Sampled access log, replacing uvicorn's per-request access log.
+
+Successful requests are logged at `ACCESS_LOG_SAMPLE_RATE`; failed requests
+(status 400 and above), requests that raised and requests slower than
+`SLOW_REQUEST_MS` are always logged. Each record carries the method, path,
+status, duration, client and request ID as bound fields, which the JSON log
+format writes out as structured data.
+"""
+
+from __future__ import annotations
+
+import random
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from mini_leaderboard.config import get_config
+from mini_leaderboard.log import logger
+from mini_leaderboard.tracing import get_request_id
+
+
+class AccessLogMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        except BaseException:
+            status = 500
+            raise
+        finally:
+            log_request(scope, status, (time.perf_counter() - started) * 1000)
+
+
+def log_request(scope: Scope, status: int, duration_ms: float) -> None:
+    config = get_config()
+    slow = duration_ms >= config.slow_request_ms
+    if status < 400 and not slow and random.random() >= config.access_log_sample_rate:  # noqa: S311
+        return
+
+    client = scope.get("client")
+    method, path = scope["method"], scope["path"]
+    level = "ERROR" if status >= 500 else "WARNING" if status >= 400 or slow else "INFO"
+    logger.bind(
+        access=True,
+        method=method,
+        path=path,
+        status=status,
+        duration_ms=round(duration_ms, 3),
+        client=client[0] if client else None,
+        request_id=get_request_id(),
+    ).log(level, f'"{method} {path}" {status} {duration_ms:.1f}ms')
@@ -0,0 +1,169 @@
+"""
+Admission control in front of the database-bound API routes.
+
+Reads (GET) and writes (other methods) each get a budget of concurrent requests
+that together match the connection pool, `db_pool_size + db_max_overflow`, so
+admitted requests do not queue on the pool. Requests over budget wait in a
+bounded FIFO queue for at most `admission_timeout` seconds. When the queue is
+full or the wait times out, they get a 503 with `Retry-After` right away instead
+of timing out on the pool with a 500.
+
+Subscriptions hold no connection while streaming, so they only take a read slot
+for their initial snapshot, see `read_slot`. The admin routes are not limited.
+Queue depths are served by `GET /api/v1/admin/admission`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+from collections import deque
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager, suppress
+
+try:
+    from functools import cache
+except ImportError:
+    from functools import lru_cache as cache
+
+from starlette.responses import Response
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from mini_leaderboard.config import Config, get_config
+from mini_leaderboard.routers.api.params import AdmissionStats
+
+LIMITED_PREFIX = "/api/v1/"
+UNLIMITED_PREFIXES = ("/api/v1/admin/",)
+UNLIMITED_SUFFIXES = ("/subscribe",)
+
+
+class AdmissionLimiter:
+    """Semaphore with a bounded FIFO wait queue and a wait deadline"""
+
+    def __init__(self, slots: int, queue_size: int, timeout: float):
+        self.slots = slots
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> bool:
+        """Take a slot, returns False when the queue is full or the wait timed out"""
+        if self.active < self.slots and not self._waiters:
+            self.active += 1
+            return True
+        if len(self._waiters) >= self.queue_size:
+            self.rejected += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.timeout)
+        except BaseException as e:
+            with suppress(ValueError):
+                self._waiters.remove(waiter)
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over while giving up, pass it on
+                self.release()
+            if isinstance(e, asyncio.TimeoutError):
+                self.timed_out += 1
+                return False
+            raise
+        return True
+
+    def release(self) -> None:
+        """Hand the slot to the oldest waiter, or free it"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> AdmissionStats:
+        return AdmissionStats(
+            slots=self.slots,
+            active=self.active,
+            queued=self.queued,
+            rejected=self.rejected,
+            timed_out=self.timed_out,
+        )
+
+
+@cache
+def get_admission_limiters(config: Config) -> tuple[AdmissionLimiter, AdmissionLimiter]:
+    """Read and write limiters sharing the connection pool"""
+    capacity = config.db_pool_size + config.db_max_overflow
+    write_slots = config.admission_write_slots or max(1, capacity // 2)
+    read_slots = max(1, capacity - write_slots)
+    return (
+        AdmissionLimiter(read_slots, config.admission_queue_size, config.admission_timeout),
+        AdmissionLimiter(write_slots, config.admission_queue_size, config.admission_timeout),
+    )
+
+
+@asynccontextmanager
+async def read_slot(config: Config) -> AsyncGenerator[bool, None]:
+    """
+    Hold a read slot for database work outside a limited request, yields False when
+    none was free in time.
+    """
+    if not config.admission_control:
+        yield True
+        return
+    read, _ = get_admission_limiters(config)
+    if not await read.acquire():
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        read.release()
+
+
+def is_limited(path: str) -> bool:
+    return (
+        path.startswith(LIMITED_PREFIX)
+        and not path.startswith(UNLIMITED_PREFIXES)
+        and not path.endswith(UNLIMITED_SUFFIXES)
+    )
+
+
+class AdmissionMiddleware:
+    """
+    Hold a read or write slot for the whole request, including the response body.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not is_limited(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        config = get_config()
+        if not config.admission_control:
+            await self.app(scope, receive, send)
+            return
+
+        read, write = get_admission_limiters(config)
+        limiter = read if scope["method"] in ("GET", "HEAD") else write
+        if not await limiter.acquire():
+            response = Response(
+                status_code=503,
+                content="Server is busy, retry later.",
+                headers={"Retry-After": str(max(1, math.ceil(config.admission_timeout)))},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
@@ -56,6 +56,9 @@ def run_migrations_offline():
         dialect_opts={"paramstyle": "named"},
         compare_type=True,
         compare_server_default=True,
+        # Committed one by one, so a migration can leave its transaction for
+        # `autocommit_block` (e.g. CREATE INDEX CONCURRENTLY) without committing others
+        transaction_per_migration=True,
     )
 
     with context.begin_transaction():
@@ -68,7 +71,14 @@ def run_migrations_online():
     In this scenario we need to create an Engine
     and associate a connection with the context.
 
+    A connection passed in by `dbutils.upgrade_in_place` is reused as is.
+
     """
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        run_migrations(connection)
+        return
+
     connectable = engine_from_config(
         config.get_section(config.config_ini_section),
         prefix="sqlalchemy.",
@@ -77,16 +87,23 @@ def run_migrations_online():
     )
 
     with connectable.connect() as connection:
-        context.configure(
-            connection=connection,
-            include_object=include_object,
-            target_metadata=target_metadata,
-            compare_type=True,
-            compare_server_default=True,
-        )
-
-        with context.begin_transaction():
-            context.run_migrations()
+        run_migrations(connection)
+
+
+def run_migrations(connection):
+    context.configure(
+        connection=connection,
+        include_object=include_object,
+        target_metadata=target_metadata,
+        compare_type=True,
+        compare_server_default=True,
+        # Committed one by one, so a migration can leave its transaction for
+        # `autocommit_block` (e.g. CREATE INDEX CONCURRENTLY) without committing others
+        transaction_per_migration=True,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
 
 
 if context.is_offline_mode():
@@ -0,0 +1,78 @@
+"""native uuid ids
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19 16:52:10.318204
+
+Converts `leaderboard.leaderboard_id` and `messageboard.message_id` from hex text
+to `uuid` without rewriting the tables under an exclusive lock, in two revisions.
+This one expands, it can run while workers of the previous release serve:
+
+1. a nullable uuid column is added, and a trigger fills it for new rows;
+2. existing rows are backfilled in batches, each committed on its own;
+3. its unique index is built with CREATE INDEX CONCURRENTLY and NOT NULL is proven
+   by a CHECK constraint validated without blocking writes.
+
+0011 then swaps the columns. The previous release binds ids as varchar, which
+fails against uuid, and this release binds uuids, which fail against text, so
+deploy in this order: upgrade to 0010 with the previous release serving, stop it,
+upgrade to head (one short transaction) and start this release.
+
+"""
+
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "0010"
+down_revision: Union[str, None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 10_000
+ID_COLUMNS = (("leaderboard", "leaderboard_id"), ("messageboard", "message_id"))
+
+
+def add_uuid_column(table: str, column: str) -> None:
+    new = f"{column}_uuid"
+    sync = f"{table}_{new}_sync"
+    not_null = f"ck_{table}_{new}_not_null"
+
+    op.add_column(table, sa.Column(new, postgresql.UUID(), nullable=True))
+    op.execute(
+        f"CREATE FUNCTION {sync}() RETURNS trigger LANGUAGE plpgsql AS "
+        f"$$ BEGIN NEW.{new} := NEW.{column}::uuid; RETURN NEW; END $$"
+    )
+    op.execute(
+        f"CREATE TRIGGER {sync} BEFORE INSERT OR UPDATE OF {column} ON {table} FOR EACH ROW EXECUTE FUNCTION {sync}()"
+    )
+
+    rows = sa.table(table, sa.column("id_"), sa.column(column), sa.column(new))
+    backfill = sa.update(rows).values({new: sa.cast(rows.c[column], postgresql.UUID())})
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        max_id = bind.execute(sa.select(sa.func.max(rows.c.id_))).scalar() or 0
+        for start in range(0, max_id, BATCH_SIZE):
+            bind.execute(backfill.where(rows.c.id_ > start, rows.c.id_ <= start + BATCH_SIZE, rows.c[new].is_(None)))
+        op.execute(f"CREATE UNIQUE INDEX CONCURRENTLY ix_{table}_{new} ON {table} ({new})")
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {not_null} CHECK ({new} IS NOT NULL) NOT VALID")
+        op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {not_null}")
+
+
+def upgrade() -> None:
+    for table, column in ID_COLUMNS:
+        add_uuid_column(table, column)
+
+
+def downgrade() -> None:
+    for table, column in ID_COLUMNS:
+        new = f"{column}_uuid"
+        sync = f"{table}_{new}_sync"
+        op.execute(f"DROP TRIGGER {sync} ON {table}")
+        op.execute(f"DROP FUNCTION {sync}()")
+        # Also drops its index and CHECK constraint
+        op.drop_column(table, new)
@@ -0,0 +1,68 @@
+"""native uuid ids swap
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19 16:53:02.541837
+
+Replaces the hex text ids by the uuid columns 0010 added and backfilled, in one
+short transaction. Workers of the previous release fail against the result, see
+0010 for the deploy order.
+
+"""
+
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0011"
+down_revision: Union[str, None] = "0010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ID_COLUMNS = (("leaderboard", "leaderboard_id"), ("messageboard", "message_id"))
+
+
+def upgrade() -> None:
+    for table, column in ID_COLUMNS:
+        new = f"{column}_uuid"
+        sync = f"{table}_{new}_sync"
+        not_null = f"ck_{table}_{new}_not_null"
+
+        op.execute(f"DROP TRIGGER {sync} ON {table}")
+        op.execute(f"DROP FUNCTION {sync}()")
+        # Also drops ix_{table}_{column}
+        op.drop_column(table, column)
+        op.alter_column(table, new, new_column_name=column)
+        # Skips the table scan thanks to the validated CHECK constraint
+        op.alter_column(table, column, nullable=False)
+        op.drop_constraint(not_null, table, type_="check")
+        op.execute(f"ALTER INDEX ix_{table}_{new} RENAME TO ix_{table}_{column}")
+
+
+def downgrade() -> None:
+    # Back to the state 0010 left, rewriting the tables
+    for table, column in ID_COLUMNS:
+        new = f"{column}_uuid"
+        sync = f"{table}_{new}_sync"
+        not_null = f"ck_{table}_{new}_not_null"
+
+        op.alter_column(table, column, new_column_name=new)
+        op.execute(f"ALTER INDEX ix_{table}_{column} RENAME TO ix_{table}_{new}")
+        op.add_column(table, sa.Column(column, sa.Text(), nullable=True))
+        rows = sa.table(table, sa.column(column), sa.column(new))
+        op.execute(sa.update(rows).values({column: sa.func.replace(sa.cast(rows.c[new], sa.Text()), "-", "")}))
+        op.alter_column(table, column, nullable=False)
+        op.create_index(f"ix_{table}_{column}", table, [column], unique=True)
+        op.alter_column(table, new, nullable=True)
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {not_null} CHECK ({new} IS NOT NULL)")
+        op.execute(
+            f"CREATE FUNCTION {sync}() RETURNS trigger LANGUAGE plpgsql AS "
+            f"$$ BEGIN NEW.{new} := NEW.{column}::uuid; RETURN NEW; END $$"
+        )
+        op.execute(
+            f"CREATE TRIGGER {sync} BEFORE INSERT OR UPDATE OF {column} ON {table} "
+            f"FOR EACH ROW EXECUTE FUNCTION {sync}()"
+        )
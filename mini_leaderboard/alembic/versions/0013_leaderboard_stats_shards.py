@@ -0,0 +1,54 @@
+"""leaderboard stats shards
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-19 17:20:41.502913
+
+"""
+
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0013"
+down_revision: Union[str, None] = "0012"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing rows become shard 0
+    op.add_column("leaderboard_stats", sa.Column("shard", sa.Integer(), server_default="0", nullable=False))
+    op.drop_constraint("leaderboard_stats_pkey", "leaderboard_stats", type_="primary")
+    op.create_primary_key("leaderboard_stats_pkey", "leaderboard_stats", ["project_id", "shard"])
+    op.add_column("leaderboard_histogram", sa.Column("shard", sa.Integer(), server_default="0", nullable=False))
+    op.drop_constraint("leaderboard_histogram_pkey", "leaderboard_histogram", type_="primary")
+    op.create_primary_key("leaderboard_histogram_pkey", "leaderboard_histogram", ["project_id", "bucket", "shard"])
+
+
+def downgrade() -> None:
+    # Replace the shards of each project by their sum
+    op.execute(
+        """
+        INSERT INTO leaderboard_stats (project_id, shard, count, total, min_score, max_score)
+        SELECT project_id, -1, sum(count), sum(total), min(min_score), max(max_score)
+        FROM leaderboard_stats GROUP BY project_id
+        """
+    )
+    op.execute("DELETE FROM leaderboard_stats WHERE shard <> -1")
+    op.execute(
+        """
+        INSERT INTO leaderboard_histogram (project_id, bucket, shard, count)
+        SELECT project_id, bucket, -1, sum(count) FROM leaderboard_histogram GROUP BY project_id, bucket
+        """
+    )
+    op.execute("DELETE FROM leaderboard_histogram WHERE shard <> -1")
+    op.drop_constraint("leaderboard_histogram_pkey", "leaderboard_histogram", type_="primary")
+    op.drop_column("leaderboard_histogram", "shard")
+    op.create_primary_key("leaderboard_histogram_pkey", "leaderboard_histogram", ["project_id", "bucket"])
+    op.drop_constraint("leaderboard_stats_pkey", "leaderboard_stats", type_="primary")
+    op.drop_column("leaderboard_stats", "shard")
+    op.create_primary_key("leaderboard_stats_pkey", "leaderboard_stats", ["project_id"])
@@ -1,12 +1,28 @@
 from __future__ import annotations
 
+import json
+import math
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Response
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
+from mini_leaderboard.accesslog import AccessLogMiddleware
+from mini_leaderboard.admission import AdmissionMiddleware
+from mini_leaderboard.caller import get_caller
 from mini_leaderboard.config import get_config
+from mini_leaderboard.controllers.form import init_form_queue
+from mini_leaderboard.controllers.vote import run_vote_folder
 from mini_leaderboard.dbutils import init_engine
+from mini_leaderboard.encoding import EncodingMiddleware
+from mini_leaderboard.idempotency import run_idempotency_cleanup
+from mini_leaderboard.live import init_broadcaster
+from mini_leaderboard.querylog import run_query_explainer
+from mini_leaderboard.ratelimit import get_write_limiter
+from mini_leaderboard.sketch import run_sketch_flusher
+from mini_leaderboard.tracing import TracingMiddleware, run_trace_exporter, span
+from mini_leaderboard.warmup import is_ready, run_warmup
 
 from .routers.api.v1 import routers as v1_routers
 
@@ -14,7 +30,17 @@ from .routers.api.v1 import routers as v1_routers
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     config = get_config()
-    async with init_engine(config):
+    async with (
+        init_engine(config),
+        run_vote_folder(config),
+        run_idempotency_cleanup(config),
+        init_form_queue(config),
+        run_sketch_flusher(config),
+        init_broadcaster(config),
+        run_trace_exporter(config),
+        run_query_explainer(config),
+        run_warmup(config),
+    ):
         yield
 
 
@@ -28,14 +54,72 @@ app.add_middleware(
     allow_methods=["*"],  # Allow all HTTP methods (GET, POST, PUT, DELETE, etc.)
     allow_headers=["*"],  # Allow all headers
 )
+# Inside the function middlewares below, which re-stream response bodies in chunks
+app.add_middleware(EncodingMiddleware)
+
+
+# Write endpoints guarded by the rate limiter, mapped to whether they carry an item_id
+LIMITED_WRITE_PATHS = {
+    "/api/v1/vote/add": True,
+    "/api/v1/leaderboard/add": False,
+    "/api/v1/messageboard/add": False,
+    "/api/v1/form/submit": False,
+}
+
+
+@app.middleware("http")
+async def limit_writes(request: Request, call_next):
+    with span("middleware limit_writes"):
+        return await _limit_writes(request, call_next)
+
+
+async def _limit_writes(request: Request, call_next):
+    if request.method != "POST" or request.url.path not in LIMITED_WRITE_PATHS:
+        return await call_next(request)
+    config = get_config()
+    limiter = get_write_limiter(config)
+    if not limiter.enabled:
+        return await call_next(request)
+
+    try:
+        body = json.loads(await request.body())
+    except ValueError:
+        # Leave it to the endpoint validation
+        return await call_next(request)
+    if not isinstance(body, dict):
+        return await call_next(request)
+
+    client = get_caller(request, config)
+    project_id = body.get("project_id")
+    project_id = project_id if isinstance(project_id, str) else None
+    item_id = body.get("item_id") if LIMITED_WRITE_PATHS[request.url.path] else None
+    item_id = item_id if isinstance(item_id, str) else None
+    rejected = limiter.check(client=client, project_id=project_id, item_id=item_id)
+    if rejected:
+        reason, retry_after = rejected
+        return Response(status_code=429, content=reason, headers={"Retry-After": str(math.ceil(retry_after))})
+    if project_id is None or item_id is None:
+        return await call_next(request)
+    recorded = False
+    try:
+        response = await call_next(request)
+        recorded = 200 <= response.status_code < 300
+    finally:
+        limiter.finish_vote(client, project_id, item_id, recorded)
+    return response
 
 
 @app.middleware("http")
 async def verify_token(request, call_next):
+    with span("middleware verify_token"):
+        return await _verify_token(request, call_next)
+
+
+async def _verify_token(request, call_next):
     if request.method == "OPTIONS":
         return await call_next(request)
 
-    if request.url.path == "/" or request.url.path == "/docs" or request.url.path == "/openapi.json":
+    if request.url.path in ("/", "/ready", "/docs", "/openapi.json"):
         return await call_next(request)
     config = get_config()
     if not config.api_token:
@@ -50,10 +134,28 @@ async def verify_token(request, call_next):
     )
 
 
+# Ahead of the function middlewares, so shed requests are not parsed or authenticated
+app.add_middleware(AdmissionMiddleware)
+# Inside the tracing middleware to log the request ID, outside admission to log shed requests
+app.add_middleware(AccessLogMiddleware)
+# Outermost, so the root span covers every other middleware
+app.add_middleware(TracingMiddleware)
+
+
 @app.get("/")
 async def hello():
     return {"message": "Hello World"}
 
 
+@app.get("/ready")
+async def ready():
+    """
+    Readiness probe, 503 until the startup warm-up finished.
+    """
+    if not is_ready():
+        return JSONResponse({"ready": False}, status_code=503)
+    return {"ready": True}
+
+
 for router in v1_routers:
     app.include_router(router)
@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+from fastapi import Depends, Request
+
+from mini_leaderboard.config import Config, get_config
+
+
+def get_caller(request: Request, config: Config = Depends(get_config)) -> str:
+    """
+    Who sent the request: the client named by `client_id_header`, otherwise the
+    client address.
+
+    The bearer token is not used, `API_TOKEN` is shared by all clients.
+
+    Also for fastapi dependency injection
+    """
+    if config.client_id_header and (client := request.headers.get(config.client_id_header)):
+        # A proxy appends the address it saw to a list
+        return f"client:{client.rsplit(',', 1)[-1].strip()}"
+    return f"client:{request.client.host if request.client else 'unknown'}"
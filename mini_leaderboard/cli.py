@@ -1,10 +1,12 @@
+from pathlib import Path
+
 import click
-import uvicorn
 
 from mini_leaderboard.config import get_config
-from mini_leaderboard.dbutils import drop_all_data, upgrade_in_place
+from mini_leaderboard.importer import DEFAULT_CHUNK_SIZE, IMPORT_TABLES, ImportRowError, import_file
 
-from .app import app
+# uvicorn, the app and dbutils (sqlalchemy, alembic, fastapi) are imported inside
+# the commands that need them, so every command only pays for its own imports.
 
 
 @click.command()
@@ -14,7 +16,14 @@ def start(host, port):
     """
     Start the server.
     """
-    uvicorn.run(app, host=host, port=port, timeout_graceful_shutdown=60)
+    import uvicorn
+
+    from mini_leaderboard.app import app
+    from mini_leaderboard.log import setup_server_logging
+
+    setup_server_logging()
+    # Requests are logged by mini_leaderboard.accesslog
+    uvicorn.run(app, host=host, port=port, timeout_graceful_shutdown=60, access_log=False)
 
 
 @click.command()
@@ -22,6 +31,8 @@ def init():
     """
     Init and upgrade the database.
     """
+    from mini_leaderboard.dbutils import upgrade_in_place
+
     config = get_config()
     upgrade_in_place(config.get_db_url())
 
@@ -42,11 +53,124 @@ def drop(yes):
     if not yes:
         click.confirm("Are you sure you want to drop all data?", abort=True)
 
+    from mini_leaderboard.dbutils import drop_all_data
+
     click.echo("Dropping all data...")
 
     config = get_config()
     drop_all_data(config.get_db_url())
 
 
+@click.command(name="import")
+@click.option("--table", type=click.Choice(sorted(IMPORT_TABLES)), required=True)
+@click.option(
+    "--file",
+    "file_",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    required=True,
+)
+@click.option(
+    "--format",
+    "format_",
+    type=click.Choice(["csv", "ndjson"]),
+    default=None,
+    help="File format, guessed from the file extension if omitted.",
+)
+@click.option("--chunk-size", type=click.IntRange(min=1), default=DEFAULT_CHUNK_SIZE)
+@click.option("--skip-invalid", is_flag=True, default=False, help="Skip rows that fail validation.")
+def import_(table, file_, format_, chunk_size, skip_invalid):
+    """
+    Bulk import CSV or NDJSON rows with PostgreSQL COPY.
+    """
+
+    def on_progress(imported, skipped):
+        click.echo(f"{table}: {imported} rows imported, {skipped} skipped", err=True)
+
+    config = get_config()
+    try:
+        imported, skipped = import_file(
+            config.get_db_url(),
+            table,
+            file_,
+            format_=format_,
+            chunk_size=chunk_size,
+            skip_invalid=skip_invalid,
+            on_progress=on_progress,
+        )
+    except ImportRowError as e:
+        raise click.ClickException(str(e)) from e
+    click.echo(f"Done: {imported} rows imported into {table}, {skipped} skipped")
+
+
+@click.command(name="rebuild-stats")
+@click.option("--project-id", "project_ids", multiple=True, help="Project to rebuild, all projects if omitted.")
+def rebuild_stats(project_ids):
+    """
+    Rebuild leaderboard score statistics and rank sketches from the stored entries.
+    """
+    from mini_leaderboard import stats
+
+    config = get_config()
+    stats.rebuild_stats(config.get_db_url(), list(project_ids) or None, config.sketch_k)
+    click.echo("Done")
+
+
+@click.command()
+@click.argument("path")
+@click.option("--method", type=click.Choice(["GET", "POST", "PUT", "DELETE"]), default="GET")
+@click.option("--param", "params", multiple=True, help="Query parameter as key=value, may be repeated.")
+@click.option("--json", "body", default=None, help="JSON request body.")
+@click.option("--project-id", default="profile", help="Project to seed, sent as project_id unless --param sets it.")
+@click.option(
+    "--seed", type=click.IntRange(min=0), default=None, help="Replace the project's data with N rows per table."
+)
+@click.option("--requests", "requests_", type=click.IntRange(min=1), default=200)
+@click.option("--warmup", type=click.IntRange(min=0), default=20)
+@click.option("--top", type=click.IntRange(min=1), default=10, help="Allocation sites and functions to show.")
+@click.option(
+    "--cprofile", "cprofile_path", type=click.Path(dir_okay=False), default=None, help="Also dump a cProfile."
+)
+def profile(path, method, params, body, project_id, seed, requests_, warmup, top, cprofile_path):
+    """
+    Profile the memory one endpoint allocates and retains per request.
+
+    Runs the app in-process against DB_URL, e.g.
+
+        mini-leaderboard profile /api/v1/vote/list --seed 10000 --param page_size=1000
+    """
+    import asyncio
+    import json
+
+    from mini_leaderboard.app import app
+    from mini_leaderboard.profiling import profile_endpoint, seed_project
+
+    # A bare key is sent with an empty value
+    query = [param.partition("=")[::2] for param in params]
+    if method == "GET" and "project_id" not in {key for key, _ in query}:
+        query.append(("project_id", project_id))
+
+    config = get_config()
+    if seed is not None:
+        seed_project(config.get_db_url(), project_id, seed, config.sketch_k)
+    report = asyncio.run(
+        profile_endpoint(
+            app,
+            method,
+            path,
+            params=query,
+            json=json.loads(body) if body is not None else None,
+            headers={"Authorization": f"Bearer {config.api_token}"} if config.api_token else None,
+            requests=requests_,
+            warmup=warmup,
+            top=top,
+            cprofile_path=cprofile_path,
+        )
+    )
+    click.echo(report.format())
+
+
 cli.add_command(start)
 cli.add_command(init)
+cli.add_command(import_)
+cli.add_command(rebuild_stats)
+cli.add_command(profile)
@@ -1,12 +1,35 @@
 from __future__ import annotations
 
-import dotenv
+import os
 
-dotenv.load_dotenv()
+try:
+    from functools import cache
+except ImportError:
+    from functools import lru_cache as cache
+
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+
+
+def _env_flag(name: str, default: bool = False) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+
+def _env_list(name: str) -> tuple[str, ...]:
+    """Comma-separated values, blanks dropped"""
+    return tuple(value.strip() for value in os.getenv(name, "").split(",") if value.strip())
 
-import os
 
-from pydantic import BaseModel, ConfigDict
+@cache
+def load_dotenv() -> None:
+    """Load `.env` into the environment once, on the first config read"""
+    import dotenv
+
+    dotenv.load_dotenv()
+
+
+def _env_optional_int(name: str, default: str) -> int | None:
+    value = os.getenv(name, default)
+    return None if value.lower() in ("", "none") else int(value)
 
 
 def get_config() -> Config:
@@ -16,17 +39,148 @@ def get_config() -> Config:
 DEFAULT_TOKEN = ""
 
 
+class AdmissionSlotsError(ValueError):
+    def __init__(self, write_slots: int, capacity: int):
+        super().__init__(
+            f"ADMISSION_WRITE_SLOTS ({write_slots}) must be less than the pool capacity,"
+            f" DB_POOL_SIZE + DB_MAX_OVERFLOW ({capacity})"
+        )
+
+
 class Config(BaseModel):
     model_config = ConfigDict(frozen=True)
 
     api_token: str
     db_url: str
+    # Executions of the same query before psycopg prepares it server-side, 0 prepares
+    # right away and None disables it (needed behind pgbouncer in transaction mode)
+    db_prepare_threshold: int | None = Field(5, ge=0)
+    # Connections kept in the pool and extra ones opened under load
+    db_pool_size: int = Field(5, ge=1)
+    db_max_overflow: int = Field(5, ge=0)
+    # Pooled connections opened at startup (at most db_pool_size), and projects whose
+    # first pages are queried on each of them, see mini_leaderboard/warmup.py
+    db_warmup_connections: int = Field(0, ge=0)
+    warmup_project_ids: tuple[str, ...] = ()
+
+    # Limit concurrent API requests to the pool capacity, see mini_leaderboard/admission.py
+    admission_control: bool = False
+    # Concurrent write requests, None for half of the pool capacity; reads get the rest
+    admission_write_slots: int | None = Field(None, ge=1)
+    # Requests waiting for a slot per budget, and seconds they wait before a 503
+    admission_queue_size: int = Field(100, ge=0)
+    admission_timeout: float = Field(1, ge=0)
+
+    # Number of counter rows each voted item is spread over, 1 disables sharding
+    vote_shards: int = Field(1, ge=1)
+    # Seconds between background fold-downs of vote shards, 0 disables it
+    vote_fold_interval: float = Field(0, ge=0)
+
+    # Token buckets for write endpoints in requests per second, 0 disables them
+    rate_limit_client: float = Field(0, ge=0)
+    rate_limit_client_burst: int = Field(10, ge=1)
+    rate_limit_project: float = Field(0, ge=0)
+    rate_limit_project_burst: int = Field(100, ge=1)
+    # Header a trusted proxy sets to the client address (e.g. X-Real-IP, or X-Forwarded-For whose last
+    # entry is used), identifies clients for rate limits, vote replays and idempotency keys. Without it
+    # clients are told apart by their address; API_TOKEN is shared, so it does not identify anyone
+    client_id_header: str | None = None
+    # Seconds a client+item vote is remembered to reject replays, 0 disables it
+    vote_dedup_window: float = Field(0, ge=0)
+    vote_dedup_capacity: int = Field(1_000_000, ge=1)
+
+    # Push leaderboard entries and votes to subscribers through LISTEN/NOTIFY
+    live_updates: bool = False
+
+    # JSON-lines file or OTLP/HTTP JSON URL receiving request traces, None disables tracing
+    trace_export: str | None = None
+    # Share of requests traced when tracing is enabled
+    trace_sample_rate: float = Field(1.0, ge=0, le=1)
+
+    # Time every statement per fingerprint, see mini_leaderboard/querylog.py
+    query_stats: bool = False
+    # Statements slower than this are logged, SELECTs are EXPLAINed once per fingerprint
+    slow_query_ms: float = Field(100, ge=0)
+
+    # Share of successful requests written to the access log, see mini_leaderboard/accesslog.py
+    access_log_sample_rate: float = Field(1.0, ge=0, le=1)
+    # Requests slower than this are always logged
+    slow_request_ms: float = Field(1000, ge=0)
+
+    # Larger page sizes are clamped, clients continue with `next_cursor`
+    max_page_size: int = Field(1000, ge=1)
+    # Responses of at least this many bytes are compressed, None disables compression
+    compress_min_size: int | None = Field(1024, ge=0)
+
+    # Seconds an Idempotency-Key is remembered and the size of its in-process cache
+    idempotency_ttl: float = Field(86400, gt=0)
+    idempotency_cache_size: int = Field(10_000, ge=1)
+
+    # Number of rows each project's score statistics are spread over, so concurrent adds do not queue on one
+    stats_shards: int = Field(8, ge=1)
+    # Size of approximate-rank sketches, rank error is about 1.7% of entries at 200
+    sketch_k: int = Field(200, ge=8)
+    # Seconds between merges of new scores into the stored sketches, also their read cache TTL
+    sketch_flush_interval: float = Field(5, ge=0)
+
+    # Accept form submissions with 202 and write them in batches from a bounded queue
+    form_queue: bool = False
+    form_queue_size: int = Field(10_000, ge=1)
+    form_queue_batch_size: int = Field(500, ge=1)
+    form_queue_flush_interval: float = Field(0.5, ge=0)
+    form_queue_put_timeout: float = Field(1, ge=0)
+
+    @model_validator(mode="after")
+    def _check_admission_write_slots(self) -> Config:
+        capacity = self.db_pool_size + self.db_max_overflow
+        if self.admission_write_slots is not None and self.admission_write_slots >= capacity:
+            # Reads would be left without a connection of their own
+            raise AdmissionSlotsError(self.admission_write_slots, capacity)
+        return self
 
     @classmethod
     def from_env(cls) -> Config:
+        load_dotenv()
         return cls(
             api_token=os.getenv("API_TOKEN", DEFAULT_TOKEN),
             db_url=os.getenv("DB_URL", "postgres:postgres@localhost:5432/postgres"),
+            db_prepare_threshold=_env_optional_int("DB_PREPARE_THRESHOLD", "5"),
+            db_pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+            db_max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "5")),
+            db_warmup_connections=int(os.getenv("DB_WARMUP_CONNECTIONS", "0")),
+            warmup_project_ids=_env_list("WARMUP_PROJECT_IDS"),
+            admission_control=_env_flag("ADMISSION_CONTROL"),
+            admission_write_slots=_env_optional_int("ADMISSION_WRITE_SLOTS", "none"),
+            admission_queue_size=int(os.getenv("ADMISSION_QUEUE_SIZE", "100")),
+            admission_timeout=float(os.getenv("ADMISSION_TIMEOUT", "1")),
+            vote_shards=int(os.getenv("VOTE_SHARDS", "1")),
+            vote_fold_interval=float(os.getenv("VOTE_FOLD_INTERVAL", "0")),
+            rate_limit_client=float(os.getenv("RATE_LIMIT_CLIENT", "0")),
+            rate_limit_client_burst=int(os.getenv("RATE_LIMIT_CLIENT_BURST", "10")),
+            rate_limit_project=float(os.getenv("RATE_LIMIT_PROJECT", "0")),
+            rate_limit_project_burst=int(os.getenv("RATE_LIMIT_PROJECT_BURST", "100")),
+            client_id_header=os.getenv("CLIENT_ID_HEADER") or None,
+            vote_dedup_window=float(os.getenv("VOTE_DEDUP_WINDOW", "0")),
+            vote_dedup_capacity=int(os.getenv("VOTE_DEDUP_CAPACITY", "1000000")),
+            live_updates=_env_flag("LIVE_UPDATES"),
+            trace_export=os.getenv("TRACE_EXPORT") or None,
+            trace_sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "1")),
+            query_stats=_env_flag("QUERY_STATS"),
+            slow_query_ms=float(os.getenv("SLOW_QUERY_MS", "100")),
+            access_log_sample_rate=float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "1")),
+            slow_request_ms=float(os.getenv("SLOW_REQUEST_MS", "1000")),
+            max_page_size=int(os.getenv("MAX_PAGE_SIZE", "1000")),
+            compress_min_size=_env_optional_int("COMPRESS_MIN_SIZE", "1024"),
+            idempotency_ttl=float(os.getenv("IDEMPOTENCY_TTL", "86400")),
+            idempotency_cache_size=int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000")),
+            stats_shards=int(os.getenv("STATS_SHARDS", "8")),
+            sketch_k=int(os.getenv("SKETCH_K", "200")),
+            sketch_flush_interval=float(os.getenv("SKETCH_FLUSH_INTERVAL", "5")),
+            form_queue=_env_flag("FORM_QUEUE"),
+            form_queue_size=int(os.getenv("FORM_QUEUE_SIZE", "10000")),
+            form_queue_batch_size=int(os.getenv("FORM_QUEUE_BATCH_SIZE", "500")),
+            form_queue_flush_interval=float(os.getenv("FORM_QUEUE_FLUSH_INTERVAL", "0.5")),
+            form_queue_put_timeout=float(os.getenv("FORM_QUEUE_PUT_TIMEOUT", "1")),
         )
 
     def get_db_url(
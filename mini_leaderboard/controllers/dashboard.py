@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+from collections.abc import Sequence
+
+from fastapi import Depends
+from sqlalchemy import Integer, Row, Text, any_, bindparam, func, select, true
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from mini_leaderboard.config import Config, get_config
+from mini_leaderboard.controllers.leaderboard import RANKINGS, get_order_cache
+from mini_leaderboard.controllers.vote import vote_totals
+from mini_leaderboard.dbutils import get_db_session
+from mini_leaderboard.orm import Form, Leaderboard, MessageBoard
+from mini_leaderboard.routers.api.params import (
+    DashboardResponse,
+    OneLeaderboard,
+    OneMessageboard,
+    OneVote,
+    ProjectDashboard,
+)
+
+# All projects are passed as one array parameter. The top-N lists join every
+# project to a LATERAL subquery, so each project costs one short index scan instead
+# of ranking all of its rows with a window function.
+_PROJECT_IDS = bindparam("project_ids", type_=ARRAY(Text))
+_PROJECTS = func.unnest(_PROJECT_IDS).table_valued("project_id").render_derived().alias("projects")
+
+
+def _top_per_project(query, name: str):
+    lateral = query.limit(bindparam(f"{name}_limit", type_=Integer)).lateral(name)
+    return select(lateral).select_from(_PROJECTS).join(lateral, true())
+
+
+# One statement per project order, each only run for the projects ranked that way
+_TOP_LEADERBOARD = {
+    key: _top_per_project(
+        select(Leaderboard).where(Leaderboard.project_id == _PROJECTS.c.project_id).order_by(*ranking.order_by),
+        "leaderboard",
+    )
+    for key, ranking in RANKINGS.items()
+}
+_LATEST_MESSAGES = _top_per_project(
+    select(MessageBoard)
+    .where(MessageBoard.project_id == _PROJECTS.c.project_id)
+    .order_by(MessageBoard.created_at.desc(), MessageBoard.id_),
+    "messages",
+)
+_FORM_COUNTS = (
+    select(Form.project_id, func.count()).where(Form.project_id == any_(_PROJECT_IDS)).group_by(Form.project_id)
+)
+
+
+def _top_votes(shards: int):
+    totals = vote_totals(_PROJECTS.c.project_id, shards)
+    return _top_per_project(
+        select(totals.c.project_id, totals.c.item_id, totals.c.vote_count).order_by(
+            totals.c.vote_count.desc(), totals.c.item_id
+        ),
+        "votes",
+    )
+
+
+_TOP_VOTES = _top_votes(shards=1)
+_TOP_SHARDED_VOTES = _top_votes(shards=2)
+
+
+def get_dashboard_controller(
+    db: AsyncSession = Depends(get_db_session),
+    config: Config = Depends(get_config),
+) -> DashboardController:
+    return DashboardController(db, config)
+
+
+class DashboardController:
+    """
+    Read-only overview of many projects at once.
+
+    Each resource is fetched for all projects with one statement, so a dashboard
+    costs a handful of round trips instead of one request per project and resource.
+    The statements run one after another on the request's session: a dashboard
+    holds one connection, like the one admission slot it is charged.
+    """
+
+    def __init__(self, db: AsyncSession, config: Config):
+        self.db = db
+        self.top_votes = _TOP_SHARDED_VOTES if config.vote_shards > 1 else _TOP_VOTES
+        self.orders = get_order_cache()
+
+    async def _fetch(self, statement, params: dict) -> Sequence[Row]:
+        result = await self.db.execute(statement, params)
+        return result.all()
+
+    async def _top_leaderboards(self, project_ids: list[str], top: int) -> list[Row]:
+        """Top entries of every project in its own order, usually without a lookup of the orders"""
+        rankings = await self.orders.get_many(self.db, project_ids)
+        by_order: dict[tuple[str, str], list[str]] = {}
+        for project_id, ranking in rankings.items():
+            by_order.setdefault(ranking.key, []).append(project_id)
+        rows = []
+        for key, ids in by_order.items():
+            rows.extend(await self._fetch(_TOP_LEADERBOARD[key], {"project_ids": ids, "leaderboard_limit": top}))
+        return rows
+
+    async def get_dashboard(self, project_ids: list[str], top: int, messages: int) -> DashboardResponse:
+        project_ids = list(dict.fromkeys(project_ids))
+        params = {"project_ids": project_ids, "votes_limit": top, "messages_limit": messages}
+        leaderboard_rows = await self._top_leaderboards(project_ids, top)
+        vote_rows = await self._fetch(self.top_votes, params)
+        form_rows = await self._fetch(_FORM_COUNTS, params)
+        message_rows = await self._fetch(_LATEST_MESSAGES, params)
+
+        projects = {project_id: ProjectDashboard() for project_id in project_ids}
+        for row in leaderboard_rows:
+            projects[row.project_id].leaderboard.append(
+                OneLeaderboard(
+                    leaderboard_id=row.leaderboard_id,
+                    name=row.name,
+                    score=row.score,
+                    created_at=row.created_at,
+                )
+            )
+        for row in vote_rows:
+            projects[row.project_id].votes.append(
+                OneVote(project_id=row.project_id, item_id=row.item_id, vote_count=row.vote_count)
+            )
+        for project_id, count in form_rows:
+            projects[project_id].form_count = count
+        for row in message_rows:
+            projects[row.project_id].messages.append(
+                OneMessageboard(
+                    messageboard_id=row.message_id,
+                    name=row.name,
+                    message=row.message,
+                    created_at=row.created_at,
+                )
+            )
+        return DashboardResponse(projects=projects)
@@ -1,23 +1,40 @@
 from __future__ import annotations
 
+import asyncio
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import Depends
-from sqlalchemy import func, select
+from sqlalchemy import exc, func, insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from mini_leaderboard.dbutils import get_db_session
+from mini_leaderboard.config import Config, get_config
+from mini_leaderboard.dbutils import create_sessionmaker, get_db_session
+from mini_leaderboard.idempotency import Idempotency, get_idempotency_store
+from mini_leaderboard.log import logger
 from mini_leaderboard.orm import Form
 from mini_leaderboard.routers.api.params import AddFormParams
 
+# Backoff between attempts to write a batch while the database is unavailable
+RETRY_DELAY = 1
+MAX_RETRY_DELAY = 30
+# On shutdown, attempts before giving up on what is still queued
+SHUTDOWN_FLUSH_ATTEMPTS = 3
+
+_form_queue: FormQueue | None = None
+
 
 def get_form_controller(
     db: AsyncSession = Depends(get_db_session),
+    config: Config = Depends(get_config),
 ) -> FormController:
-    return FormController(db)
+    return FormController(db, config)
 
 
 class FormController:
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, config: Config):
         self.db = db
+        self.idempotency = get_idempotency_store(config)
 
     async def count(
         self,
@@ -30,7 +47,15 @@ class FormController:
         count = result.scalar_one_or_none()
         return count or 0
 
-    async def submit_form(self, params: AddFormParams) -> None:
+    async def submit_form(self, params: AddFormParams, idempotency_key: Idempotency | None = None) -> int | None:
+        """
+        Returns the original status code when idempotency_key replays an earlier request.
+        """
+        if idempotency_key and (
+            replayed := await self.idempotency.claim(self.db, "form/submit", idempotency_key, params, 201)
+        ):
+            return replayed
+
         form = Form(
             username=params.username,
             email=params.email,
@@ -41,4 +66,177 @@ class FormController:
         self.db.add(form)
 
         await self.db.commit()
+        if idempotency_key:
+            self.idempotency.remember("form/submit", idempotency_key, params, 201)
         return None
+
+
+class FormQueue:
+    """
+    Bounded in-process queue of validated submissions, drained by one background task.
+
+    Submissions are written with multi-row inserts of up to `form_queue_batch_size`
+    rows, waiting at most `form_queue_flush_interval` seconds to fill a batch. When
+    the queue is full, producers wait `form_queue_put_timeout` seconds before giving up.
+    Accepted submissions are kept until written, only on shutdown without a database
+    are they given up.
+    """
+
+    def __init__(self, config: Config):
+        self.batch_size = config.form_queue_batch_size
+        self.flush_interval = config.form_queue_flush_interval
+        self.put_timeout = config.form_queue_put_timeout
+        self.sessionmaker = create_sessionmaker(config)
+        self.idempotency = get_idempotency_store(config)
+        self.closing = False
+        # None is the wake-up sentinel used on shutdown
+        self._queue: asyncio.Queue[tuple[AddFormParams, Idempotency | None] | None] = asyncio.Queue(
+            maxsize=config.form_queue_size
+        )
+
+    def replayed(self, params: AddFormParams, idempotency_key: Idempotency) -> int | None:
+        return self.idempotency.cached("form/submit", idempotency_key, params)
+
+    async def put(self, params: AddFormParams, idempotency_key: Idempotency | None = None) -> bool:
+        """
+        Enqueue a submission, returns False if the queue stayed full or is shutting down.
+        """
+        if self.closing:
+            return False
+        try:
+            await asyncio.wait_for(self._queue.put((params, idempotency_key)), self.put_timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def _next_batch(self) -> list[tuple[AddFormParams, Idempotency | None]]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.batch_size and not self.closing:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # Take whatever is already waiting, e.g. everything left on shutdown
+        while len(batch) < self.batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return [item for item in batch if item is not None]
+
+    async def _write(self, batch: list[tuple[AddFormParams, Idempotency | None]]) -> None:
+        async with self.sessionmaker() as session:
+            keyed = [(key, params) for params, key in batch if key]
+            claimed = await self.idempotency.claim_many(session, "form/submit", keyed, 202)
+            new_keys = []
+            rows = []
+            for params, key in batch:
+                if key:
+                    identity, _ = key.identify("form/submit", params)
+                    if identity not in claimed:
+                        # Replayed, or a duplicate within this batch
+                        continue
+                    claimed.discard(identity)
+                    new_keys.append((key, params))
+                rows.append(
+                    params.model_dump(include={"project_id", "username", "email", "project_link", "social_post_link"})
+                )
+            if rows:
+                await session.execute(insert(Form), rows)
+            await session.commit()
+        for key, params in new_keys:
+            self.idempotency.remember("form/submit", key, params, 202)
+
+    async def _flush(
+        self, batch: list[tuple[AddFormParams, Idempotency | None]]
+    ) -> list[tuple[AddFormParams, Idempotency | None]]:
+        """
+        Write a batch, returns what was given up on shutdown.
+
+        While the database is unavailable the batch is retried with a capped backoff,
+        the queue fills up meanwhile and new submissions are turned away. A batch that
+        fails otherwise holds a row that can never be written: it is split until only
+        that row is rejected. Forms are logged by idempotency key, never by content.
+        """
+        attempt = 0
+        while True:
+            try:
+                await self._write(batch)
+            except Exception as e:
+                if not _is_transient(e):
+                    if len(batch) == 1:
+                        logger.error(f"Rejected a queued form ({_describe(e)}), idempotency keys: {_keys(batch)}")
+                        return []
+                    middle = len(batch) // 2
+                    lost = await self._flush(batch[:middle])
+                    return lost + batch[middle:] if lost else await self._flush(batch[middle:])
+                attempt += 1
+                if self.closing and attempt >= SHUTDOWN_FLUSH_ATTEMPTS:
+                    return batch
+                delay = min(RETRY_DELAY * 2 ** (attempt - 1), MAX_RETRY_DELAY)
+                logger.warning(f"Failed to write {len(batch)} queued forms ({_describe(e)}), retrying in {delay}s")
+                await asyncio.sleep(delay)
+            else:
+                return []
+
+    async def run(self) -> None:
+        while not (self.closing and self._queue.empty()):
+            batch = await self._next_batch()
+            if batch and (lost := await self._flush(batch)):
+                # Shutting down without a database, the rest would fail the same way
+                while not self._queue.empty():
+                    if item := self._queue.get_nowait():
+                        lost.append(item)
+                logger.error(f"Lost {len(lost)} queued forms on shutdown, idempotency keys: {_keys(lost)}")
+
+    async def close(self, task: asyncio.Task) -> None:
+        """Stop accepting submissions and wait until everything queued is written"""
+        self.closing = True
+        # If the queue is full the drain loop is busy and sees `closing` after the current batch
+        with suppress(asyncio.QueueFull):
+            self._queue.put_nowait(None)
+        logger.info(f"Flushing {self._queue.qsize()} queued forms")
+        await task
+
+
+def _is_transient(e: Exception) -> bool:
+    """Whether writing may succeed on retry: the database or the connection to it failed"""
+    if isinstance(e, exc.DBAPIError):
+        return e.connection_invalidated or isinstance(e, (exc.OperationalError, exc.InterfaceError))
+    return isinstance(e, (exc.TimeoutError, OSError, asyncio.TimeoutError))
+
+
+def _describe(e: Exception) -> str:
+    # Database errors carry the statement parameters, only name the error
+    return type(e.orig if isinstance(e, exc.DBAPIError) else e).__name__
+
+
+def _keys(batch: list[tuple[AddFormParams, Idempotency | None]]) -> list[str | None]:
+    return [key.key if key else None for _, key in batch]
+
+
+@asynccontextmanager
+async def init_form_queue(config: Config) -> AsyncGenerator[FormQueue | None, None]:
+    global _form_queue
+
+    if not config.form_queue:
+        yield None
+        return
+
+    form_queue = FormQueue(config)
+    task = asyncio.create_task(form_queue.run())
+    _form_queue = form_queue
+    try:
+        yield form_queue
+    finally:
+        _form_queue = None
+        await form_queue.close(task)
+
+
+def get_form_queue() -> FormQueue | None:
+    """
+    For fastapi dependency injection, None unless queued submissions are enabled
+    """
+    return _form_queue
@@ -1,64 +1,253 @@
 from __future__ import annotations
 
+import time
+from collections.abc import Iterable
+
+try:
+    from functools import cache
+except ImportError:
+    from functools import lru_cache as cache
+
 from fastapi import Depends
-from sqlalchemy import select
+from sqlalchemy import Integer, Text, any_, bindparam, func, select, union_all
+from sqlalchemy.dialects.postgresql import ARRAY, insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from mini_leaderboard.config import Config, get_config
 from mini_leaderboard.dbutils import get_db_session
-from mini_leaderboard.orm import Leaderboard
+from mini_leaderboard.idempotency import Idempotency, get_idempotency_store
+from mini_leaderboard.live import notify
+from mini_leaderboard.orm import Leaderboard, LeaderboardOrder
 from mini_leaderboard.routers.api.params import (
     AddLeaderboardParams,
+    LeaderboardAroundResponse,
+    LeaderboardOrderParams,
+    LeaderboardRankResponse,
     LeaderboardResponse,
+    LeaderboardStatsResponse,
     OneLeaderboard,
+    ScoreOrder,
+    SetLeaderboardOrderParams,
+    Tiebreak,
+)
+from mini_leaderboard.sketch import get_generation, get_sketch_store
+from mini_leaderboard.stats import DEFAULT_PERCENTILES, get_stats, record_score
+
+# Ranking rules of a project, see `LeaderboardOrder`
+DEFAULT_ORDER = ("desc", "first")
+# Seconds a worker keeps using a project's order after another worker changed it
+ORDER_CACHE_TTL = 5
+ORDER_CACHE_SIZE = 100_000
+
+
+class Ranking:
+    """
+    Prebuilt statements listing and ranking a project's entries in one order.
+
+    Hot queries are built once and executed with bind parameters, so each call skips
+    constructing and cache-keying the statement; with the same SQL text every time,
+    psycopg prepares them server-side after `db_prepare_threshold` executions.
+
+    Entries are ordered by score, then by `id_` as the tiebreaker: ascending `id_`
+    puts the earliest submission first. ix_leaderboard_project_score_id serves
+    `desc`/`first` and, scanned backwards, `asc`/`last`; ix_leaderboard_project_score_asc_id
+    serves `asc`/`first` and, scanned backwards, `desc`/`last`.
+    """
+
+    def __init__(self, order: ScoreOrder, tiebreak: Tiebreak):
+        score, id_ = Leaderboard.score, Leaderboard.id_
+        self.key = (order, tiebreak)
+        self.descending = order == "desc"
+        self.first = tiebreak == "first"
+        self.order_by = order_by = (score.desc() if self.descending else score, id_ if self.first else id_.desc())
+        reverse_order_by = (score if self.descending else score.desc(), id_.desc() if self.first else id_)
+
+        self.first_page = (
+            select(Leaderboard)
+            .where(Leaderboard.project_id == bindparam("project_id"))
+            .order_by(*order_by)
+            # Limit to page_size + 1 (to check if there's a next page)
+            .limit(bindparam("limit", type_=Integer))
+        )
+        # Records ranked after the cursor record: a worse score, or the same score and a later tiebreak
+        self.next_page = self.first_page.where(self._ranked_after("cursor_score", "cursor_id"))
+
+        # Neighbours of an entry: the `limit` entries ranked right above it, walking the
+        # index backwards, and the entry itself followed by the `limit` entries right
+        # below it, walking forwards. The redundant score bounds make both scans start
+        # at the entry instead of at an end of the project's range.
+        above = (
+            select(Leaderboard)
+            .where(
+                Leaderboard.project_id == bindparam("project_id"),
+                self._score_bound(after=False),
+                self._ranked_before("score", "id_"),
+            )
+            .order_by(*reverse_order_by)
+            .limit(bindparam("limit", type_=Integer))
+        )
+        below = (
+            select(Leaderboard)
+            .where(
+                Leaderboard.project_id == bindparam("project_id"),
+                self._score_bound(after=True),
+                self._ranked_after("score", "id_", inclusive=True),
+            )
+            .order_by(*order_by)
+            .limit(bindparam("limit", type_=Integer) + 1)
+        )
+        self.around = select(Leaderboard).from_statement(union_all(above, below))
+
+        better = score > bindparam("score") if self.descending else score < bindparam("score")
+        worse = score < bindparam("score") if self.descending else score > bindparam("score")
+        self.rank = select(func.count(), func.count().filter(worse), func.count().filter(better)).where(
+            Leaderboard.project_id == bindparam("project_id")
+        )
+
+    def _score_bound(self, after: bool):
+        """Entries scoring no better than `score` when after, no worse otherwise"""
+        if self.descending == after:
+            return Leaderboard.score <= bindparam("score")
+        return Leaderboard.score >= bindparam("score")
+
+    def _ranked_after(self, score_name: str, id_name: str, inclusive: bool = False):
+        """Entries ranked after the (score, id_) bind parameters, or at them when inclusive"""
+        score, id_ = bindparam(score_name), bindparam(id_name)
+        worse = Leaderboard.score < score if self.descending else Leaderboard.score > score
+        if self.first:
+            later = Leaderboard.id_ >= id_ if inclusive else Leaderboard.id_ > id_
+        else:
+            later = Leaderboard.id_ <= id_ if inclusive else Leaderboard.id_ < id_
+        return worse | ((Leaderboard.score == score) & later)
+
+    def _ranked_before(self, score_name: str, id_name: str):
+        score, id_ = bindparam(score_name), bindparam(id_name)
+        better = Leaderboard.score > score if self.descending else Leaderboard.score < score
+        earlier = Leaderboard.id_ < id_ if self.first else Leaderboard.id_ > id_
+        return better | ((Leaderboard.score == score) & earlier)
+
+    def sort_key(self, record: Leaderboard) -> tuple[int, int]:
+        return (-record.score if self.descending else record.score, record.id_ if self.first else -record.id_)
+
+
+RANKINGS = {(order, tiebreak): Ranking(order, tiebreak) for order in ("desc", "asc") for tiebreak in ("first", "last")}
+
+_CURSOR = select(Leaderboard.score, Leaderboard.id_).where(Leaderboard.leaderboard_id == bindparam("cursor"))
+_AROUND_ENTRY = select(Leaderboard.score, Leaderboard.id_).where(
+    Leaderboard.project_id == bindparam("project_id"), Leaderboard.leaderboard_id == bindparam("leaderboard_id")
+)
+_ORDERS = select(LeaderboardOrder.project_id, LeaderboardOrder.score_order, LeaderboardOrder.tiebreak).where(
+    LeaderboardOrder.project_id == any_(bindparam("project_ids", type_=ARRAY(Text)))
 )
 
 
+class OrderCache:
+    """Per-worker cache of the project orders, only projects with a custom order are stored"""
+
+    def __init__(self):
+        self._cache: dict[str, tuple[float, tuple[ScoreOrder, Tiebreak]]] = {}
+
+    async def get_many(self, db: AsyncSession, project_ids: Iterable[str]) -> dict[str, Ranking]:
+        now = time.monotonic()
+        orders = {}
+        missing = []
+        for project_id in project_ids:
+            cached = self._cache.get(project_id)
+            if cached is None or cached[0] <= now:
+                missing.append(project_id)
+            else:
+                orders[project_id] = cached[1]
+        if missing:
+            if len(self._cache) + len(missing) > ORDER_CACHE_SIZE:
+                self._cache.clear()
+            result = await db.execute(_ORDERS, {"project_ids": missing})
+            stored = {project_id: (score_order, tiebreak) for project_id, score_order, tiebreak in result}
+            for project_id in missing:
+                orders[project_id] = stored.get(project_id, DEFAULT_ORDER)
+                self._cache[project_id] = (now + ORDER_CACHE_TTL, orders[project_id])
+        return {project_id: RANKINGS[order] for project_id, order in orders.items()}
+
+    async def get(self, db: AsyncSession, project_id: str) -> Ranking:
+        return (await self.get_many(db, [project_id]))[project_id]
+
+    def forget(self, project_id: str) -> None:
+        self._cache.pop(project_id, None)
+
+
+@cache
+def get_order_cache() -> OrderCache:
+    return OrderCache()
+
+
 def get_leaderboard_controller(
     db: AsyncSession = Depends(get_db_session),
+    config: Config = Depends(get_config),
 ) -> LeaderboardController:
-    return LeaderboardController(db)
+    return LeaderboardController(db, config)
 
 
 class LeaderboardController:
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, config: Config):
         self.db = db
+        self.live = config.live_updates
+        self.max_page_size = config.max_page_size
+        self.stats_shards = config.stats_shards
+        self.idempotency = get_idempotency_store(config)
+        self.sketches = get_sketch_store(config)
+        self.orders = get_order_cache()
+
+    async def add_leaderboard(
+        self, params: AddLeaderboardParams, idempotency_key: Idempotency | None = None
+    ) -> int | None:
+        """
+        Returns the original status code when idempotency_key replays an earlier request.
+        """
+        if idempotency_key and (
+            replayed := await self.idempotency.claim(self.db, "leaderboard/add", idempotency_key, params, 201)
+        ):
+            return replayed
 
-    async def add_leaderboard(self, params: AddLeaderboardParams) -> None:
         leaderboard = Leaderboard(name=params.name, score=params.score, project_id=params.project_id)
         self.db.add(leaderboard)
+        await record_score(self.db, params.project_id, params.score, self.stats_shards)
+        # After record_score, which waits for a running rebuild
+        generation = await get_generation(self.db, params.project_id)
+
+        if self.live:
+            # leaderboard_id is generated on flush
+            await self.db.flush()
+            await notify(
+                self.db,
+                "leaderboard",
+                params.project_id,
+                {"leaderboard_id": leaderboard.leaderboard_id, "name": params.name, "score": params.score},
+            )
 
         await self.db.commit()
+        self.sketches.record(params.project_id, params.score, generation)
+        if idempotency_key:
+            self.idempotency.remember("leaderboard/add", idempotency_key, params, 201)
         return None
 
     async def get_leaderboard(self, project_id: str, cursor: str | None, page_size: int) -> LeaderboardResponse:
         """cursor is leaderboard_id of Leaderboard"""
-        # Create a query to select leaderboard records
-        query = select(Leaderboard).where(Leaderboard.project_id == project_id)
+        page_size = min(page_size, self.max_page_size)
+        ranking = await self.orders.get(self.db, project_id)
+        query = ranking.first_page
+        params = {"project_id": project_id, "limit": page_size + 1}
 
         # If cursor is provided, filter to get records after the cursor
         if cursor:
             # First get the record corresponding to the cursor
-            cursor_query = select(Leaderboard).where(Leaderboard.leaderboard_id == cursor)
-            cursor_result = await self.db.execute(cursor_query)
-            cursor_record = cursor_result.scalar_one_or_none()
+            cursor_result = await self.db.execute(_CURSOR, {"cursor": cursor})
+            cursor_record = cursor_result.one_or_none()
 
             if cursor_record:
-                # Filter to get records with either:
-                # 1. Lower score than the cursor record, or
-                # 2. Same score but higher id_ (for stable ordering within same score)
-                query = query.where(
-                    (Leaderboard.score < cursor_record.score)
-                    | ((Leaderboard.score == cursor_record.score) & (Leaderboard.id_ > cursor_record.id_))
-                )
-
-        # Order by score (descending) and id_ (for stable ordering)
-        query = query.order_by(Leaderboard.score.desc(), Leaderboard.id_)
-
-        # Limit to page_size + 1 (to check if there's a next page)
-        query = query.limit(page_size + 1)
+                query = ranking.next_page
+                params.update(cursor_score=cursor_record.score, cursor_id=cursor_record.id_)
 
         # Execute the query
-        result = await self.db.execute(query)
+        result = await self.db.execute(query, params)
         records = result.scalars().all()
 
         # Determine if there's a next page
@@ -84,3 +273,81 @@ class LeaderboardController:
 
         # Return the response
         return LeaderboardResponse(data=data, next_cursor=next_cursor)
+
+    async def get_around(self, project_id: str, leaderboard_id: str, k: int) -> LeaderboardAroundResponse | None:
+        """
+        The k entries ranked above and below an entry, in leaderboard order.
+
+        Returns None when the entry does not exist in the project.
+        """
+        result = await self.db.execute(_AROUND_ENTRY, {"project_id": project_id, "leaderboard_id": leaderboard_id})
+        entry = result.one_or_none()
+        if entry is None:
+            return None
+
+        ranking = await self.orders.get(self.db, project_id)
+        result = await self.db.execute(
+            ranking.around, {"project_id": project_id, "score": entry.score, "id_": entry.id_, "limit": k}
+        )
+        records = sorted(result.scalars().all(), key=ranking.sort_key)
+        data = [
+            OneLeaderboard(
+                leaderboard_id=record.leaderboard_id,
+                name=record.name,
+                score=record.score,
+                created_at=record.created_at,
+            )
+            for record in records
+        ]
+        position = next(i for i, record in enumerate(records) if record.id_ == entry.id_)
+        return LeaderboardAroundResponse(data=data, position=position)
+
+    async def get_stats(
+        self, project_id: str, percentiles: Iterable[float] = DEFAULT_PERCENTILES
+    ) -> LeaderboardStatsResponse:
+        """
+        Score statistics of a project, served from its histogram instead of scanning entries.
+        """
+        return await get_stats(self.db, project_id, percentiles)
+
+    async def get_rank(self, project_id: str, score: int, approximate: bool = False) -> LeaderboardRankResponse:
+        """
+        Rank of a score among the project's entries, following the project's order.
+
+        With approximate, the rank is estimated from the project's sketch in constant
+        time; projects without a sketch yet are answered exactly.
+        """
+        ranking = await self.orders.get(self.db, project_id)
+        if approximate and (sketch := await self.sketches.get(self.db, project_id)) is not None and sketch.n:
+            lower, higher = sketch.rank(score), sketch.n - sketch.rank(score, inclusive=True)
+            count, worse, better = (sketch.n, lower, higher) if ranking.descending else (sketch.n, higher, lower)
+        else:
+            approximate = False
+            result = await self.db.execute(ranking.rank, {"project_id": project_id, "score": score})
+            count, worse, better = result.one()
+        return LeaderboardRankResponse(
+            rank=better + 1,
+            count=count,
+            percentile=100 * worse / count if count else 0,
+            approximate=approximate,
+        )
+
+    async def get_order(self, project_id: str) -> LeaderboardOrderParams:
+        ranking = await self.orders.get(self.db, project_id)
+        order, tiebreak = ranking.key
+        return LeaderboardOrderParams(order=order, tiebreak=tiebreak)
+
+    async def set_order(self, params: SetLeaderboardOrderParams) -> None:
+        """
+        Change how a project is ranked. Other workers follow within `ORDER_CACHE_TTL` seconds.
+        """
+        stmt = insert(LeaderboardOrder).values(
+            project_id=params.project_id, score_order=params.order, tiebreak=params.tiebreak
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[LeaderboardOrder.project_id],
+            set_={"score_order": stmt.excluded.score_order, "tiebreak": stmt.excluded.tiebreak},
+        )
+        await self.db.execute(stmt)
+        await self.db.commit()
+        self.orders.forget(params.project_id)
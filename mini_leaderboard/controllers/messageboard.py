@@ -4,7 +4,9 @@ from fastapi import Depends
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from mini_leaderboard.config import Config, get_config
 from mini_leaderboard.dbutils import get_db_session
+from mini_leaderboard.idempotency import Idempotency, get_idempotency_store
 from mini_leaderboard.orm import MessageBoard
 from mini_leaderboard.routers.api.params import (
     AddMessageboardParams,
@@ -15,25 +17,41 @@ from mini_leaderboard.routers.api.params import (
 
 def get_messageboard_controller(
     db: AsyncSession = Depends(get_db_session),
+    config: Config = Depends(get_config),
 ) -> MessageboardController:
-    return MessageboardController(db)
+    return MessageboardController(db, config)
 
 
 class MessageboardController:
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, config: Config):
         self.db = db
+        self.max_page_size = config.max_page_size
+        self.idempotency = get_idempotency_store(config)
+
+    async def add_messageboard(
+        self, params: AddMessageboardParams, idempotency_key: Idempotency | None = None
+    ) -> int | None:
+        """
+        Returns the original status code when idempotency_key replays an earlier request.
+        """
+        if idempotency_key and (
+            replayed := await self.idempotency.claim(self.db, "messageboard/add", idempotency_key, params, 201)
+        ):
+            return replayed
 
-    async def add_messageboard(self, params: AddMessageboardParams) -> None:
         messageboard = MessageBoard(name=params.name, message=params.message, project_id=params.project_id)
         self.db.add(messageboard)
 
         await self.db.commit()
+        if idempotency_key:
+            self.idempotency.remember("messageboard/add", idempotency_key, params, 201)
         return None
 
     async def get_messageboard(
         self, project_id: str, cursor: str | None, page_size: int, search_keyword: str | None
     ) -> MessageboardResponse:
         """cursor is message_id of MessageBoard"""
+        page_size = min(page_size, self.max_page_size)
         # Create a query to select messageboard records
         query = select(MessageBoard).where(MessageBoard.project_id == project_id)
 
@@ -1,51 +1,194 @@
 from __future__ import annotations
 
+import random
+
 from fastapi import Depends
-from sqlalchemy import select
-from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy import Text, any_, bindparam, delete, func, literal, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from mini_leaderboard.dbutils import get_db_session
+from mini_leaderboard.config import Config, get_config
+from mini_leaderboard.dbutils import create_sessionmaker, get_db_session, run_periodically
+from mini_leaderboard.live import notify
 from mini_leaderboard.orm import Vote
-from mini_leaderboard.routers.api.params import AddVoteParams
+from mini_leaderboard.routers.api.params import (
+    AddVoteParams,
+    OneVote,
+    VoteListResponse,
+    VoteOrder,
+)
+
+FOLD_BATCH_SIZE = 10_000
+
+# Hot statements are built once and executed with bind parameters, see controllers/leaderboard.py
+_ITEM_VOTE = select(func.coalesce(func.sum(Vote.vote_count), 0)).where(
+    Vote.project_id == bindparam("project_id"), Vote.item_id == bindparam("item_id")
+)
+# Using SQLAlchemy's insert...on conflict syntax for PostgreSQL, with the constraint name
+_ADD_VOTE = (
+    insert(Vote)
+    .values(project_id=bindparam("project_id"), item_id=bindparam("item_id"), shard=bindparam("shard"), vote_count=1)
+    .on_conflict_do_update(constraint="uix_project_item", set_=dict(vote_count=Vote.vote_count + 1))  #  noqa: C408
+)
+
+
+def vote_totals(project_id, shards: int):
+    """
+    Per-item vote totals of a project as a subquery.
+
+    Without sharding this is a plain row select that Postgres flattens into the
+    outer query, so listing still walks the indexes instead of aggregating.
+    Lowering `vote_shards` requires the shards to be folded first. project_id
+    may be a column, e.g. to correlate with a LATERAL join.
+    """
+    if shards > 1:
+        query = select(
+            Vote.project_id,
+            Vote.item_id,
+            func.sum(Vote.vote_count).label("vote_count"),
+        ).group_by(Vote.project_id, Vote.item_id)
+    else:
+        query = select(Vote.project_id, Vote.item_id, Vote.vote_count)
+    return query.where(Vote.project_id == project_id).correlate_except(Vote).subquery("totals")
 
 
 def get_vote_controller(
     db: AsyncSession = Depends(get_db_session),
+    config: Config = Depends(get_config),
 ) -> VoteController:
-    return VoteController(db)
+    return VoteController(db, config)
 
 
 class VoteController:
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, config: Config):
         self.db = db
+        self.shards = config.vote_shards
+        self.live = config.live_updates
+        self.max_page_size = config.max_page_size
 
-    async def get_all_votes(self, project_id: str):
+    async def get_all_votes(
+        self,
+        project_id: str,
+        cursor: str | None = None,
+        page_size: int = 100,
+        order: VoteOrder = "item_id",
+    ) -> VoteListResponse:
         """
-        Get all votes for a specific project.
+        Get a page of votes for a specific project.
+
+        cursor is item_id of Vote. `item_id` order walks uix_project_item,
+        `votes_desc` walks ix_vote_project_count_item.
         """
-        result = await self.db.execute(select(Vote).where(Vote.project_id == project_id))
-        votes = result.scalars().all()
-        return votes
+        page_size = min(page_size, self.max_page_size)
+        totals = vote_totals(project_id, self.shards)
+        query = select(totals.c.project_id, totals.c.item_id, totals.c.vote_count)
 
-    async def get_item_vote(self, project_id: str, item_id: str):
+        if order == "votes_desc":
+            if cursor:
+                # Resume after the cursor item's current position
+                cursor_count = await self.get_item_vote(project_id, cursor)
+                query = query.where(
+                    (totals.c.vote_count < cursor_count)
+                    | ((totals.c.vote_count == cursor_count) & (totals.c.item_id > cursor))
+                )
+            query = query.order_by(totals.c.vote_count.desc(), totals.c.item_id)
+        else:
+            if cursor:
+                query = query.where(totals.c.item_id > cursor)
+            query = query.order_by(totals.c.item_id)
+
+        # Limit to page_size + 1 (to check if there's a next page)
+        result = await self.db.execute(query.limit(page_size + 1))
+        rows = result.all()
+
+        has_next_page = len(rows) > page_size
+        if has_next_page:
+            next_cursor = rows[page_size - 1].item_id
+            rows = rows[:page_size]
+        else:
+            next_cursor = None
+
+        data = [OneVote(project_id=row.project_id, item_id=row.item_id, vote_count=row.vote_count) for row in rows]
+        return VoteListResponse(data=data, next_cursor=next_cursor)
+
+    async def get_item_vote(self, project_id: str, item_id: str) -> int:
         """
         Get vote count for a specific item in a project.
         """
-        result = await self.db.execute(select(Vote).where(Vote.project_id == project_id, Vote.item_id == item_id))
-        vote = result.scalar_one_or_none()
-        return vote.vote_count if vote else 0
+        result = await self.db.execute(_ITEM_VOTE, {"project_id": project_id, "item_id": item_id})
+        return int(result.scalar_one())
+
+    async def get_item_votes(self, project_id: str, item_ids: list[str]) -> dict[str, int]:
+        """
+        Get vote counts for many items in a project with a single query.
+
+        Items without any vote are reported as 0.
+        """
+        # One array parameter keeps a single statement shape for any number of items
+        result = await self.db.execute(
+            select(Vote.item_id, func.sum(Vote.vote_count))
+            .where(
+                Vote.project_id == project_id,
+                Vote.item_id == any_(bindparam("item_ids", list(set(item_ids)), type_=ARRAY(Text))),
+            )
+            .group_by(Vote.item_id)
+        )
+        counts = dict(result.all())
+        return {item_id: int(counts.get(item_id, 0)) for item_id in item_ids}
 
     async def add_vote(self, params: AddVoteParams):
         """
         Add a vote for a specific item in a project.
         """
-        # Using SQLAlchemy's insert...on conflict syntax for PostgreSQL
-        stmt = insert(Vote).values(project_id=params.project_id, item_id=params.item_id, vote_count=1)
+        # Spread increments of the same item over several rows to avoid row-lock contention
+        shard = random.randrange(self.shards) if self.shards > 1 else 0  # noqa: S311
 
-        # For PostgreSQL, use the constraint name
-        stmt = stmt.on_conflict_do_update(constraint="uix_project_item", set_=dict(vote_count=Vote.vote_count + 1))  #  noqa: C408
-
-        await self.db.execute(stmt)
+        await self.db.execute(_ADD_VOTE, {"project_id": params.project_id, "item_id": params.item_id, "shard": shard})
+        if self.live:
+            await notify(self.db, "vote", params.project_id, {"item_id": params.item_id, "delta": 1})
         await self.db.commit()
         return None
+
+    async def fold_shards(self, batch_size: int = FOLD_BATCH_SIZE) -> int:
+        """
+        Fold one batch of shard rows back into shard 0.
+
+        Rows locked by in-flight votes are skipped and picked up by a later batch.
+        Returns the number of items that were folded.
+        """
+        unfolded = select(Vote.id_).where(Vote.shard > 0).limit(batch_size).with_for_update(skip_locked=True)
+        moved = (
+            delete(Vote)
+            .where(Vote.id_.in_(unfolded.scalar_subquery()))
+            .returning(Vote.project_id, Vote.item_id, Vote.vote_count)
+            .cte("moved")
+        )
+        stmt = insert(Vote).from_select(
+            ["project_id", "item_id", "shard", "vote_count"],
+            select(moved.c.project_id, moved.c.item_id, literal(0), func.sum(moved.c.vote_count)).group_by(
+                moved.c.project_id, moved.c.item_id
+            ),
+        )
+        stmt = stmt.on_conflict_do_update(
+            constraint="uix_project_item",
+            set_=dict(vote_count=Vote.vote_count + stmt.excluded.vote_count),  #  noqa: C408
+        ).returning(Vote.id_)
+
+        result = await self.db.execute(stmt)
+        folded = len(result.all())
+        await self.db.commit()
+        return folded
+
+
+def run_vote_folder(config: Config):
+    """
+    Fold vote shards in the background every `vote_fold_interval` seconds
+    """
+
+    async def fold():
+        async with create_sessionmaker(config)() as session:
+            controller = VoteController(session, config)
+            while await controller.fold_shards():
+                pass
+
+    return run_periodically("fold vote shards", config.vote_fold_interval, fold)
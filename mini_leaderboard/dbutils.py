@@ -1,28 +1,21 @@
 from __future__ import annotations
 
+import asyncio
 import os
-from contextlib import asynccontextmanager, contextmanager
+from contextlib import asynccontextmanager, suppress
 
 try:
     from functools import cache
 except ImportError:
     from functools import lru_cache as cache
 
-from collections.abc import AsyncGenerator
-from glob import glob
-from pathlib import Path
-from subprocess import check_call
-from tempfile import TemporaryDirectory
+from collections.abc import AsyncGenerator, Awaitable, Callable
 from typing import TYPE_CHECKING, Any
 from urllib.parse import urlparse
 
-import alembic.command
-import alembic.config
-from alembic.script import ScriptDirectory
 from fastapi import Depends
-from sqlalchemy import create_engine, delete, exc, inspect, text
+from sqlalchemy import create_engine, exc, inspect, text
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
-from sqlalchemy.orm import Session
 
 from mini_leaderboard.config import Config, get_config
 from mini_leaderboard.log import logger
@@ -35,6 +28,8 @@ _here = os.path.abspath(os.path.dirname(__file__))
 
 ALEMBIC_INI_TEMPLATE_PATH = os.path.join(_here, "alembic.ini")
 ALEMBIC_DIR = os.path.join(_here, "alembic")
+# Revision matching the schema of databases created before migrations were versioned
+INITIAL_REVISION = "0001"
 
 
 def write_alembic_ini(alembic_ini="alembic.ini", db_url="sqlite:///mini_leaderboard.sqlite"):
@@ -63,40 +58,15 @@ def write_alembic_ini(alembic_ini="alembic.ini", db_url="sqlite:///mini_leaderbo
         )
 
 
-@contextmanager
-def _temp_alembic_ini(db_url):
-    """Context manager for temporary alembic directory
+def get_alembic_config(db_url: str):
+    """In-process alembic config pointing at the migrations shipped with the package"""
+    import alembic.config
 
-    Temporarily write an alembic.ini file for use with alembic migration scripts.
-
-    Context manager yields alembic.ini path.
-
-    Parameters
-    ----------
-    db_url : str
-        The SQLAlchemy database url, e.g. `sqlite:///mini_leaderboard.sqlite`.
-
-    Returns
-    -------
-    alembic_ini: str
-        The path to the temporary alembic.ini that we have created.
-        This file will be cleaned up on exit from the context manager.
-    """
-    with TemporaryDirectory() as td:
-        alembic_ini = os.path.join(td, "alembic.ini")
-        write_alembic_ini(alembic_ini, db_url)
-        yield alembic_ini
-
-
-@contextmanager
-def chdir(path):
-    """Context manager to temporarily change directory"""
-    old_dir = os.getcwd()
-    os.chdir(path)
-    try:
-        yield
-    finally:
-        os.chdir(old_dir)
+    cfg = alembic.config.Config()
+    cfg.set_main_option("script_location", ALEMBIC_DIR)
+    # ConfigParser interpolation, see write_alembic_ini
+    cfg.set_main_option("sqlalchemy.url", str(db_url).replace("%", "%%"))
+    return cfg
 
 
 def upgrade(db_url, revision="head"):
@@ -107,33 +77,15 @@ def upgrade(db_url, revision="head"):
     revision: str [default: head]
         The alembic revision to upgrade to.
     """
-    with _temp_alembic_ini(db_url) as alembic_ini:
-        check_call(["alembic", "-c", alembic_ini, "upgrade", revision])
+    import alembic.command
+
+    alembic.command.upgrade(get_alembic_config(db_url), revision)
 
 
 class DatabaseSchemaMismatch(Exception):
     pass
 
 
-def _clear_revision(engine, url):
-    inspector = inspect(engine)
-    if inspector.has_table("alembic_version"):
-        with engine.begin() as connection:
-            connection.execute(text("delete from alembic_version"))
-
-    with _temp_alembic_ini(url) as ini:
-        cfg = alembic.config.Config(ini)
-        scripts = ScriptDirectory.from_config(cfg)
-        old_versions_files = Path(scripts.versions) / "*.py"
-        # Remove *.py from old_versions
-        for old_versions_file in glob(old_versions_files.as_posix()):
-            os.remove(old_versions_file)
-        logger.info(f"Removed old versions: {old_versions_files}")
-
-        logger.info(f"Creating new revision: {ini}")
-        alembic.command.revision(config=cfg, autogenerate=True, message="init")
-
-
 def get_db_log_url(db_url):
     urlinfo = urlparse(db_url)
     if urlinfo.password:
@@ -146,41 +98,88 @@ def get_db_log_url(db_url):
 
 
 def upgrade_in_place(db_url):
-    """This is a dark magic function that upgrades the database in-place."""
-    # run check-db-revision first
+    """
+    Bring the database to the head revision of the shipped migrations, in-process.
+
+    Returns immediately when the database is already at head. Databases set up by
+    `init` before migrations were versioned (tables present, but no known revision)
+    already have the initial schema and are stamped with it first.
+    """
+    # alembic is only needed by `init`, not by the server
+    import alembic.command
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
 
     db_log_url = get_db_log_url(db_url)
     logger.info(f"Initializing database: {db_log_url}")
+    cfg = get_alembic_config(db_url)
+    scripts = ScriptDirectory.from_config(cfg)
     engine = create_engine(db_url)
-    Base.metadata.create_all(engine)
+    try:
+        with engine.connect() as connection:
+            current = set(MigrationContext.configure(connection).get_current_heads())
+            if current == set(scripts.get_heads()):
+                logger.info(f"Database is up to date: {db_log_url}")
+                return
+
+            known = {script.revision for script in scripts.walk_revisions()}
+            unversioned = current - known or (not current and inspect(connection).has_table("leaderboard"))
+            # Each migration runs in its own transaction, see alembic/env.py
+            connection.commit()
+            cfg.attributes["connection"] = connection
+            if unversioned:
+                logger.info(f"Stamping unversioned database as {INITIAL_REVISION}: {db_log_url}")
+                alembic.command.stamp(cfg, INITIAL_REVISION, purge=True)
+
+            logger.info(f"Upgrading database: {db_log_url}")
+            alembic.command.upgrade(cfg, "head")
+    finally:
+        engine.dispose()
+
 
-    with chdir(_here):
-        _clear_revision(engine, db_url)
-        logger.info(f"Upgrading database: {db_log_url}")
-        upgrade(db_url)
+def truncate_all(connection) -> None:
+    """Empty every table in one statement and restart their id sequences"""
+    tables = ", ".join(connection.dialect.identifier_preparer.format_table(t) for t in Base.metadata.sorted_tables)
+    connection.execute(text(f"TRUNCATE {tables} RESTART IDENTITY"))
 
 
 def drop_all_data(db_url):
     db_log_url = get_db_log_url(db_url)
     logger.info(f"Dropping database: {db_log_url}")
     engine = create_engine(db_url)
-    for t in Base.metadata.tables.values():
-        logger.info(f"Delete table data: {t}")
-        with Session(engine) as session:
-            session.execute(delete(t))
-            session.commit()
+    try:
+        with engine.begin() as connection:
+            truncate_all(connection)
+    finally:
+        engine.dispose()
 
 
 @cache
 def get_engine(config: Config):
     logger.info("Creating database engine")
-    return create_async_engine(
+    kwargs = {}
+    if config.trace_export:
+        from mini_leaderboard.tracing import TracedQueuePool
+
+        kwargs["poolclass"] = TracedQueuePool
+    engine = create_async_engine(
         config.get_db_url(),
         pool_pre_ping=True,  # Verify connections before using them
-        pool_size=5,
-        max_overflow=5,
+        pool_size=config.db_pool_size,
+        max_overflow=config.db_max_overflow,
         pool_recycle=60,
+        connect_args={"prepare_threshold": config.db_prepare_threshold},
+        **kwargs,
     )
+    if config.trace_export:
+        from mini_leaderboard.tracing import instrument_engine
+
+        instrument_engine(engine.sync_engine)
+    if config.query_stats:
+        from mini_leaderboard import querylog
+
+        querylog.instrument_engine(engine.sync_engine, querylog.get_query_log(config))
+    return engine
 
 
 @asynccontextmanager
@@ -191,6 +190,38 @@ async def init_engine(config: Config):
     logger.info("Database engine disposed")
 
 
+@asynccontextmanager
+async def run_periodically(
+    name: str,
+    interval: float,
+    job: Callable[[], Awaitable[Any]],
+) -> AsyncGenerator[None, None]:
+    """
+    Run job every `interval` seconds in the background while the context is open.
+
+    Failures are logged and retried on the next tick. A non-positive interval disables the job.
+    """
+    if interval <= 0:
+        yield
+        return
+
+    async def run_forever():
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await job()
+            except Exception:
+                logger.exception(f"Background job failed: {name}")
+
+    task = asyncio.create_task(run_forever())
+    try:
+        yield
+    finally:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+
+
 def create_sessionmaker(config: Config):
     return async_sessionmaker(
         get_engine(config),
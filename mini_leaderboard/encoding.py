@@ -0,0 +1,149 @@
+"""
+Response encodings negotiated from the request headers.
+
+JSON bodies are transcoded to MessagePack when the `Accept` header prefers
+`application/msgpack`, and bodies of at least `compress_min_size` bytes are
+compressed with brotli or gzip following `Accept-Encoding`. MessagePack and
+brotli need the optional `msgpack` and `brotli` packages (the `compact` extra);
+without them clients get JSON and gzip.
+
+Endpoints keep rendering JSON with FastAPI's serializer, only clients asking for
+MessagePack pay for the transcoding.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from mini_leaderboard.config import get_config
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack")
+# Fast settings suited to compressing every response on the fly
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+
+def parse_accept(header: str) -> dict[str, float]:
+    """Media types or codings listed in an Accept-* header, mapped to their quality"""
+    accepted = {}
+    for part in header.lower().split(","):
+        value, *params = part.split(";")
+        quality = 1.0
+        for param in params:
+            name, _, q = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(q)
+                except ValueError:
+                    quality = 0
+        if value.strip():
+            accepted[value.strip()] = quality
+    return accepted
+
+
+def wants_msgpack(accept: str) -> bool:
+    if msgpack is None:
+        return False
+    accepted = parse_accept(accept)
+    quality = max(accepted.get(media_type, 0) for media_type in MSGPACK_MEDIA_TYPES)
+    return quality > 0 and quality >= accepted.get("application/json", 0)
+
+
+def choose_coding(accept_encoding: str) -> str | None:
+    accepted = parse_accept(accept_encoding)
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", accepted.get("*", 0)) > 0:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, coding: str) -> bytes:
+    if coding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def encode_body(
+    body: bytes, headers: MutableHeaders, to_msgpack: bool, coding: str | None, min_size: int | None
+) -> bytes:
+    """Encode a complete response body, updating its headers"""
+    if msgpack is not None and headers.get("content-type", "").startswith("application/json"):
+        headers.add_vary_header("Accept")
+        if to_msgpack and body:
+            body = msgpack.packb(json.loads(body))
+            headers["content-type"] = MSGPACK_MEDIA_TYPE
+    if min_size is not None and len(body) >= min_size:
+        headers.add_vary_header("Accept-Encoding")
+        if coding is not None:
+            body = compress(body, coding)
+            headers["content-encoding"] = coding
+    return body
+
+
+class EncodingMiddleware:
+    """
+    Transcode and compress complete response bodies as negotiated by the request.
+
+    Streamed responses, such as the Server-Sent Events of `/subscribe`, and bodies
+    that already have a Content-Encoding pass through untouched.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        min_size = get_config().compress_min_size
+        headers = Headers(scope=scope)
+        to_msgpack = wants_msgpack(headers.get("accept", ""))
+        coding = choose_coding(headers.get("accept-encoding", "")) if min_size is not None else None
+        start: Message | None = None
+
+        async def send_encoded(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if start is None:
+                await send(message)
+                return
+
+            response_start, start = start, None
+            response_headers = MutableHeaders(raw=response_start["headers"])
+            if (
+                message["type"] != "http.response.body"
+                or message.get("more_body", False)
+                or "content-encoding" in response_headers
+            ):
+                await send(response_start)
+                await send(message)
+                return
+
+            original = message.get("body", b"")
+            body = encode_body(original, response_headers, to_msgpack, coding, min_size)
+            if body is not original:
+                response_headers["content-length"] = str(len(body))
+                message = {**message, "body": body}
+            await send(response_start)
+            await send(message)
+
+        await self.app(scope, receive, send_encoded)
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import timedelta
+
+try:
+    from functools import cache
+except ImportError:
+    from functools import lru_cache as cache
+
+from fastapi import Depends, Header, HTTPException
+from pydantic import BaseModel
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from mini_leaderboard.caller import get_caller
+from mini_leaderboard.config import Config
+from mini_leaderboard.dbutils import create_sessionmaker, run_periodically
+from mini_leaderboard.orm import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+CLEANUP_BATCH_SIZE = 10_000
+MAX_CLEANUP_INTERVAL = 3600
+
+# Endpoint, project, caller and key; the same key may be reused across each of them
+Identity = tuple[str, str, str, str]
+
+
+@dataclass(frozen=True)
+class Idempotency:
+    """An Idempotency-Key and who sent it"""
+
+    key: str
+    caller: str
+
+    def identify(self, scope: str, params: BaseModel) -> tuple[Identity, str]:
+        """Identity of the key on the endpoint scope, and the hash of the request params"""
+        request_hash = hashlib.sha256(params.model_dump_json().encode()).hexdigest()
+        return (scope, params.project_id, self.caller, self.key), request_hash
+
+
+def get_idempotency_key(
+    idempotency_key: str | None = Header(
+        default=None,
+        alias=IDEMPOTENCY_HEADER,
+        max_length=255,
+        description="Client generated key, retries with the same key and request are applied only once",
+    ),
+    caller: str = Depends(get_caller),
+) -> Idempotency | None:
+    """
+    For fastapi dependency injection
+    """
+    if not idempotency_key:
+        return None
+    return Idempotency(idempotency_key, caller)
+
+
+def check_replay(original: tuple[int, str | None], request_hash: str) -> int:
+    """
+    Status code of the original request, 422 if it was a different request.
+    """
+    status_code, original_hash = original
+    # Keys claimed before request hashes were stored have none
+    if original_hash is not None and original_hash != request_hash:
+        raise HTTPException(
+            status_code=422,
+            detail=f"{IDEMPOTENCY_HEADER} was already used with a different request",
+        )
+    return status_code
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries also expire after `ttl` seconds"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[Identity, tuple[float, tuple[int, str | None]]] = OrderedDict()
+
+    def get(self, key: Identity, now: float | None = None) -> tuple[int, str | None] | None:
+        now = time.monotonic() if now is None else now
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Identity, value: tuple[int, str | None], now: float | None = None) -> None:
+        now = time.monotonic() if now is None else now
+        self._entries[key] = (now + self.ttl, value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+class IdempotencyStore:
+    """
+    Idempotency keys in a unique-indexed table, fronted by an in-process LRU.
+
+    A key is claimed inside the transaction of the write it protects, so the row
+    and the key commit or roll back together. Concurrent retries serialize on the
+    unique index; only the first one inserts. Keys are scoped by endpoint, project
+    and caller, and a key replayed with different params is rejected with 422.
+    """
+
+    def __init__(self, config: Config):
+        self.ttl = config.idempotency_ttl
+        self._cache = TTLCache(config.idempotency_cache_size, config.idempotency_ttl)
+
+    async def claim(
+        self, db: AsyncSession, scope: str, idempotency: Idempotency, params: BaseModel, status_code: int
+    ) -> int | None:
+        """
+        Claim a key for a write answered with status_code.
+
+        Returns None if the key is new, otherwise the status code of the original request.
+        """
+        cached = self.cached(scope, idempotency, params)
+        if cached is not None:
+            return cached
+
+        identity, request_hash = idempotency.identify(scope, params)
+        _, project_id, caller, key = identity
+        result = await db.execute(
+            insert(IdempotencyKey)
+            .values(
+                scope=scope,
+                project_id=project_id,
+                caller=caller,
+                key=key,
+                request_hash=request_hash,
+                status_code=status_code,
+            )
+            .on_conflict_do_nothing(constraint="uix_idempotency_scope_key")
+            .returning(IdempotencyKey.id_)
+        )
+        if result.scalar_one_or_none() is not None:
+            return None
+
+        result = await db.execute(
+            select(IdempotencyKey.status_code, IdempotencyKey.request_hash).where(
+                IdempotencyKey.scope == scope,
+                IdempotencyKey.project_id == project_id,
+                IdempotencyKey.caller == caller,
+                IdempotencyKey.key == key,
+            )
+        )
+        row = result.one_or_none()
+        original = (row.status_code, row.request_hash) if row else (status_code, request_hash)
+        self._cache.set(identity, original)
+        return check_replay(original, request_hash)
+
+    async def claim_many(
+        self, db: AsyncSession, scope: str, requests: list[tuple[Idempotency, BaseModel]], status_code: int
+    ) -> set[Identity]:
+        """
+        Claim many keys with one statement, returns the identities of the keys that were new.
+        """
+        rows = {}
+        for idempotency, params in requests:
+            identity, request_hash = idempotency.identify(scope, params)
+            rows.setdefault(identity, request_hash)
+        if not rows:
+            return set()
+        result = await db.execute(
+            insert(IdempotencyKey)
+            .values([
+                {
+                    "scope": scope,
+                    "project_id": project_id,
+                    "caller": caller,
+                    "key": key,
+                    "request_hash": request_hash,
+                    "status_code": status_code,
+                }
+                for (_, project_id, caller, key), request_hash in rows.items()
+            ])
+            .on_conflict_do_nothing(constraint="uix_idempotency_scope_key")
+            .returning(IdempotencyKey.scope, IdempotencyKey.project_id, IdempotencyKey.caller, IdempotencyKey.key)
+        )
+        return {tuple(row) for row in result.all()}
+
+    def cached(self, scope: str, idempotency: Idempotency, params: BaseModel) -> int | None:
+        """Status code of a recently committed key, without touching the database"""
+        identity, request_hash = idempotency.identify(scope, params)
+        original = self._cache.get(identity)
+        if original is None:
+            return None
+        return check_replay(original, request_hash)
+
+    def remember(self, scope: str, idempotency: Idempotency, params: BaseModel, status_code: int) -> None:
+        """Cache a key once the transaction that claimed it has committed"""
+        identity, request_hash = idempotency.identify(scope, params)
+        self._cache.set(identity, (status_code, request_hash))
+
+    async def cleanup(self, db: AsyncSession) -> int:
+        """
+        Delete one batch of expired keys, returns the number of deleted keys.
+        """
+        expired = (
+            select(IdempotencyKey.id_)
+            .where(IdempotencyKey.created_at < func.now() - timedelta(seconds=self.ttl))
+            .limit(CLEANUP_BATCH_SIZE)
+        )
+        result = await db.execute(
+            delete(IdempotencyKey)
+            .where(IdempotencyKey.id_.in_(expired.scalar_subquery()))
+            .returning(IdempotencyKey.id_)
+        )
+        deleted = len(result.all())
+        await db.commit()
+        return deleted
+
+
+@cache
+def get_idempotency_store(config: Config) -> IdempotencyStore:
+    return IdempotencyStore(config)
+
+
+def run_idempotency_cleanup(config: Config):
+    """
+    Delete expired idempotency keys in the background
+    """
+    store = get_idempotency_store(config)
+
+    async def cleanup():
+        async with create_sessionmaker(config)() as session:
+            while await store.cleanup(session):
+                pass
+
+    return run_periodically("clean up idempotency keys", min(config.idempotency_ttl, MAX_CLEANUP_INTERVAL), cleanup)
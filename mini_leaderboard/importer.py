@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import csv
+import os
+import uuid
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from pydantic import BaseModel, ValidationError
+
+from mini_leaderboard.log import logger
+from mini_leaderboard.routers.api.params import (
+    AddFormParams,
+    AddLeaderboardParams,
+    AddMessageboardParams,
+)
+
+DEFAULT_CHUNK_SIZE = 10_000
+
+
+def _new_ids(n: int) -> list[str]:
+    """Generate n uuid4 hex ids from a single urandom call"""
+    raw = os.urandom(16 * n)
+    return [uuid.UUID(bytes=raw[i * 16 : (i + 1) * 16], version=4).hex for i in range(n)]
+
+
+@dataclass(frozen=True)
+class ImportTable:
+    """How validated params of one API schema are laid out as COPY rows"""
+
+    name: str
+    params: type[BaseModel]
+    columns: tuple[str, ...]
+    to_rows: Callable[[list[Any]], list[tuple[Any, ...]]]
+
+
+IMPORT_TABLES: dict[str, ImportTable] = {
+    "leaderboard": ImportTable(
+        name="leaderboard",
+        params=AddLeaderboardParams,
+        columns=("leaderboard_id", "project_id", "name", "score"),
+        to_rows=lambda records: [
+            (id_, r.project_id, r.name, r.score) for id_, r in zip(_new_ids(len(records)), records)
+        ],
+    ),
+    "messageboard": ImportTable(
+        name="messageboard",
+        params=AddMessageboardParams,
+        columns=("message_id", "project_id", "name", "message"),
+        to_rows=lambda records: [
+            (id_, r.project_id, r.name, r.message) for id_, r in zip(_new_ids(len(records)), records)
+        ],
+    ),
+    "form": ImportTable(
+        name="form",
+        params=AddFormParams,
+        columns=("project_id", "username", "email", "project_link", "social_post_link"),
+        to_rows=lambda records: [
+            (r.project_id, r.username, r.email, r.project_link, r.social_post_link) for r in records
+        ],
+    ),
+}
+
+
+class ImportRowError(Exception):
+    def __init__(self, line_no: int, reason: str):
+        super().__init__(f"Invalid row at line {line_no}: {reason}")
+        self.line_no = line_no
+        self.reason = reason
+
+
+def detect_format(path: Path) -> str:
+    if path.suffix.lower() == ".csv":
+        return "csv"
+    return "ndjson"
+
+
+def iter_records(path: Path, format_: str) -> Iterator[tuple[int, str | dict[str, Any]]]:
+    """
+    Yield (line number, raw record) pairs from a CSV or NDJSON file.
+
+    NDJSON lines are yielded as text so they can be validated with `model_validate_json`.
+    Empty CSV cells are dropped so optional fields fall back to their schema defaults.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if format_ == "csv":
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, {k: v for k, v in record.items() if v != ""}
+            return
+
+        for line_no, line in enumerate(f, start=1):
+            if line.strip():
+                yield line_no, line
+
+
+def _rebuild_stats(db_url: str, table: str, project_ids: set[str]) -> None:
+    if table == "leaderboard" and project_ids:
+        from mini_leaderboard.stats import rebuild_stats
+
+        rebuild_stats(db_url, sorted(project_ids))
+
+
+def import_file(
+    db_url: str,
+    table: str,
+    path: Path,
+    format_: str | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    skip_invalid: bool = False,
+    on_progress: Callable[[int, int], None] | None = None,
+) -> tuple[int, int]:
+    """
+    Stream a CSV/NDJSON file into a table with `COPY ... FROM STDIN`.
+
+    Every record is validated against the same schema as the HTTP API. Rows are
+    copied and committed in chunks of `chunk_size`, so an interrupted import keeps
+    the chunks that were already committed.
+
+    Score statistics of the projects a leaderboard import touched are rebuilt
+    afterwards, since COPY bypasses their incremental updates.
+
+    Returns (imported, skipped) row counts.
+    """
+    # Imported here to keep `mini_leaderboard.cli` cheap to load
+    from psycopg import sql
+    from sqlalchemy import create_engine
+
+    from mini_leaderboard.dbutils import get_db_log_url
+
+    spec = IMPORT_TABLES[table]
+    format_ = format_ or detect_format(path)
+    copy_stmt = sql.SQL("COPY {} ({}) FROM STDIN").format(
+        sql.Identifier(spec.name),
+        sql.SQL(", ").join(sql.Identifier(c) for c in spec.columns),
+    )
+
+    logger.info(f"Importing {path} into {spec.name}: {get_db_log_url(db_url)}")
+    engine = create_engine(db_url)
+    raw = engine.raw_connection()
+    imported = skipped = 0
+    project_ids: set[str] = set()
+
+    def flush(records: list[Any]) -> None:
+        nonlocal imported
+        project_ids.update(r.project_id for r in records)
+        with raw.driver_connection.cursor() as cursor, cursor.copy(copy_stmt) as copy:
+            for row in spec.to_rows(records):
+                copy.write_row(row)
+        raw.commit()
+        imported += len(records)
+        if on_progress:
+            on_progress(imported, skipped)
+
+    try:
+        chunk: list[Any] = []
+        for line_no, record in iter_records(path, format_):
+            try:
+                if isinstance(record, str):
+                    chunk.append(spec.params.model_validate_json(record))
+                else:
+                    chunk.append(spec.params.model_validate(record))
+            except ValidationError as e:
+                if not skip_invalid:
+                    raise ImportRowError(line_no, str(e)) from e
+                skipped += 1
+                continue
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                chunk = []
+        if chunk:
+            flush(chunk)
+    finally:
+        raw.close()
+        engine.dispose()
+        _rebuild_stats(db_url, spec.name, project_ids)
+
+    return imported, skipped
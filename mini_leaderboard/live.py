@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+from collections import defaultdict
+from collections.abc import AsyncGenerator, Awaitable, Callable, Iterator
+from contextlib import asynccontextmanager, contextmanager, suppress
+from typing import Any
+
+import psycopg
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from mini_leaderboard.admission import read_slot
+from mini_leaderboard.config import Config
+from mini_leaderboard.log import logger
+
+CHANNEL = "mini_leaderboard"
+SUBSCRIBER_QUEUE_SIZE = 100
+KEEPALIVE_INTERVAL = 15
+RECONNECT_DELAY = 1
+# pg_notify rejects payloads of this many bytes or more
+MAX_PAYLOAD_BYTES = 8000
+
+_broadcaster: Broadcaster | None = None
+
+
+async def notify(db: AsyncSession, kind: str, project_id: str, data: dict[str, Any]) -> None:
+    """
+    Publish a change to every worker, Postgres delivers it when the transaction commits.
+
+    A change too large for a notification asks the subscribers to resync instead.
+    """
+    payload = json.dumps({"kind": kind, "project_id": project_id, "data": data})
+    if len(payload.encode()) >= MAX_PAYLOAD_BYTES:
+        payload = json.dumps({"kind": kind, "project_id": project_id, "resync": True})
+        if len(payload.encode()) >= MAX_PAYLOAD_BYTES:
+            logger.warning(f"Skipping {kind} notification, project_id is too long: {project_id[:100]}...")
+            return
+    await db.execute(select(func.pg_notify(CHANNEL, payload)))
+
+
+def get_conninfo(config: Config) -> str:
+    """libpq connection string for the configured database"""
+    return make_url(config.get_db_url()).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+def format_sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class Broadcaster:
+    """
+    Holds one LISTEN connection per worker and fans notifications out to local subscribers.
+
+    Subscribers are bounded queues keyed by (kind, project_id). A subscriber that
+    falls behind gets its backlog replaced by a single `resync` event, and so does
+    every subscriber once the connection is re-established, since notifications
+    sent while it was down are lost.
+    """
+
+    def __init__(self, conninfo: str, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.conninfo = conninfo
+        self.queue_size = queue_size
+        self.listening = asyncio.Event()
+        self._subscribers: defaultdict[tuple[str, str], set[asyncio.Queue]] = defaultdict(set)
+
+    @contextmanager
+    def subscribe(self, kind: str, project_id: str) -> Iterator[asyncio.Queue]:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        key = (kind, project_id)
+        self._subscribers[key].add(queue)
+        try:
+            yield queue
+        finally:
+            self._subscribers[key].discard(queue)
+            if not self._subscribers[key]:
+                del self._subscribers[key]
+
+    def dispatch(self, payload: str) -> None:
+        try:
+            message = json.loads(payload)
+            queues = self._subscribers.get((message["kind"], message["project_id"]))
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"Ignoring malformed notification: {payload!r}")
+            return
+        for queue in queues or ():
+            if message.get("resync"):
+                self.resync(queue, message["project_id"])
+                continue
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self.resync(queue, message["project_id"])
+
+    @staticmethod
+    def resync(queue: asyncio.Queue, project_id: str) -> None:
+        """Replace the backlog of a subscriber with a `resync` event"""
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait({"kind": "resync", "project_id": project_id, "data": {}})
+
+    def resync_all(self) -> None:
+        for (_, project_id), queues in self._subscribers.items():
+            for queue in queues:
+                self.resync(queue, project_id)
+
+    async def run(self) -> None:
+        """LISTEN forever, reconnecting when the connection drops"""
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(self.conninfo, autocommit=True) as conn:
+                    await conn.execute(f"LISTEN {CHANNEL}")
+                    # Changes made while not listening were missed
+                    self.resync_all()
+                    self.listening.set()
+                    async for notification in conn.notifies():
+                        self.dispatch(notification.payload)
+            except psycopg.Error:
+                logger.exception("Live updates connection lost, reconnecting")
+            finally:
+                self.listening.clear()
+            await asyncio.sleep(RECONNECT_DELAY)
+
+
+@asynccontextmanager
+async def init_broadcaster(config: Config) -> AsyncGenerator[Broadcaster | None, None]:
+    global _broadcaster
+
+    if not config.live_updates:
+        yield None
+        return
+
+    broadcaster = Broadcaster(get_conninfo(config))
+    task = asyncio.create_task(broadcaster.run())
+    _broadcaster = broadcaster
+    try:
+        yield broadcaster
+    finally:
+        _broadcaster = None
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+
+
+def get_broadcaster() -> Broadcaster:
+    """
+    For fastapi dependency injection
+    """
+    if _broadcaster is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Live updates are disabled. Check environment LIVE_UPDATES.",
+        )
+    return _broadcaster
+
+
+def stream_events(
+    broadcaster: Broadcaster,
+    kind: str,
+    project_id: str,
+    snapshot: Callable[[], Awaitable[Any]],
+    config: Config,
+) -> StreamingResponse:
+    """
+    Server-Sent Events response: a `snapshot` event followed by one `kind` event per change.
+
+    The snapshot is taken after subscribing, so no change is missed; a change that
+    lands in between may be both in the snapshot and in the first events. It holds
+    a read admission slot; when none is free in time, the stream ends with a `retry`
+    delay instead and the client reconnects after it.
+    """
+
+    async def events() -> AsyncGenerator[str, None]:
+        with broadcaster.subscribe(kind, project_id) as queue:
+            async with read_slot(config) as admitted:
+                data = await snapshot() if admitted else None
+            if not admitted:
+                yield f"retry: {max(1, math.ceil(config.admission_timeout)) * 1000}\n\n"
+                return
+            yield format_sse("snapshot", data)
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(message["kind"], message["data"])
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,10 +1,36 @@
 import os
+import sys
+
+from mini_leaderboard.config import load_dotenv
+
+# Log settings may be set in .env like the rest of the configuration, and loguru
+# reads its level once, at import
+load_dotenv()
 
 USER_DEFINED_LOG_LEVEL = os.getenv("MINI_LEADERBOARD_LOG_LEVEL", "INFO")
+# "text" for human readable lines, "json" for one JSON object per line
+USER_DEFINED_LOG_FORMAT = os.getenv("MINI_LEADERBOARD_LOG_FORMAT", "text")
 
 os.environ["LOGURU_LEVEL"] = USER_DEFINED_LOG_LEVEL
 
 
 from loguru import logger  # noqa: E402
 
-__all__ = ["logger"]
+__all__ = ["logger", "setup_server_logging"]
+
+
+def setup_server_logging() -> None:
+    """
+    Replace the default stderr sink with a queued one for the server.
+
+    Records are handed to a writer thread, so a slow stderr never blocks the event
+    loop. With `MINI_LEADERBOARD_LOG_FORMAT=json` they are written as JSON lines,
+    fields bound with `logger.bind` end up under `record.extra`.
+    """
+    logger.remove()
+    logger.add(
+        sys.stderr,
+        level=USER_DEFINED_LOG_LEVEL,
+        serialize=USER_DEFINED_LOG_FORMAT.lower() == "json",
+        enqueue=True,
+    )
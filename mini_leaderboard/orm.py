@@ -1,29 +1,123 @@
 import uuid
 
-from sqlalchemy import Column, DateTime, Integer, Text, UniqueConstraint, func
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Index,
+    Integer,
+    LargeBinary,
+    Text,
+    TypeDecorator,
+    UniqueConstraint,
+    func,
+)
+from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import declarative_base  # noqa: F811
 
 Base = declarative_base()
 
 
+class HexUUID(TypeDecorator):
+    """
+    Native 16-byte UUID column read and written as 32-character hex strings, the
+    format of the ids in the API.
+    """
+
+    impl = UUID(as_uuid=True)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, uuid.UUID):
+            return value
+        try:
+            return uuid.UUID(value)
+        except ValueError:
+            # A malformed id matches no row, like an unknown one did as text
+            return None
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else value.hex
+
+
 class Leaderboard(Base):
     __tablename__ = "leaderboard"
 
     id_ = Column(Integer, autoincrement=True, primary_key=True)
 
-    leaderboard_id = Column(
-        Text,
-        nullable=False,
-        index=True,
-        default=lambda: uuid.uuid4().hex,
-        unique=True,
-    )
+    # A single unique index
+    leaderboard_id = Column(HexUUID, nullable=False, unique=True, index=True, default=lambda: uuid.uuid4().hex)
     project_id = Column(Text)
     name = Column(Text)
     score = Column(Integer)
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Append-only, rows are never updated
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Serve listing, `/around` scans in both directions and exact rank counts in
+        # every project order, scanned forwards or backwards, see `controllers.leaderboard.Ranking`
+        Index("ix_leaderboard_project_score_id", project_id, score.desc(), id_),
+        Index("ix_leaderboard_project_score_asc_id", project_id, score, id_),
+    )
+
+
+class LeaderboardOrder(Base):
+    """How the entries of one project are ranked, projects without a row rank `desc`/`first`"""
+
+    __tablename__ = "leaderboard_order"
+
+    project_id = Column(Text, primary_key=True)
+    # `desc` or `asc`
+    score_order = Column(Text, nullable=False, server_default="desc")
+    # `first` or `last`, which of the submissions with equal scores ranks higher
+    tiebreak = Column(Text, nullable=False, server_default="first")
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class LeaderboardStats(Base):
+    """Running score summary of one project, see mini_leaderboard/stats.py"""
+
+    __tablename__ = "leaderboard_stats"
+
+    project_id = Column(Text, primary_key=True)
+    # Concurrent adds spread over several rows per project, see Config.stats_shards
+    shard = Column(Integer, primary_key=True, default=0, server_default="0")
+    count = Column(BigInteger, nullable=False)
+    # Sum of all scores, for the mean
+    total = Column(BigInteger, nullable=False)
+    min_score = Column(Integer, nullable=False)
+    max_score = Column(Integer, nullable=False)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class LeaderboardHistogram(Base):
+    """Score counts of one project in log-scaled buckets, see mini_leaderboard/stats.py"""
+
+    __tablename__ = "leaderboard_histogram"
+
+    project_id = Column(Text, primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    shard = Column(Integer, primary_key=True, default=0, server_default="0")
+    count = Column(BigInteger, nullable=False)
+
+
+class LeaderboardSketch(Base):
+    """Serialized KLL sketch of the scores of one project, see mini_leaderboard/sketch.py"""
+
+    __tablename__ = "leaderboard_sketch"
+
+    project_id = Column(Text, primary_key=True)
+    data = Column(LargeBinary, nullable=False)
+    # Number of scores summarized by the sketch
+    count = Column(BigInteger, nullable=False)
+    # Bumped by every rebuild, see mini_leaderboard/sketch.py
+    generation = Column(BigInteger, nullable=False, default=0, server_default="0")
+
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
 
@@ -32,19 +126,20 @@ class MessageBoard(Base):
 
     id_ = Column(Integer, autoincrement=True, primary_key=True)
 
-    message_id = Column(
-        Text,
-        nullable=False,
-        index=True,
-        default=lambda: uuid.uuid4().hex,
-        unique=True,
-    )
+    # A single unique index
+    message_id = Column(HexUUID, nullable=False, unique=True, index=True, default=lambda: uuid.uuid4().hex)
     project_id = Column(Text)
     name = Column(Text)
     message = Column(Text)
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Append-only, rows are never updated
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Serves listing and the latest messages of each dashboard project
+        Index("ix_messageboard_project_created_id", project_id, created_at.desc(), id_),
+    )
 
 
 class Form(Base):
@@ -60,7 +155,8 @@ class Form(Base):
     social_post_link = Column(Text, nullable=True)
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Append-only, rows are never updated
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
 class Vote(Base):
@@ -70,9 +166,35 @@ class Vote(Base):
     project_id = Column(Text, nullable=False, index=True)
     item_id = Column(Text, nullable=False, index=True)
     vote_count = Column(Integer, default=1)
+    # Hot items spread their increments over several counter rows, see Config.vote_shards
+    shard = Column(Integer, nullable=False, default=0, server_default="0")
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
-    # Composite unique constraint to ensure one vote record per project_id + item_id combination
-    __table_args__ = (UniqueConstraint("project_id", "item_id", name="uix_project_item"),)
+    __table_args__ = (
+        # Composite unique constraint to ensure one vote record per project_id + item_id + shard combination
+        UniqueConstraint("project_id", "item_id", "shard", name="uix_project_item"),
+        # Finds the rows left to fold back into shard 0
+        Index("ix_vote_unfolded", id_, postgresql_where=shard > 0),
+        # Serves `order=votes_desc` and `top=K` listing with a single index scan
+        Index("ix_vote_project_count_item", project_id, vote_count.desc(), item_id),
+    )
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_key"
+
+    id_ = Column(Integer, autoincrement=True, primary_key=True)
+    # Endpoint, project and caller the key was used by, the same key may be reused across each of them
+    scope = Column(Text, nullable=False)
+    project_id = Column(Text, nullable=False, server_default="")
+    caller = Column(Text, nullable=False, server_default="")
+    key = Column(Text, nullable=False)
+    status_code = Column(Integer, nullable=False)
+    # sha256 of the request params, a key replayed with different params is rejected
+    request_hash = Column(Text)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+    __table_args__ = (UniqueConstraint("scope", "project_id", "caller", "key", name="uix_idempotency_scope_key"),)
@@ -0,0 +1,215 @@
+"""
+Allocation profile of one endpoint, see the `profile` command.
+
+The app runs in-process with its lifespan, against DB_URL, and the endpoint is
+requested through `httpx.ASGITransport`, so the profile covers routing, validation,
+the database driver and serialization but no network server. After a few warm-up
+requests (which fill caches, pools and prepared statements), `tracemalloc` records
+the measured requests:
+
+- peak: most memory allocated at once during a request, on top of what was live
+  before it, the per-request working set
+- retained: memory and objects still alive after all requests and a full garbage
+  collection, divided by the number of requests; anything that keeps growing with
+  the number of requests shows up here, attributed to its allocation sites
+
+Optionally the same requests are run again under `cProfile`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import gc
+import linecache
+import pstats
+import random
+import tracemalloc
+from dataclasses import dataclass, field
+from io import StringIO
+from typing import Any
+
+from sqlalchemy import create_engine, delete
+
+from mini_leaderboard.orm import Leaderboard, MessageBoard, Vote
+from mini_leaderboard.sketch import DEFAULT_K
+
+TRACEBACK_FRAMES = 10
+
+_IGNORED = [
+    # The profiler's own bookkeeping
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, linecache.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+@dataclass
+class AllocationSite:
+    location: str
+    retained_bytes: int
+    retained_blocks: int
+
+
+@dataclass
+class ProfileReport:
+    requests: int
+    status_codes: dict[int, int]
+    mean_peak_bytes: float
+    max_peak_bytes: int
+    retained_bytes: int
+    retained_blocks: int
+    retained_objects: int
+    sites: list[AllocationSite] = field(default_factory=list)
+    cprofile: str | None = None
+
+    def format(self) -> str:
+        statuses = ", ".join(f"{status}: {count}" for status, count in sorted(self.status_codes.items()))
+        lines = [
+            f"Requests: {self.requests} ({statuses})",
+            f"Peak allocation per request: {self.mean_peak_bytes / 1024:.1f} KiB mean,"
+            f" {self.max_peak_bytes / 1024:.1f} KiB max",
+            f"Retained per request: {self.retained_bytes / self.requests:.0f} B,"
+            f" {self.retained_blocks / self.requests:.1f} blocks,"
+            f" {self.retained_objects / self.requests:.1f} gc objects",
+        ]
+        if self.sites:
+            lines.append("Top retained allocation sites (total over all requests):")
+            lines.extend(
+                f"  {site.retained_bytes / 1024:10.1f} KiB {site.retained_blocks:8d} blocks  {site.location}"
+                for site in self.sites
+            )
+        if self.cprofile:
+            lines.extend(["", self.cprofile])
+        return "\n".join(lines)
+
+
+def seed_project(db_url: str, project_id: str, size: int, sketch_k: int = DEFAULT_K) -> None:
+    """
+    Replace the project's leaderboard entries, votes and messages with size rows each.
+
+    Its statistics are rebuilt with sketches of `sketch_k`, pass the server's.
+    """
+    from mini_leaderboard.stats import rebuild_stats
+
+    # The same data for the same size, so profiles can be compared
+    rng = random.Random(size)  # noqa: S311
+    engine = create_engine(db_url)
+    try:
+        with engine.begin() as connection:
+            for model in (Leaderboard, Vote, MessageBoard):
+                connection.execute(delete(model).where(model.project_id == project_id))
+            if size:
+                connection.execute(
+                    Leaderboard.__table__.insert(),
+                    [
+                        {"project_id": project_id, "name": f"user-{i}", "score": rng.randrange(1_000_000)}
+                        for i in range(size)
+                    ],
+                )
+                connection.execute(
+                    Vote.__table__.insert(),
+                    [
+                        {"project_id": project_id, "item_id": f"item-{i}", "vote_count": rng.randrange(1000)}
+                        for i in range(size)
+                    ],
+                )
+                connection.execute(
+                    MessageBoard.__table__.insert(),
+                    [{"project_id": project_id, "name": f"user-{i}", "message": "hello"} for i in range(size)],
+                )
+    finally:
+        engine.dispose()
+    rebuild_stats(db_url, [project_id], sketch_k)
+
+
+def _top_sites(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot, top: int) -> list[AllocationSite]:
+    sites = []
+    for diff in after.compare_to(before, "traceback")[:top]:
+        if diff.size_diff <= 0:
+            break
+        # Innermost frame of this package, or the innermost frame when the package is not involved
+        frames = list(reversed(diff.traceback))
+        frame = next((f for f in frames if "mini_leaderboard" in f.filename), frames[0])
+        location = f"{frame.filename}:{frame.lineno}"
+        if frame is not frames[0]:
+            location += f" (allocated in {frames[0].filename}:{frames[0].lineno})"
+        sites.append(AllocationSite(location, diff.size_diff, diff.count_diff))
+    return sites
+
+
+async def profile_endpoint(
+    app,
+    method: str,
+    path: str,
+    params: Any = None,
+    json: Any = None,
+    headers: dict[str, str] | None = None,
+    requests: int = 100,
+    warmup: int = 10,
+    top: int = 10,
+    cprofile_path: str | None = None,
+) -> ProfileReport:
+    """Request an endpoint of app repeatedly and report the memory it allocates and retains"""
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with (
+        app.router.lifespan_context(app),
+        httpx.AsyncClient(transport=transport, base_url="http://profile", headers=headers) as client,
+    ):
+
+        async def request() -> int:
+            response = await client.request(method, path, params=params, json=json)
+            return response.status_code
+
+        for _ in range(warmup):
+            await request()
+
+        status_codes: dict[int, int] = {}
+        peaks = []
+        gc.collect()
+        objects_before = len(gc.get_objects())
+        tracemalloc.start(TRACEBACK_FRAMES)
+        try:
+            before = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+            for _ in range(requests):
+                current, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                status = await request()
+                peaks.append(tracemalloc.get_traced_memory()[1] - current)
+                status_codes[status] = status_codes.get(status, 0) + 1
+            # Let background work of the requests finish before measuring what they left behind
+            await asyncio.sleep(0)
+            gc.collect()
+            after = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+        finally:
+            tracemalloc.stop()
+        objects_after = len(gc.get_objects())
+
+        retained = after.compare_to(before, "filename")
+        report = ProfileReport(
+            requests=requests,
+            status_codes=status_codes,
+            mean_peak_bytes=sum(peaks) / len(peaks),
+            max_peak_bytes=max(peaks),
+            retained_bytes=sum(diff.size_diff for diff in retained),
+            retained_blocks=sum(diff.count_diff for diff in retained),
+            retained_objects=objects_after - objects_before,
+            sites=_top_sites(before, after, top),
+        )
+
+        if cprofile_path:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            for _ in range(requests):
+                await request()
+            profiler.disable()
+            profiler.dump_stats(cprofile_path)
+            out = StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(top)
+            report.cprofile = out.getvalue().strip()
+    return report
@@ -0,0 +1,171 @@
+"""
+Statement timings aggregated by fingerprint.
+
+With `QUERY_STATS` enabled, every statement the server runs is timed and grouped
+under its fingerprint: the SQL text with literals and bind parameters replaced by
+`?` and IN lists collapsed. Each fingerprint keeps count, total and max time and a
+KLL sketch of durations for percentiles.
+
+The first time a SELECT of a fingerprint takes longer than `SLOW_QUERY_MS`, it is
+logged and re-run with `EXPLAIN (ANALYZE, BUFFERS)` by a background job on its
+own connection, and the plan is kept with the stats. Statistics are per worker
+process, see `GET /api/v1/admin/queries`.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+import time
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Any
+
+try:
+    from functools import cache
+except ImportError:
+    from functools import lru_cache as cache
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+
+from mini_leaderboard.config import Config
+from mini_leaderboard.dbutils import get_engine, run_periodically
+from mini_leaderboard.log import logger
+from mini_leaderboard.routers.api.params import OneQueryStats
+from mini_leaderboard.sketch import KLLSketch
+
+# New fingerprints beyond this are not tracked
+MAX_FINGERPRINTS = 1000
+EXPLAIN_INTERVAL = 5
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|%\(\w+\)s|%s|\$\d+|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_SPACES = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> tuple[str, str]:
+    """Short hash and normalized text of a statement"""
+    normalized = _SPACES.sub(" ", _IN_LISTS.sub("IN (...)", _LITERALS.sub("?", statement))).strip()
+    return hashlib.blake2b(normalized.encode(), digest_size=8).hexdigest(), normalized
+
+
+class QueryStats:
+    __slots__ = ("count", "durations", "max_ms", "plan", "statement", "total_ms")
+
+    def __init__(self, statement: str):
+        self.statement = statement
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        # In microseconds
+        self.durations = KLLSketch()
+        self.plan: str | None = None
+
+
+class QueryLog:
+    def __init__(self, config: Config):
+        self.slow_ms = config.slow_query_ms
+        self.stats: dict[str, QueryStats] = {}
+        # Fingerprint to the statement and parameters of its first slow execution
+        self._to_explain: dict[str, tuple[str, Any]] = {}
+        self._explained: set[str] = set()
+
+    def record(self, statement: str, parameters: Any, duration_ms: float) -> None:
+        key, normalized = fingerprint(statement)
+        stats = self.stats.get(key)
+        if stats is None:
+            if len(self.stats) >= MAX_FINGERPRINTS:
+                return
+            stats = self.stats[key] = QueryStats(normalized)
+        stats.count += 1
+        stats.total_ms += duration_ms
+        stats.max_ms = max(stats.max_ms, duration_ms)
+        stats.durations.update(round(duration_ms * 1000))
+
+        if duration_ms >= self.slow_ms and key not in self._explained:
+            self._explained.add(key)
+            logger.warning(f"Slow query {key} ({duration_ms:.1f}ms): {normalized}")
+            if statement.lstrip()[:6].upper() == "SELECT":
+                self._to_explain[key] = (statement, parameters)
+
+    async def explain_pending(self, config: Config) -> int:
+        """EXPLAIN the slow statements found since the last call, returns how many"""
+        pending, self._to_explain = self._to_explain, {}
+        if not pending:
+            return 0
+        async with get_engine(config).connect() as connection:
+            for key, (statement, parameters) in pending.items():
+                try:
+                    result = await connection.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters)
+                    plan = "\n".join(row[0] for row in result)
+                except exc.DBAPIError as e:
+                    plan = f"EXPLAIN failed: {e.orig}"
+                await connection.rollback()
+                if key in self.stats:
+                    self.stats[key].plan = plan
+                logger.warning(f"Plan of slow query {key}:\n{plan}")
+        return len(pending)
+
+    def snapshot(self, limit: int) -> list[OneQueryStats]:
+        """Fingerprints with the most total time first"""
+        ranked = sorted(self.stats.items(), key=lambda item: item[1].total_ms, reverse=True)[:limit]
+        return [
+            OneQueryStats(
+                fingerprint=key,
+                statement=stats.statement,
+                count=stats.count,
+                total_ms=stats.total_ms,
+                mean_ms=stats.total_ms / stats.count,
+                p99_ms=min(stats.durations.quantile(0.99) / 1000, stats.max_ms),
+                max_ms=stats.max_ms,
+                plan=stats.plan,
+            )
+            for key, stats in ranked
+        ]
+
+    def reset(self) -> None:
+        self.stats.clear()
+        self._to_explain.clear()
+        self._explained.clear()
+
+
+@cache
+def get_query_log(config: Config) -> QueryLog:
+    return QueryLog(config)
+
+
+def instrument_engine(engine: Engine, query_log: QueryLog) -> None:
+    """Time every statement of engine, see `dbutils.get_engine`"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        if started := conn.info.get("query_started"):
+            duration_ms = (time.perf_counter() - started.pop()) * 1000
+            if not statement.startswith("EXPLAIN"):
+                query_log.record(statement, None if executemany else parameters, duration_ms)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        if context.connection is not None and (started := context.connection.info.get("query_started")):
+            started.pop()
+
+
+@asynccontextmanager
+async def run_query_explainer(config: Config) -> AsyncGenerator[None, None]:
+    """
+    EXPLAIN newly found slow queries every few seconds
+    """
+    if not config.query_stats:
+        yield
+        return
+
+    query_log = get_query_log(config)
+    async with run_periodically("explain slow queries", EXPLAIN_INTERVAL, lambda: query_log.explain_pending(config)):
+        yield
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import hashlib
+import math
+import time
+from collections import OrderedDict
+
+try:
+    from functools import cache
+except ImportError:
+    from functools import lru_cache as cache
+
+from mini_leaderboard.config import Config
+
+MAX_TRACKED_KEYS = 100_000
+DEDUP_ERROR_RATE = 0.001
+
+
+class TokenBucket:
+    """Classic token bucket, refilled lazily on every take"""
+
+    __slots__ = ("capacity", "rate", "tokens", "updated_at")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = now
+
+    def take(self, now: float) -> float:
+        """
+        Take one token, returns 0 on success or the seconds until a token is available.
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    One token bucket per key.
+
+    Memory is bounded by evicting the least recently used keys; an evicted key
+    simply starts again with a full bucket.
+    """
+
+    def __init__(self, rate: float, burst: int, max_keys: int = MAX_TRACKED_KEYS):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+
+    def take(self, key: str, now: float | None = None) -> float:
+        """
+        Take one token for key, returns 0 on success or the seconds to wait.
+        """
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.take(now)
+
+
+class BloomFilter:
+    """Fixed size Bloom filter sized for `capacity` keys at `error_rate` false positives"""
+
+    def __init__(self, capacity: int, error_rate: float = DEDUP_ERROR_RATE):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str) -> list[int]:
+        # Kirsch-Mitzenmacher: derive all positions from two 64 bit hashes
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class ReplayFilter:
+    """
+    Probabilistic "seen recently" set built from two rotating Bloom filters.
+
+    A key is remembered for at least `window` seconds unless more than `capacity`
+    keys arrive in that time, so memory stays fixed at two filters. False positives
+    (a first vote rejected as a replay) happen at about `error_rate`.
+    """
+
+    def __init__(self, window: float, capacity: int, error_rate: float = DEDUP_ERROR_RATE):
+        self.window = window
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._current = BloomFilter(capacity, error_rate)
+        self._previous = BloomFilter(capacity, error_rate)
+        self._rotated_at: float | None = None
+
+    def _rotate(self, now: float) -> None:
+        if self._rotated_at is None:
+            self._rotated_at = now
+        elif now - self._rotated_at >= self.window or self._current.count >= self.capacity:
+            self._previous = self._current
+            self._current = BloomFilter(self.capacity, self.error_rate)
+            self._rotated_at = now
+
+    def seen(self, key: str, now: float | None = None) -> bool:
+        """
+        Returns True if key was recorded recently.
+        """
+        self._rotate(time.monotonic() if now is None else now)
+        return key in self._current or key in self._previous
+
+    def add(self, key: str, now: float | None = None) -> None:
+        """
+        Record key, once the request it stands for succeeded.
+        """
+        self._rotate(time.monotonic() if now is None else now)
+        if key not in self._current:
+            self._current.add(key)
+
+
+class WriteLimiter:
+    """Admission checks for write endpoints, run before a database connection is taken"""
+
+    def __init__(self, config: Config):
+        self.client = (
+            RateLimiter(config.rate_limit_client, config.rate_limit_client_burst)
+            if config.rate_limit_client > 0
+            else None
+        )
+        self.project = (
+            RateLimiter(config.rate_limit_project, config.rate_limit_project_burst)
+            if config.rate_limit_project > 0
+            else None
+        )
+        self.votes = (
+            ReplayFilter(config.vote_dedup_window, config.vote_dedup_capacity) if config.vote_dedup_window > 0 else None
+        )
+        # Votes admitted but not written yet, concurrent replays of them are rejected too
+        self._pending_votes: set[str] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.client or self.project or self.votes)
+
+    def check(self, client: str, project_id: str | None, item_id: str | None = None) -> tuple[str, float] | None:
+        """
+        Returns None to admit the request, or the rejection reason and the seconds to retry after.
+        """
+        if self.client and (wait := self.client.take(client)):
+            return "Too many requests from this client", wait
+        if self.project and project_id is not None and (wait := self.project.take(project_id)):
+            return "Too many requests for this project", wait
+        if self.votes and project_id is not None and item_id is not None:
+            key = _vote_key(client, project_id, item_id)
+            if key in self._pending_votes or self.votes.seen(key):
+                return "Duplicate vote", self.votes.window
+            self._pending_votes.add(key)
+        return None
+
+    def finish_vote(self, client: str, project_id: str, item_id: str, recorded: bool) -> None:
+        """
+        Settle a vote admitted by `check`: remember it once it was written, forget it
+        otherwise so it can be retried.
+        """
+        if self.votes:
+            key = _vote_key(client, project_id, item_id)
+            self._pending_votes.discard(key)
+            if recorded:
+                self.votes.add(key)
+
+
+def _vote_key(client: str, project_id: str, item_id: str) -> str:
+    return f"{client}\x00{project_id}\x00{item_id}"
+
+
+@cache
+def get_write_limiter(config: Config) -> WriteLimiter:
+    return WriteLimiter(config)
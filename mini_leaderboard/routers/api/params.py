@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from datetime import datetime
+from typing import Annotated, Literal
 
 from pydantic import BaseModel, Field
 
@@ -21,6 +22,13 @@ class LeaderboardResponse(BaseModel):
     next_cursor: str | None = Field(None, description="Cursor for pagination, null if no more entries")
 
 
+class LeaderboardAroundResponse(BaseModel):
+    """Schema for the entries around a leaderboard entry"""
+
+    data: list[OneLeaderboard] = Field(..., description="Entries in leaderboard order, including the requested one")
+    position: int = Field(..., description="Index of the requested entry in data")
+
+
 class AddLeaderboardParams(BaseModel):
     """Schema for adding a new leaderboard entry"""
 
@@ -29,6 +37,51 @@ class AddLeaderboardParams(BaseModel):
     project_id: str = Field(..., description="Project identifier the leaderboard entry belongs to")
 
 
+class LeaderboardStatsResponse(BaseModel):
+    """Schema for score statistics of a project"""
+
+    count: int = Field(..., description="Number of leaderboard entries")
+    min: int | None = Field(None, description="Lowest score, null if there are no entries")
+    max: int | None = Field(None, description="Highest score, null if there are no entries")
+    mean: float | None = Field(None, description="Mean score, null if there are no entries")
+    percentiles: dict[str, float] = Field(
+        ..., description="Estimated score at each requested percentile, keyed like `p50` or `p99.9`"
+    )
+
+
+class LeaderboardRankResponse(BaseModel):
+    """Schema for the rank of a score within a project"""
+
+    rank: int = Field(..., description="1-based rank of the score, tied scores share a rank")
+    count: int = Field(..., description="Number of leaderboard entries")
+    percentile: float = Field(
+        ..., description="Percentage of entries with a worse score, a lower one unless the project ranks `asc`"
+    )
+    approximate: bool = Field(..., description="Whether rank and percentile were estimated from a sketch")
+
+
+Percentile = Annotated[float, Field(ge=0, le=100)]
+ScoreOrder = Literal["desc", "asc"]
+Tiebreak = Literal["first", "last"]
+
+
+class LeaderboardOrderParams(BaseModel):
+    """Schema for how the entries of a project are ranked"""
+
+    order: ScoreOrder = Field(
+        "desc", description="`desc` ranks the highest score first, `asc` the lowest (time trials, golf)"
+    )
+    tiebreak: Tiebreak = Field(
+        "first", description="Among equal scores, `first` ranks the earliest submission first, `last` the latest"
+    )
+
+
+class SetLeaderboardOrderParams(LeaderboardOrderParams):
+    """Schema for setting how the entries of a project are ranked"""
+
+    project_id: str = Field(..., description="Project identifier")
+
+
 class OneMessageboard(BaseModel):
     """Schema for a single messageboard entry"""
 
@@ -82,6 +135,10 @@ class VoteListResponse(BaseModel):
     """Schema for vote list response"""
 
     data: list[OneVote] = Field(..., description="List of vote entries")
+    next_cursor: str | None = Field(None, description="Cursor for pagination, null if no more entries")
+
+
+VoteOrder = Literal["item_id", "votes_desc"]
 
 
 class VoteCountResponse(BaseModel):
@@ -90,8 +147,67 @@ class VoteCountResponse(BaseModel):
     vote_count: int = Field(..., description="Vote count for the item")
 
 
+class VoteCountsResponse(BaseModel):
+    """Schema for batched vote count response"""
+
+    vote_counts: dict[str, int] = Field(..., description="Vote count for each requested item")
+
+
 class AddVoteParams(BaseModel):
     """Schema for adding a vote"""
 
     project_id: str = Field(..., description="Project identifier")
     item_id: str = Field(..., description="Item identifier")
+
+
+class ProjectDashboard(BaseModel):
+    """Schema for the overview of one project"""
+
+    leaderboard: list[OneLeaderboard] = Field([], description="Top leaderboard entries")
+    votes: list[OneVote] = Field([], description="Most voted items")
+    form_count: int = Field(0, description="Count of form entries")
+    messages: list[OneMessageboard] = Field([], description="Latest messageboard entries")
+
+
+class DashboardResponse(BaseModel):
+    """Schema for the overview of many projects"""
+
+    projects: dict[str, ProjectDashboard] = Field(..., description="Overview of each requested project")
+
+
+class OneQueryStats(BaseModel):
+    """Schema for the timings of one statement fingerprint"""
+
+    fingerprint: str = Field(..., description="Hash of the normalized statement")
+    statement: str = Field(..., description="Statement with literals and parameters replaced by ?")
+    count: int = Field(..., description="Number of executions")
+    total_ms: float = Field(..., description="Total execution time")
+    mean_ms: float = Field(..., description="Mean execution time")
+    p99_ms: float = Field(..., description="Estimated 99th percentile of execution time")
+    max_ms: float = Field(..., description="Slowest execution")
+    plan: str | None = Field(None, description="EXPLAIN (ANALYZE, BUFFERS) of the first slow execution")
+
+
+class QueryStatsResponse(BaseModel):
+    """Schema for statement timings of this worker process"""
+
+    enabled: bool = Field(..., description="Whether QUERY_STATS is enabled")
+    queries: list[OneQueryStats] = Field(..., description="Fingerprints with the most total time first")
+
+
+class AdmissionStats(BaseModel):
+    """Schema for the state of one admission budget"""
+
+    slots: int = Field(..., description="Concurrent requests admitted")
+    active: int = Field(..., description="Requests holding a slot")
+    queued: int = Field(..., description="Requests waiting for a slot")
+    rejected: int = Field(..., description="Requests turned away because the queue was full")
+    timed_out: int = Field(..., description="Requests turned away after waiting too long")
+
+
+class AdmissionResponse(BaseModel):
+    """Schema for admission control state of this worker process"""
+
+    enabled: bool = Field(..., description="Whether ADMISSION_CONTROL is enabled")
+    read: AdmissionStats = Field(..., description="Budget of GET requests")
+    write: AdmissionStats = Field(..., description="Budget of other requests")
@@ -1,6 +1,8 @@
+from .admin import router as admin
+from .dashboard import router as dashboard
 from .form import router as form
 from .leaderboard import router as leaderboard
 from .messgaeboard import router as messageboard
 from .vote import router as vote
 
-routers = [leaderboard, messageboard, form, vote]
+routers = [leaderboard, messageboard, form, vote, dashboard, admin]
@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends, Query, Response, status
+
+from mini_leaderboard.admission import get_admission_limiters
+from mini_leaderboard.config import Config, get_config
+from mini_leaderboard.querylog import get_query_log
+from mini_leaderboard.routers.api.params import AdmissionResponse, QueryStatsResponse
+from mini_leaderboard.tracing import TracedRoute
+
+router = APIRouter(
+    route_class=TracedRoute,
+    tags=["admin"],
+    prefix="/api/v1/admin",
+)
+
+
+@router.get("/queries", response_model=QueryStatsResponse)
+async def get_query_stats(
+    limit: int = Query(default=50, ge=1, le=1000, description="Number of fingerprints to return"),
+    config: Config = Depends(get_config),
+):
+    """
+    Statement timings of the worker serving the request, see QUERY_STATS.
+    """
+    if not config.query_stats:
+        return QueryStatsResponse(enabled=False, queries=[])
+    return QueryStatsResponse(enabled=True, queries=get_query_log(config).snapshot(limit))
+
+
+@router.delete("/queries", status_code=status.HTTP_204_NO_CONTENT, response_model=None)
+async def reset_query_stats(config: Config = Depends(get_config)) -> Response:
+    """
+    Forget the statement timings and captured plans of the worker serving the request.
+    """
+    get_query_log(config).reset()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.get("/admission", response_model=AdmissionResponse)
+async def get_admission_stats(config: Config = Depends(get_config)):
+    """
+    Admission budgets and queue depths of the worker serving the request, see ADMISSION_CONTROL.
+    """
+    read, write = get_admission_limiters(config)
+    return AdmissionResponse(enabled=config.admission_control, read=read.stats(), write=write.stats())
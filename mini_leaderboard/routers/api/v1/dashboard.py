@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends, Query
+
+from mini_leaderboard.controllers.dashboard import (
+    DashboardController,
+    get_dashboard_controller,
+)
+from mini_leaderboard.routers.api.params import DashboardResponse
+from mini_leaderboard.tracing import TracedRoute
+
+MAX_DASHBOARD_PROJECTS = 100
+
+router = APIRouter(
+    route_class=TracedRoute,
+    tags=["dashboard"],
+    prefix="/api/v1/dashboard",
+)
+
+
+@router.get("", response_model=DashboardResponse)
+async def get_dashboard(
+    project_id: list[str] = Query(
+        ...,
+        max_length=MAX_DASHBOARD_PROJECTS,
+        description=f"Project identifiers, repeat the parameter for each project (at most {MAX_DASHBOARD_PROJECTS})",
+    ),
+    top: int = Query(default=10, ge=0, le=100, description="Number of top leaderboard entries and voted items"),
+    messages: int = Query(default=10, ge=0, le=100, description="Number of latest messageboard entries"),
+    dashboard_controller: DashboardController = Depends(get_dashboard_controller),
+):
+    """
+    Top leaderboard entries, most voted items, form count and latest messages of
+    many projects in one request.
+    """
+    return await dashboard_controller.get_dashboard(project_id, top, messages)
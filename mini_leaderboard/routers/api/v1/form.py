@@ -2,14 +2,19 @@ from fastapi import APIRouter, Depends, Query, Response, status
 
 from mini_leaderboard.controllers.form import (
     FormController,
+    FormQueue,
     get_form_controller,
+    get_form_queue,
 )
+from mini_leaderboard.idempotency import REPLAYED_HEADER, Idempotency, get_idempotency_key
 from mini_leaderboard.routers.api.params import (
     AddFormParams,
     CountFormResponse,
 )
+from mini_leaderboard.tracing import TracedRoute
 
 router = APIRouter(
+    route_class=TracedRoute,
     tags=["form"],
     prefix="/api/v1/form",
 )
@@ -30,10 +35,29 @@ async def count(
     "/submit",
     status_code=status.HTTP_201_CREATED,
     response_model=None,
+    responses={
+        status.HTTP_202_ACCEPTED: {"description": "Queued for writing, when FORM_QUEUE is enabled"},
+        status.HTTP_503_SERVICE_UNAVAILABLE: {"description": "The submission queue is full"},
+    },
 )
 async def submit_form(
     params: AddFormParams,
+    idempotency_key: Idempotency | None = Depends(get_idempotency_key),
+    form_queue: FormQueue | None = Depends(get_form_queue),
     form_controller: FormController = Depends(get_form_controller),
 ) -> Response:
-    await form_controller.submit_form(params)
+    if form_queue is not None:
+        if idempotency_key and (replayed := form_queue.replayed(params, idempotency_key)):
+            return Response(status_code=replayed, headers={REPLAYED_HEADER: "true"})
+        if not await form_queue.put(params, idempotency_key):
+            return Response(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                content="Form submissions are backed up, retry later.",
+                headers={"Retry-After": "1"},
+            )
+        return Response(status_code=status.HTTP_202_ACCEPTED)
+
+    replayed = await form_controller.submit_form(params, idempotency_key)
+    if replayed:
+        return Response(status_code=replayed, headers={REPLAYED_HEADER: "true"})
     return Response(status_code=status.HTTP_201_CREATED)
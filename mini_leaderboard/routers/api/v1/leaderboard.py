@@ -1,15 +1,29 @@
-from fastapi import APIRouter, Depends, Query, Response, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 
+from mini_leaderboard.config import Config, get_config
 from mini_leaderboard.controllers.leaderboard import (
     LeaderboardController,
     get_leaderboard_controller,
 )
+from mini_leaderboard.dbutils import create_sessionmaker
+from mini_leaderboard.idempotency import REPLAYED_HEADER, Idempotency, get_idempotency_key
+from mini_leaderboard.live import Broadcaster, get_broadcaster, stream_events
 from mini_leaderboard.routers.api.params import (
     AddLeaderboardParams,
+    LeaderboardAroundResponse,
+    LeaderboardOrderParams,
+    LeaderboardRankResponse,
     LeaderboardResponse,
+    LeaderboardStatsResponse,
+    Percentile,
+    SetLeaderboardOrderParams,
 )
+from mini_leaderboard.stats import DEFAULT_PERCENTILES
+from mini_leaderboard.tracing import TracedRoute
 
 router = APIRouter(
+    route_class=TracedRoute,
     tags=["leaderboard"],
     prefix="/api/v1/leaderboard",
 )
@@ -18,9 +32,12 @@ router = APIRouter(
 @router.post("/add", status_code=status.HTTP_201_CREATED)
 async def add_leaderboard(
     params: AddLeaderboardParams,
+    idempotency_key: Idempotency | None = Depends(get_idempotency_key),
     leaderboard_controller: LeaderboardController = Depends(get_leaderboard_controller),
 ) -> Response:
-    await leaderboard_controller.add_leaderboard(params)
+    replayed = await leaderboard_controller.add_leaderboard(params, idempotency_key)
+    if replayed:
+        return Response(status_code=replayed, headers={REPLAYED_HEADER: "true"})
     return Response(status_code=status.HTTP_201_CREATED)
 
 
@@ -31,7 +48,98 @@ async def get_leaderboard(
         default=None,
         description="Cursor for pagination, use `next_cursor` from previous response",
     ),
-    page_size: int = Query(default=100, description="Page size for pagination"),
+    page_size: int = Query(default=100, ge=1, description="Page size for pagination, capped at MAX_PAGE_SIZE"),
     leaderboard_controller: LeaderboardController = Depends(get_leaderboard_controller),
 ) -> LeaderboardResponse:
     return await leaderboard_controller.get_leaderboard(project_id, cursor, page_size)
+
+
+@router.get("/around")
+async def get_leaderboard_around(
+    project_id: str = Query(..., description="Project identifier"),
+    leaderboard_id: str = Query(..., description="Entry to center on"),
+    k: int = Query(default=10, ge=0, le=1000, description="Number of entries above and below the entry"),
+    leaderboard_controller: LeaderboardController = Depends(get_leaderboard_controller),
+) -> LeaderboardAroundResponse:
+    """
+    Neighbours of an entry, without paging `/list` from the top to find it.
+    """
+    around = await leaderboard_controller.get_around(project_id, leaderboard_id, k)
+    if around is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Leaderboard entry not found")
+    return around
+
+
+@router.get("/stats")
+async def get_leaderboard_stats(
+    project_id: str = Query(..., description="Project identifier"),
+    percentiles: list[Percentile] = Query(
+        default=list(DEFAULT_PERCENTILES),
+        description="Percentiles (0-100) to estimate, may be repeated",
+    ),
+    leaderboard_controller: LeaderboardController = Depends(get_leaderboard_controller),
+) -> LeaderboardStatsResponse:
+    """
+    Count, min, max and mean of scores are exact; percentiles are estimated from a
+    log-scaled histogram and are within a few percent of the true score.
+    """
+    return await leaderboard_controller.get_stats(project_id, percentiles)
+
+
+@router.get("/rank")
+async def get_leaderboard_rank(
+    project_id: str = Query(..., description="Project identifier"),
+    score: int = Query(..., description="Score to rank"),
+    approximate: bool = Query(
+        default=False,
+        description="Estimate from the project's quantile sketch, within about 1.7% of the entry count",
+    ),
+    leaderboard_controller: LeaderboardController = Depends(get_leaderboard_controller),
+) -> LeaderboardRankResponse:
+    return await leaderboard_controller.get_rank(project_id, score, approximate)
+
+
+@router.get("/order")
+async def get_leaderboard_order(
+    project_id: str = Query(..., description="Project identifier"),
+    leaderboard_controller: LeaderboardController = Depends(get_leaderboard_controller),
+) -> LeaderboardOrderParams:
+    return await leaderboard_controller.get_order(project_id)
+
+
+@router.put("/order", status_code=status.HTTP_204_NO_CONTENT)
+async def set_leaderboard_order(
+    params: SetLeaderboardOrderParams,
+    leaderboard_controller: LeaderboardController = Depends(get_leaderboard_controller),
+) -> Response:
+    """
+    Rank a project's entries by ascending or descending score, with ties going to
+    the first or the last submission. Listing, `/around`, `/rank`, subscriptions and
+    the dashboard follow the order.
+    """
+    await leaderboard_controller.set_order(params)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.get("/subscribe", response_class=StreamingResponse)
+async def subscribe_leaderboard(
+    project_id: str = Query(..., description="Project identifier"),
+    top: int = Query(default=10, ge=1, le=100, description="Number of top entries in the initial snapshot"),
+    config: Config = Depends(get_config),
+    broadcaster: Broadcaster = Depends(get_broadcaster),
+) -> StreamingResponse:
+    """
+    Subscribe to new leaderboard entries with Server-Sent Events.
+
+    The stream starts with a `snapshot` event holding the top entries, followed by a
+    `leaderboard` event for every new entry. A `resync` event means events were dropped
+    and the client should reload the leaderboard.
+    """
+
+    async def snapshot():
+        # A short-lived session, the stream itself does not hold a database connection
+        async with create_sessionmaker(config)() as session:
+            leaderboard = await LeaderboardController(session, config).get_leaderboard(project_id, None, top)
+        return leaderboard.model_dump(mode="json")["data"]
+
+    return stream_events(broadcaster, "leaderboard", project_id, snapshot, config)
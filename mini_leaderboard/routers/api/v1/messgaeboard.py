@@ -4,12 +4,15 @@ from mini_leaderboard.controllers.messageboard import (
     MessageboardController,
     get_messageboard_controller,
 )
+from mini_leaderboard.idempotency import REPLAYED_HEADER, Idempotency, get_idempotency_key
 from mini_leaderboard.routers.api.params import (
     AddMessageboardParams,
     MessageboardResponse,
 )
+from mini_leaderboard.tracing import TracedRoute
 
 router = APIRouter(
+    route_class=TracedRoute,
     tags=["messageboard"],
     prefix="/api/v1/messageboard",
 )
@@ -18,9 +21,12 @@ router = APIRouter(
 @router.post("/add", status_code=status.HTTP_201_CREATED)
 async def add_messageboard(
     params: AddMessageboardParams,
+    idempotency_key: Idempotency | None = Depends(get_idempotency_key),
     messageboard_controller: MessageboardController = Depends(get_messageboard_controller),
 ) -> Response:
-    await messageboard_controller.add_messageboard(params)
+    replayed = await messageboard_controller.add_messageboard(params, idempotency_key)
+    if replayed:
+        return Response(status_code=replayed, headers={REPLAYED_HEADER: "true"})
     return Response(status_code=status.HTTP_201_CREATED)
 
 
@@ -31,7 +37,7 @@ async def get_messageboard(
         default=None,
         description="Cursor for pagination, use `next_cursor` from previous response",
     ),
-    page_size: int = Query(default=100, description="Page size for pagination"),
+    page_size: int = Query(default=100, ge=1, description="Page size for pagination, capped at MAX_PAGE_SIZE"),
     search_keyword: str | None = Query(
         default=None,
         description="Search keyword for messageboard entries",
@@ -1,17 +1,26 @@
 from fastapi import APIRouter, Depends, Query, Response, status
+from fastapi.responses import StreamingResponse
 
+from mini_leaderboard.config import Config, get_config
 from mini_leaderboard.controllers.vote import (
     VoteController,
     get_vote_controller,
 )
+from mini_leaderboard.dbutils import create_sessionmaker
+from mini_leaderboard.live import Broadcaster, get_broadcaster, stream_events
 from mini_leaderboard.routers.api.params import (
     AddVoteParams,
-    OneVote,
     VoteCountResponse,
+    VoteCountsResponse,
     VoteListResponse,
+    VoteOrder,
 )
+from mini_leaderboard.tracing import TracedRoute
+
+MAX_BATCH_ITEM_IDS = 500
 
 router = APIRouter(
+    route_class=TracedRoute,
     tags=["vote"],
     prefix="/api/v1/vote",
 )
@@ -20,15 +29,29 @@ router = APIRouter(
 @router.get("/list", response_model=VoteListResponse)
 async def list_votes(
     project_id: str = Query(..., description="Project identifier"),
+    cursor: str | None = Query(
+        default=None,
+        description="Cursor for pagination, use `next_cursor` from previous response",
+    ),
+    page_size: int = Query(default=100, ge=1, description="Page size for pagination, capped at MAX_PAGE_SIZE"),
+    order: VoteOrder = Query(
+        default="item_id",
+        description="`item_id` for a stable listing, `votes_desc` for the most voted items first",
+    ),
+    top: int | None = Query(
+        default=None,
+        ge=1,
+        description="Shortcut for the `top` most voted items, overrides cursor, page_size and order",
+    ),
     vote_controller: VoteController = Depends(get_vote_controller),
 ):
     """
-    Get all votes for a specific project.
+    Get votes for a specific project, page by page.
     """
-    votes = await vote_controller.get_all_votes(project_id=project_id)
-    return VoteListResponse(
-        data=[OneVote(project_id=vote.project_id, item_id=vote.item_id, vote_count=vote.vote_count) for vote in votes]
-    )
+    if top is not None:
+        votes = await vote_controller.get_all_votes(project_id=project_id, page_size=top, order="votes_desc")
+        return VoteListResponse(data=votes.data)
+    return await vote_controller.get_all_votes(project_id=project_id, cursor=cursor, page_size=page_size, order=order)
 
 
 @router.get("/count", response_model=VoteCountResponse)
@@ -44,6 +67,23 @@ async def get_vote_count(
     return VoteCountResponse(vote_count=count)
 
 
+@router.get("/counts", response_model=VoteCountsResponse)
+async def get_vote_counts(
+    project_id: str = Query(..., description="Project identifier"),
+    item_id: list[str] = Query(
+        ...,
+        max_length=MAX_BATCH_ITEM_IDS,
+        description=f"Item identifiers, repeat the parameter for each item (at most {MAX_BATCH_ITEM_IDS})",
+    ),
+    vote_controller: VoteController = Depends(get_vote_controller),
+):
+    """
+    Get vote counts for many items in a project at once.
+    """
+    counts = await vote_controller.get_item_votes(project_id=project_id, item_ids=item_id)
+    return VoteCountsResponse(vote_counts=counts)
+
+
 @router.post(
     "/add",
     status_code=status.HTTP_201_CREATED,
@@ -58,3 +98,27 @@ async def add_vote(
     """
     await vote_controller.add_vote(params)
     return Response(status_code=status.HTTP_201_CREATED)
+
+
+@router.get("/subscribe", response_class=StreamingResponse)
+async def subscribe_votes(
+    project_id: str = Query(..., description="Project identifier"),
+    top: int = Query(default=10, ge=1, le=100, description="Number of most voted items in the initial snapshot"),
+    config: Config = Depends(get_config),
+    broadcaster: Broadcaster = Depends(get_broadcaster),
+) -> StreamingResponse:
+    """
+    Subscribe to votes with Server-Sent Events.
+
+    The stream starts with a `snapshot` event holding the most voted items, followed by a
+    `vote` event with the `item_id` and `delta` of every vote. A `resync` event means
+    events were dropped and the client should reload the votes.
+    """
+
+    async def snapshot():
+        # A short-lived session, the stream itself does not hold a database connection
+        async with create_sessionmaker(config)() as session:
+            votes = await VoteController(session, config).get_all_votes(project_id, page_size=top, order="votes_desc")
+        return votes.model_dump(mode="json")["data"]
+
+    return stream_events(broadcaster, "vote", project_id, snapshot, config)
@@ -0,0 +1,322 @@
+"""
+Approximate score ranks from per-project KLL quantile sketches.
+
+A KLL sketch keeps at most about `3 * k` scores whatever the number of entries,
+so a rank is answered in time and memory independent of the board size. With the
+default k=200 the rank is within about 1.7% of the entry count (99% confidence);
+the error shrinks proportionally to 1/k.
+
+Every worker adds new scores to an in-memory delta sketch per project and merges
+the deltas into the `leaderboard_sketch` table every `sketch_flush_interval`
+seconds and on shutdown. Readers merge the stored sketch with the local delta,
+so a worker sees its own writes at once and other workers' after their flush.
+Deltas not yet flushed are lost if a worker crashes; `rebuild-stats` recomputes
+the stored sketches from the entries.
+
+A rebuild counts every entry committed before it, including scores still held in
+deltas. It bumps the stored sketch's `generation`, and each score is tagged with
+the generation its add transaction read after recording the statistics, which
+waits for a running rebuild. Deltas of an older generation than the stored
+sketch were counted by the rebuild and are dropped instead of merged.
+"""
+
+from __future__ import annotations
+
+import math
+import random
+import struct
+import time
+from collections.abc import AsyncGenerator, Iterable
+from contextlib import asynccontextmanager
+from itertools import chain, groupby
+
+try:
+    from functools import cache
+except ImportError:
+    from functools import lru_cache as cache
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from mini_leaderboard.config import Config
+from mini_leaderboard.dbutils import create_sessionmaker, run_periodically
+from mini_leaderboard.log import logger
+from mini_leaderboard.orm import Leaderboard, LeaderboardSketch
+
+DEFAULT_K = 200
+MIN_CAPACITY = 2
+# Ratio between the capacities of adjacent levels
+CAPACITY_DECAY = 2 / 3
+
+_HEADER = struct.Struct("<IQI")
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch over integers (Karnin, Lang and Liberty, 2016).
+
+    Level h holds items that each stand for 2**h inserted values. A full level is
+    sorted and every other item, starting at a random offset, moves up a level.
+    """
+
+    def __init__(self, k: int = DEFAULT_K):
+        self.k = k
+        self.n = 0
+        self._levels: list[list[int]] = [[]]
+        self._size = 0
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self._levels) - level - 1
+        return max(MIN_CAPACITY, math.ceil(self.k * CAPACITY_DECAY**depth))
+
+    def _compress(self) -> None:
+        while self._size >= sum(self._capacity(h) for h in range(len(self._levels))):
+            for h, items in enumerate(self._levels):
+                if len(items) < self._capacity(h):
+                    continue
+                if h + 1 == len(self._levels):
+                    self._levels.append([])
+                items.sort()
+                # An odd item out stays on this level
+                keep = [items.pop()] if len(items) % 2 else []
+                promoted = items[random.getrandbits(1) :: 2]
+                self._levels[h + 1].extend(promoted)
+                self._levels[h] = keep
+                self._size -= len(items) - len(promoted)
+                break
+
+    def update(self, value: int) -> None:
+        self._levels[0].append(value)
+        self.n += 1
+        self._size += 1
+        self._compress()
+
+    def merge(self, other: KLLSketch) -> None:
+        while len(self._levels) < len(other._levels):
+            self._levels.append([])
+        for level, items in zip(self._levels, other._levels):
+            level.extend(items)
+        self.n += other.n
+        self._size += other._size
+        self._compress()
+
+    def rank(self, value: int, inclusive: bool = False) -> int:
+        """Estimated number of values below value (or equal to it when inclusive)"""
+        if inclusive:
+            return sum(sum(1 for item in items if item <= value) << h for h, items in enumerate(self._levels))
+        return sum(sum(1 for item in items if item < value) << h for h, items in enumerate(self._levels))
+
+    def quantile(self, q: float) -> int | None:
+        """Estimated value at quantile q (0-1), None for an empty sketch"""
+        if not self.n:
+            return None
+        weighted = sorted((item, 1 << h) for h, items in enumerate(self._levels) for item in items)
+        seen = 0
+        for value, weight in weighted:
+            seen += weight
+            if seen >= q * self.n:
+                return value
+        return weighted[-1][0]
+
+    def copy(self) -> KLLSketch:
+        sketch = KLLSketch(self.k)
+        sketch.merge(self)
+        return sketch
+
+    def to_bytes(self) -> bytes:
+        sizes = [len(items) for items in self._levels]
+        return (
+            _HEADER.pack(self.k, self.n, len(sizes))
+            + struct.pack(f"<{len(sizes)}I", *sizes)
+            + struct.pack(f"<{self._size}q", *chain.from_iterable(self._levels))
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> KLLSketch:
+        k, n, num_levels = _HEADER.unpack_from(data)
+        offset = _HEADER.size
+        sizes = struct.unpack_from(f"<{num_levels}I", data, offset)
+        offset += 4 * num_levels
+        values = struct.unpack_from(f"<{sum(sizes)}q", data, offset)
+        sketch = cls(k)
+        sketch.n = n
+        sketch._size = len(values)
+        sketch._levels = []
+        start = 0
+        for size in sizes:
+            sketch._levels.append(list(values[start : start + size]))
+            start += size
+        return sketch
+
+    @classmethod
+    def from_values(cls, values: Iterable[int], k: int = DEFAULT_K) -> KLLSketch:
+        sketch = cls(k)
+        for value in values:
+            sketch.update(value)
+        return sketch
+
+
+class SketchStore:
+    """Per-worker delta sketches and a read cache in front of the `leaderboard_sketch` table"""
+
+    def __init__(self, config: Config):
+        self.k = config.sketch_k
+        self.ttl = config.sketch_flush_interval
+        # Keyed by project and generation
+        self._pending: dict[tuple[str, int], KLLSketch] = {}
+        # Deltas being written by a running flush, still merged into reads
+        self._flushing: dict[tuple[str, int], KLLSketch] = {}
+        self._cache: dict[str, tuple[float, int, KLLSketch | None]] = {}
+
+    def record(self, project_id: str, score: int, generation: int = 0) -> None:
+        sketch = self._pending.get((project_id, generation))
+        if sketch is None:
+            sketch = self._pending[project_id, generation] = KLLSketch(self.k)
+        sketch.update(score)
+
+    async def get(self, db: AsyncSession, project_id: str) -> KLLSketch | None:
+        """Stored sketch of a project merged with this worker's unflushed scores"""
+        now = time.monotonic()
+        cached = self._cache.get(project_id)
+        if cached is None or cached[0] <= now:
+            result = await db.execute(
+                select(LeaderboardSketch.generation, LeaderboardSketch.data).where(
+                    LeaderboardSketch.project_id == project_id
+                )
+            )
+            row = result.one_or_none()
+            cached = self._cache[project_id] = (
+                (now + self.ttl, row.generation, KLLSketch.from_bytes(row.data)) if row else (now + self.ttl, 0, None)
+            )
+
+        _, generation, stored = cached
+        parts = [stored]
+        for deltas in (self._flushing, self._pending):
+            parts.extend(
+                delta
+                for (delta_project_id, delta_generation), delta in deltas.items()
+                if delta_project_id == project_id and delta_generation >= generation
+            )
+        parts = [part for part in parts if part is not None]
+        if len(parts) <= 1:
+            return parts[0] if parts else None
+        sketch = parts[0].copy()
+        for part in parts[1:]:
+            sketch.merge(part)
+        return sketch
+
+    async def flush(self, db: AsyncSession) -> int:
+        """Merge the pending deltas into the stored sketches, returns the number of projects flushed"""
+        pending = self._flushing = self._pending
+        self._pending = {}
+        projects = {project_id for project_id, _ in pending}
+        try:
+            for project_id in sorted(projects):
+                result = await db.execute(
+                    select(LeaderboardSketch.generation, LeaderboardSketch.data)
+                    .where(LeaderboardSketch.project_id == project_id)
+                    .with_for_update()
+                )
+                row = result.one_or_none()
+                generation = row.generation if row else 0
+                sketch = KLLSketch.from_bytes(row.data) if row else KLLSketch(self.k)
+                for (delta_project_id, delta_generation), delta in pending.items():
+                    # Older deltas were counted by a rebuild
+                    if delta_project_id == project_id and delta_generation >= generation:
+                        sketch.merge(delta)
+                        generation = max(generation, delta_generation)
+                await upsert_sketch(db, project_id, sketch, generation)
+            await db.commit()
+        except Exception:
+            # Keep the deltas for the next flush
+            for key, delta in pending.items():
+                if key in self._pending:
+                    delta.merge(self._pending[key])
+                self._pending[key] = delta
+            raise
+        finally:
+            self._flushing = {}
+        for project_id in projects:
+            self._cache.pop(project_id, None)
+        return len(projects)
+
+
+async def get_generation(db: AsyncSession, project_id: str) -> int:
+    """
+    Generation of the project's stored sketch, to tag a score recorded in the same
+    transaction after `stats.record_score`.
+    """
+    result = await db.execute(select(LeaderboardSketch.generation).where(LeaderboardSketch.project_id == project_id))
+    return result.scalar_one_or_none() or 0
+
+
+async def upsert_sketch(db: AsyncSession, project_id: str, sketch: KLLSketch, generation: int = 0) -> None:
+    stmt = insert(LeaderboardSketch).values(
+        project_id=project_id, data=sketch.to_bytes(), count=sketch.n, generation=generation
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[LeaderboardSketch.project_id],
+        set_={"data": stmt.excluded.data, "count": stmt.excluded.count, "generation": stmt.excluded.generation},
+    )
+    await db.execute(stmt)
+
+
+@cache
+def get_sketch_store(config: Config) -> SketchStore:
+    return SketchStore(config)
+
+
+@asynccontextmanager
+async def run_sketch_flusher(config: Config) -> AsyncGenerator[None, None]:
+    """
+    Flush pending sketches every `sketch_flush_interval` seconds and once more on shutdown
+    """
+    store = get_sketch_store(config)
+
+    async def flush():
+        async with create_sessionmaker(config)() as session:
+            flushed = await store.flush(session)
+        if flushed:
+            logger.debug(f"Flushed score sketches of {flushed} projects")
+
+    async with run_periodically("flush score sketches", config.sketch_flush_interval, flush):
+        yield
+    try:
+        await flush()
+    except Exception:
+        logger.exception("Failed to flush score sketches on shutdown")
+
+
+def next_generation(connection: Connection) -> int:
+    """A sketch generation above every stored one, read before deleting the sketches to rebuild"""
+    return connection.execute(select(func.coalesce(func.max(LeaderboardSketch.generation), 0))).scalar_one() + 1
+
+
+def rebuild_sketches(connection: Connection, entries, k: int = DEFAULT_K, generation: int = 0) -> None:
+    """
+    Recompute stored sketches from the leaderboard entries matching `entries`.
+
+    Runs synchronously inside the caller's transaction, see `stats.rebuild_stats`.
+    The rebuilt sketches get `generation`, from `next_generation`, so workers drop
+    their deltas of scores the rebuild counted.
+    """
+    rows = connection.execute(
+        select(Leaderboard.project_id, Leaderboard.score).where(entries).order_by(Leaderboard.project_id),
+        execution_options={"yield_per": 10_000},
+    )
+    sketches = []
+    for project_id, group in groupby(rows, key=lambda row: row.project_id):
+        sketch = KLLSketch.from_values((row.score for row in group), k)
+        sketches.append({
+            "project_id": project_id,
+            "data": sketch.to_bytes(),
+            "count": sketch.n,
+            "generation": generation,
+        })
+        if len(sketches) >= 1000:
+            connection.execute(insert(LeaderboardSketch), sketches)
+            sketches = []
+    if sketches:
+        connection.execute(insert(LeaderboardSketch), sketches)
@@ -0,0 +1,223 @@
+"""
+Per-project score statistics kept up to date on every `add_leaderboard`.
+
+Each add updates one of `stats_shards` rows of the project, picked at random, so
+concurrent adds to a busy project do not queue on one row lock; reads sum the
+shards.
+
+Scores are counted in log-scaled buckets: values with an absolute value below
+`2 * SUB_BUCKETS` get a bucket of their own, larger ones share a bucket with
+values less than `1 / SUB_BUCKETS` (6.25%) apart. Percentiles interpolate inside
+the bucket they fall in, so they are exact for small scores and within a few
+percent of the true value otherwise. Count, min, max and mean are exact.
+"""
+
+from __future__ import annotations
+
+import random
+from collections.abc import Iterable
+
+from sqlalchemy import BigInteger, Text, bindparam, case, cast, create_engine, delete, func, select, text
+from sqlalchemy.dialects.postgresql import BIT, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from mini_leaderboard.log import logger
+from mini_leaderboard.orm import Leaderboard, LeaderboardHistogram, LeaderboardSketch, LeaderboardStats
+from mini_leaderboard.routers.api.params import LeaderboardStatsResponse
+from mini_leaderboard.sketch import DEFAULT_K, next_generation, rebuild_sketches
+
+SUB_BUCKETS = 16
+_SUB_BITS = SUB_BUCKETS.bit_length() - 1
+DEFAULT_PERCENTILES = (50.0, 90.0, 99.0)
+
+_RECORD_STATS = insert(LeaderboardStats).values(
+    project_id=bindparam("project_id"),
+    shard=bindparam("shard"),
+    count=1,
+    total=bindparam("score"),
+    min_score=bindparam("score"),
+    max_score=bindparam("score"),
+)
+_RECORD_STATS = _RECORD_STATS.on_conflict_do_update(
+    index_elements=[LeaderboardStats.project_id, LeaderboardStats.shard],
+    set_={
+        "count": LeaderboardStats.count + 1,
+        "total": LeaderboardStats.total + _RECORD_STATS.excluded.total,
+        "min_score": func.least(LeaderboardStats.min_score, _RECORD_STATS.excluded.min_score),
+        "max_score": func.greatest(LeaderboardStats.max_score, _RECORD_STATS.excluded.max_score),
+    },
+)
+_RECORD_BUCKET = insert(LeaderboardHistogram).values(
+    project_id=bindparam("project_id"), bucket=bindparam("bucket"), shard=bindparam("shard"), count=1
+)
+_RECORD_BUCKET = _RECORD_BUCKET.on_conflict_do_update(
+    index_elements=[LeaderboardHistogram.project_id, LeaderboardHistogram.bucket, LeaderboardHistogram.shard],
+    set_={"count": LeaderboardHistogram.count + 1},
+)
+
+
+def bucket_of(score: int) -> int:
+    """Histogram bucket of a score, buckets are ordered like the scores they hold"""
+    if score < 0:
+        # Mirror the non-negative buckets onto -1, -2, ...
+        return -1 - bucket_of(-1 - score)
+    if score < 2 * SUB_BUCKETS:
+        return score
+    shift = score.bit_length() - 1 - _SUB_BITS
+    return shift * SUB_BUCKETS + (score >> shift)
+
+
+def bucket_bounds(bucket: int) -> tuple[int, int]:
+    """Smallest and largest score of a bucket"""
+    if bucket < 0:
+        low, high = bucket_bounds(-1 - bucket)
+        return -1 - high, -1 - low
+    if bucket < 2 * SUB_BUCKETS:
+        return bucket, bucket
+    shift = bucket // SUB_BUCKETS - 1
+    mantissa = bucket % SUB_BUCKETS + SUB_BUCKETS
+    return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+
+def percentiles_from_histogram(
+    histogram: Iterable[tuple[int, int]],
+    percentiles: Iterable[float],
+    min_score: int,
+    max_score: int,
+) -> dict[float, float]:
+    """
+    Estimate percentiles (0-100) from (bucket, count) pairs sorted by bucket.
+
+    The value at a rank is interpolated linearly inside its bucket, the ends of the
+    outermost buckets are clamped to the known min and max.
+    """
+    histogram = list(histogram)
+    total = sum(count for _, count in histogram)
+    result = {}
+    for percentile in percentiles:
+        if percentile <= 0 or percentile >= 100:
+            result[percentile] = float(min_score if percentile <= 0 else max_score)
+            continue
+        rank = percentile / 100 * (total - 1)
+        seen = 0
+        for bucket, count in histogram:
+            if rank < seen + count:
+                low, high = bucket_bounds(bucket)
+                low, high = max(low, min_score), min(high, max_score)
+                result[percentile] = low + (high - low) * (rank - seen + 0.5) / count
+                break
+            seen += count
+        else:
+            result[percentile] = float(max_score)
+    return result
+
+
+async def record_score(db: AsyncSession, project_id: str, score: int, shards: int = 1) -> None:
+    """Add one score to one of the `shards` rows of the project statistics, in the caller's transaction"""
+    shard = random.randrange(shards) if shards > 1 else 0  # noqa: S311
+    await db.execute(_RECORD_STATS, {"project_id": project_id, "shard": shard, "score": score})
+    await db.execute(_RECORD_BUCKET, {"project_id": project_id, "bucket": bucket_of(score), "shard": shard})
+
+
+async def get_stats(
+    db: AsyncSession,
+    project_id: str,
+    percentiles: Iterable[float] = DEFAULT_PERCENTILES,
+) -> LeaderboardStatsResponse:
+    result = await db.execute(
+        select(
+            cast(func.sum(LeaderboardStats.count), BigInteger).label("count"),
+            cast(func.sum(LeaderboardStats.total), BigInteger).label("total"),
+            func.min(LeaderboardStats.min_score).label("min_score"),
+            func.max(LeaderboardStats.max_score).label("max_score"),
+        ).where(LeaderboardStats.project_id == project_id)
+    )
+    stats = result.one()
+    if not stats.count:
+        return LeaderboardStatsResponse(count=0, percentiles={})
+
+    result = await db.execute(
+        select(LeaderboardHistogram.bucket, cast(func.sum(LeaderboardHistogram.count), BigInteger))
+        .where(LeaderboardHistogram.project_id == project_id)
+        .group_by(LeaderboardHistogram.bucket)
+        .order_by(LeaderboardHistogram.bucket)
+    )
+    estimates = percentiles_from_histogram(result.all(), percentiles, stats.min_score, stats.max_score)
+    return LeaderboardStatsResponse(
+        count=stats.count,
+        min=stats.min_score,
+        max=stats.max_score,
+        mean=stats.total / stats.count,
+        percentiles={f"p{percentile:g}": value for percentile, value in estimates.items()},
+    )
+
+
+def bucket_expression(score):
+    """SQL expression computing `bucket_of` for a score column, used to rebuild histograms"""
+    magnitude = case((score < 0, -1 - score), else_=score)
+    bit_length = func.length(func.ltrim(cast(cast(magnitude, BIT(32)), Text), "0"))
+    shift = bit_length - 1 - _SUB_BITS
+    bucket = case(
+        (magnitude < 2 * SUB_BUCKETS, magnitude),
+        else_=shift * SUB_BUCKETS + magnitude.op(">>")(shift),
+    )
+    return case((score < 0, -1 - bucket), else_=bucket)
+
+
+def rebuild_stats(db_url: str, project_ids: list[str] | None = None, sketch_k: int = DEFAULT_K) -> None:
+    """
+    Recompute statistics of the given projects (all projects if None) from the leaderboard table.
+
+    Approximate-rank sketches are rebuilt as well. The statistics tables are locked
+    for the rebuild, so concurrent `add_leaderboard` calls wait and are counted
+    exactly once.
+    """
+    entries = Leaderboard.score.is_not(None)
+    clear_stats = delete(LeaderboardStats)
+    clear_histogram = delete(LeaderboardHistogram)
+    clear_sketches = delete(LeaderboardSketch)
+    if project_ids is not None:
+        entries &= Leaderboard.project_id.in_(project_ids)
+        clear_stats = clear_stats.where(LeaderboardStats.project_id.in_(project_ids))
+        clear_histogram = clear_histogram.where(LeaderboardHistogram.project_id.in_(project_ids))
+        clear_sketches = clear_sketches.where(LeaderboardSketch.project_id.in_(project_ids))
+
+    # Grouped in an outer query, Postgres does not match expressions with bind parameters
+    buckets = select(Leaderboard.project_id, bucket_expression(Leaderboard.score).label("bucket")).where(entries)
+    buckets = buckets.subquery("buckets")
+    engine = create_engine(db_url)
+    try:
+        with engine.begin() as connection:
+            connection.execute(
+                text("LOCK TABLE leaderboard_stats, leaderboard_histogram, leaderboard_sketch IN EXCLUSIVE MODE")
+            )
+            generation = next_generation(connection)
+            connection.execute(clear_stats)
+            connection.execute(clear_histogram)
+            connection.execute(clear_sketches)
+            connection.execute(
+                insert(LeaderboardStats).from_select(
+                    ["project_id", "count", "total", "min_score", "max_score"],
+                    select(
+                        Leaderboard.project_id,
+                        func.count(),
+                        func.sum(Leaderboard.score),
+                        func.min(Leaderboard.score),
+                        func.max(Leaderboard.score),
+                    )
+                    .where(entries)
+                    .group_by(Leaderboard.project_id),
+                )
+            )
+            connection.execute(
+                insert(LeaderboardHistogram).from_select(
+                    ["project_id", "bucket", "count"],
+                    select(buckets.c.project_id, buckets.c.bucket, func.count()).group_by(
+                        buckets.c.project_id, buckets.c.bucket
+                    ),
+                )
+            )
+            rebuild_sketches(connection, entries, sketch_k, generation)
+    finally:
+        engine.dispose()
+    logger.info(f"Rebuilt score statistics: {'all projects' if project_ids is None else project_ids}")
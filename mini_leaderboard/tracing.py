@@ -0,0 +1,377 @@
+"""
+Opt-in request tracing.
+
+Every request gets an `X-Request-ID` response header, taken from the request when
+the client sent one. With `TRACE_EXPORT` set, a sampled share of requests also
+records a tree of spans:
+
+    GET /api/v1/messageboard/list         root, with the status code
+      middleware verify_token             function middlewares and everything below them
+        route                             FastAPI request handling
+          dependencies                    body/query validation and `Depends` resolution
+          endpoint                        the endpoint function
+            pool checkout                 waiting for a pooled connection
+            sql                           each statement, with its rowcount
+            commit                        session flush and commit
+          serialization                   response model validation and rendering
+
+Finished traces are batched in memory and written every second to a JSON-lines
+file, one span per line, or POSTed as OTLP/HTTP JSON when `TRACE_EXPORT` is an
+http(s) URL. Statements are recorded without their parameters.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import json
+import random
+import re
+import time
+import uuid
+from collections.abc import AsyncGenerator, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+try:
+    from functools import cache
+except ImportError:
+    from functools import lru_cache as cache
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from mini_leaderboard.config import Config, get_config
+from mini_leaderboard.log import logger
+
+REQUEST_ID_HEADER = "X-Request-ID"
+SERVICE_NAME = "mini-leaderboard"
+EXPORT_INTERVAL = 1.0
+# Spans kept for the next export, older ones are dropped when the exporter falls behind
+MAX_PENDING_SPANS = 100_000
+MAX_STATEMENT_LENGTH = 2000
+
+_VALID_REQUEST_ID = re.compile(r"[\w.:-]{1,128}")
+
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+_request_id: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+
+class Span:
+    __slots__ = ("attributes", "end_ns", "name", "parent_id", "span_id", "start_ns", "trace")
+
+    def __init__(self, trace: Trace, name: str, parent_id: str | None, attributes: dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns: int | None = None
+        trace.spans.append(self)
+
+    def child(self, name: str, **attributes: Any) -> Span:
+        return Span(self.trace, name, self.span_id, attributes)
+
+    def finish(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+        self.end_ns = time.time_ns()
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": (self.end_ns - self.start_ns) / 1e6,
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+    __slots__ = ("spans", "trace_id")
+
+    def __init__(self):
+        self.trace_id = uuid.uuid4().hex
+        self.spans: list[Span] = []
+
+    def finish(self) -> None:
+        """Close spans left open by a failure"""
+        now = time.time_ns()
+        for span_ in self.spans:
+            if span_.end_ns is None:
+                span_.end_ns = now
+                span_.attributes["unfinished"] = True
+
+
+def get_request_id() -> str | None:
+    return _request_id.get()
+
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span | None]:
+    """Record the block as a child of the current span, a no-op outside of a traced request"""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = parent.child(name, **attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    finally:
+        _current_span.reset(token)
+        child.finish()
+
+
+def _traced_endpoint(endpoint):
+    @functools.wraps(endpoint)
+    async def traced(**kwargs):
+        route = _current_span.get()
+        if route is None:
+            return await endpoint(**kwargs)
+        # Everything FastAPI did between entering the route and calling the endpoint
+        dependencies = route.child("dependencies")
+        dependencies.start_ns = route.start_ns
+        dependencies.finish()
+        with span("endpoint") as endpoint_span:
+            result = await endpoint(**kwargs)
+        # Picked up by the route handler to time serialization
+        route.attributes["_endpoint_end_ns"] = endpoint_span.end_ns
+        return result
+
+    traced.__traced__ = True
+    return traced
+
+
+class TracedRoute(APIRoute):
+    """
+    APIRoute recording dependency resolution, the endpoint and serialization as spans.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs: Any):
+        if asyncio.iscoroutinefunction(endpoint) and not getattr(endpoint, "__traced__", False):
+            endpoint = _traced_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def traced_handler(request):
+            with span("route", route=self.path) as route:
+                response = await handler(request)
+                if route is not None and (endpoint_end := route.attributes.pop("_endpoint_end_ns", None)):
+                    serialization = route.child("serialization")
+                    serialization.start_ns = endpoint_end
+                    serialization.finish()
+            return response
+
+        return traced_handler
+
+
+class TracingMiddleware:
+    """
+    Tag responses with a request ID and record the root span of sampled requests.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        config = get_config()
+        request_id = Headers(scope=scope).get(REQUEST_ID_HEADER)
+        if not request_id or not _VALID_REQUEST_ID.fullmatch(request_id):
+            request_id = uuid.uuid4().hex
+        root = None
+        if config.trace_export and random.random() < config.trace_sample_rate:  # noqa: S311
+            root = Span(Trace(), f"{scope['method']} {scope['path']}", None, {"request_id": request_id})
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append(REQUEST_ID_HEADER, request_id)
+                if root is not None:
+                    root.attributes["status_code"] = message["status"]
+            await send(message)
+
+        id_token = _request_id.set(request_id)
+        span_token = _current_span.set(root)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _current_span.reset(span_token)
+            _request_id.reset(id_token)
+            if root is not None:
+                root.finish()
+                root.trace.finish()
+                get_span_exporter(config).add(root.trace)
+
+
+class TracedQueuePool(AsyncAdaptedQueuePool):
+    """Connection pool recording the wait for a connection"""
+
+    def _do_get(self):
+        parent = _current_span.get()
+        if parent is None:
+            return super()._do_get()
+        checkout = parent.child("pool checkout")
+        try:
+            return super()._do_get()
+        finally:
+            checkout.finish()
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    parent = _current_span.get()
+    if parent is not None:
+        conn.info.setdefault("trace_spans", []).append(
+            parent.child("sql", statement=statement[:MAX_STATEMENT_LENGTH], executemany=executemany)
+        )
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    if spans := conn.info.get("trace_spans"):
+        spans.pop().finish(rowcount=cursor.rowcount)
+
+
+def _handle_error(context):
+    if context.connection is not None and (spans := context.connection.info.get("trace_spans")):
+        spans.pop().finish(error=type(context.original_exception).__name__)
+
+
+def _before_commit(session):
+    parent = _current_span.get()
+    if parent is not None:
+        session.info["trace_commit"] = parent.child("commit")
+
+
+def _after_commit(session):
+    if commit := session.info.pop("trace_commit", None):
+        commit.finish()
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Record statements and commits as spans, see `dbutils.get_engine`"""
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    event.listen(engine, "after_cursor_execute", _after_execute)
+    event.listen(engine, "handle_error", _handle_error)
+    if not event.contains(Session, "before_commit", _before_commit):
+        event.listen(Session, "before_commit", _before_commit)
+        event.listen(Session, "after_commit", _after_commit)
+
+
+def _otlp_attributes(attributes: dict[str, Any]) -> list[dict[str, Any]]:
+    result = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            typed = {"boolValue": value}
+        elif isinstance(value, int):
+            typed = {"intValue": str(value)}
+        elif isinstance(value, float):
+            typed = {"doubleValue": value}
+        else:
+            typed = {"stringValue": str(value)}
+        result.append({"key": key, "value": typed})
+    return result
+
+
+def to_otlp(spans: list[dict[str, Any]]) -> dict[str, Any]:
+    """OTLP/HTTP JSON payload of exported span dicts"""
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "mini_leaderboard"},
+                        "spans": [
+                            {
+                                "traceId": span_["trace_id"],
+                                "spanId": span_["span_id"],
+                                "parentSpanId": span_["parent_id"] or "",
+                                "name": span_["name"],
+                                "startTimeUnixNano": str(span_["start_ns"]),
+                                "endTimeUnixNano": str(span_["end_ns"]),
+                                "attributes": _otlp_attributes(span_["attributes"]),
+                            }
+                            for span_ in spans
+                        ],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+class SpanExporter:
+    """Batches finished traces and writes them to `trace_export`"""
+
+    def __init__(self, target: str):
+        self.target = target
+        self._pending: list[dict[str, Any]] = []
+        self.dropped = 0
+
+    def add(self, trace: Trace) -> None:
+        if len(self._pending) + len(trace.spans) > MAX_PENDING_SPANS:
+            self.dropped += len(trace.spans)
+            return
+        self._pending.extend(span_.to_dict() for span_ in trace.spans)
+
+    def _write_lines(self, spans: list[dict[str, Any]]) -> None:
+        with open(self.target, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(span_, default=str) + "\n" for span_ in spans)
+
+    async def flush(self) -> int:
+        """Export the pending spans, returns the number of spans exported"""
+        spans, self._pending = self._pending, []
+        if not spans:
+            return 0
+        if self.target.startswith(("http://", "https://")):
+            import httpx
+
+            async with httpx.AsyncClient(timeout=5) as client:
+                response = await client.post(self.target, json=to_otlp(spans))
+                response.raise_for_status()
+        else:
+            await asyncio.to_thread(self._write_lines, spans)
+        return len(spans)
+
+
+@cache
+def get_span_exporter(config: Config) -> SpanExporter:
+    return SpanExporter(config.trace_export)
+
+
+@asynccontextmanager
+async def run_trace_exporter(config: Config) -> AsyncGenerator[None, None]:
+    """
+    Export finished traces every second and once more on shutdown
+    """
+    if not config.trace_export:
+        yield
+        return
+
+    from mini_leaderboard.dbutils import run_periodically
+
+    exporter = get_span_exporter(config)
+    async with run_periodically("export traces", EXPORT_INTERVAL, exporter.flush):
+        yield
+    try:
+        await exporter.flush()
+    except Exception:
+        logger.exception("Failed to export traces on shutdown")
@@ -0,0 +1,114 @@
+"""
+Startup warm-up of the connection pool and the hot project pages.
+
+A fresh worker starts with an empty pool and cold caches, so its first requests
+pay for opening connections (TCP, TLS, authentication) and for reading the hot
+pages from disk. With `DB_WARMUP_CONNECTIONS`, the worker opens that many pooled
+connections at startup; with `WARMUP_PROJECT_IDS`, each of them also runs the
+first-page queries of those projects, warming Postgres buffers, the statements
+psycopg prepares per connection and the worker's own caches.
+
+Warm-up runs in the background and `GET /ready` answers 503 until it finished, so
+a load balancer only routes to warm workers. A failed warm-up is logged and the
+worker becomes ready anyway.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager, suppress
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from mini_leaderboard.config import Config
+from mini_leaderboard.controllers.leaderboard import LeaderboardController
+from mini_leaderboard.controllers.messageboard import MessageboardController
+from mini_leaderboard.controllers.vote import VoteController
+from mini_leaderboard.dbutils import create_sessionmaker
+from mini_leaderboard.log import logger
+
+# Default page size of the list endpoints
+PAGE_SIZE = 100
+
+_ready = threading.Event()
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+async def warm_project(session: AsyncSession, config: Config, project_id: str) -> None:
+    """Run the first-page queries of a project on the session's connection"""
+    # psycopg prepares a statement on its `db_prepare_threshold + 1`-th execution on a connection
+    rounds = 1 if config.db_prepare_threshold is None else config.db_prepare_threshold + 1
+    for _ in range(rounds):
+        await LeaderboardController(session, config).get_leaderboard(project_id, None, PAGE_SIZE)
+        await MessageboardController(session, config).get_messageboard(project_id, None, PAGE_SIZE, None)
+        await VoteController(session, config).get_all_votes(project_id, page_size=PAGE_SIZE)
+
+
+async def warm_up(config: Config) -> None:
+    connections = min(config.db_warmup_connections, config.db_pool_size)
+    if config.warmup_project_ids:
+        connections = max(connections, 1)
+    sessionmaker = create_sessionmaker(config)
+    opened = 0
+    all_opened = asyncio.Event()
+
+    async def warm_connection():
+        nonlocal opened
+        async with sessionmaker() as session:
+            try:
+                await session.connection()
+            finally:
+                opened += 1
+                if opened == connections:
+                    all_opened.set()
+            # Hold the connection until all are open, so each task opens its own
+            await all_opened.wait()
+            for project_id in config.warmup_project_ids:
+                await warm_project(session, config, project_id)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(warm_connection() for _ in range(connections)), return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
+    logger.info(
+        f"Warmed up {connections} connections and {len(config.warmup_project_ids)} projects"
+        f" in {(time.perf_counter() - started) * 1000:.0f}ms"
+    )
+
+
+@asynccontextmanager
+async def run_warmup(config: Config) -> AsyncGenerator[None, None]:
+    """
+    Warm up in the background, the worker is ready once it finished
+    """
+    if not config.db_warmup_connections and not config.warmup_project_ids:
+        _ready.set()
+        try:
+            yield
+        finally:
+            _ready.clear()
+        return
+
+    async def warm():
+        try:
+            await warm_up(config)
+        except Exception:
+            logger.exception("Warm-up failed")
+        _ready.set()
+
+    _ready.clear()
+    task = asyncio.create_task(warm())
+    try:
+        yield
+    finally:
+        _ready.clear()
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
@@ -8,12 +8,28 @@ import pytest
 from click.testing import CliRunner
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
 
+from mini_leaderboard.admission import get_admission_limiters
 from mini_leaderboard.app import app as APP
-from mini_leaderboard.cli import drop, init
-from mini_leaderboard.config import get_config
+from mini_leaderboard.cli import init
+from mini_leaderboard.config import Config, get_config
+from mini_leaderboard.controllers.leaderboard import get_order_cache
+from mini_leaderboard.dbutils import get_db_session, get_engine, truncate_all
+from mini_leaderboard.idempotency import get_idempotency_store
+from mini_leaderboard.querylog import get_query_log
+from mini_leaderboard.ratelimit import get_write_limiter
+from mini_leaderboard.sketch import get_sketch_store
 
 _HERE = Path(__file__).parent
+IN_PROCESS_STATE = [
+    get_admission_limiters,
+    get_idempotency_store,
+    get_order_cache,
+    get_query_log,
+    get_sketch_store,
+    get_write_limiter,
+]
 MOCK_SERVER = _HERE / "mock_server.py"
 
 
@@ -79,13 +95,27 @@ def pg_port(docker_client: docker.DockerClient):
             container.stop()
 
 
+@pytest.fixture(scope="session")
+def db_url(pg_port):
+    return f"postgres:postgres@localhost:{pg_port}/postgres"
+
+
+@pytest.fixture(scope="session")
+def reset_engine(db_url):
+    engine = create_engine(f"postgresql+psycopg://{db_url}")
+    yield engine
+    engine.dispose()
+
+
 @pytest.fixture
-async def app(pg_port, monkeypatch):
-    monkeypatch.setenv("DB_URL", f"postgres:postgres@localhost:{pg_port}/postgres")
-    runner = CliRunner()
-    # Drop all before testing
-    result = runner.invoke(drop, ["--yes"])
-    assert result.exit_code == 0
+async def app(db_url, reset_engine, monkeypatch):
+    monkeypatch.setenv("DB_URL", db_url)
+    # Empty all tables before testing
+    with reset_engine.begin() as connection:
+        truncate_all(connection)
+    # And forget what earlier tests left in the per-worker caches and limiters
+    for factory in IN_PROCESS_STATE:
+        factory.cache_clear()
     yield APP
 
 
@@ -97,3 +127,46 @@ def client(app):
         headers=({"Authorization": f"Bearer {config.api_token}"} if config.api_token else {}),
     ) as client:
         yield client
+
+
+async def _begin(config: Config) -> AsyncConnection:
+    connection = await get_engine(config).connect()
+    await connection.begin()
+    return connection
+
+
+async def _rollback(connection: AsyncConnection) -> None:
+    await connection.rollback()
+    await connection.close()
+
+
+@pytest.fixture
+def rollback_client(db_url, monkeypatch):
+    """
+    Like `client`, but the test runs in one transaction that is rolled back afterwards.
+
+    Tables are not emptied first, so tests must use their own project ids (see case_id).
+    Only request sessions from get_db_session are covered; background jobs, the form
+    queue and SSE snapshots open their own sessions and commit for real.
+    """
+    monkeypatch.setenv("DB_URL", db_url)
+    config = get_config()
+    with TestClient(
+        APP,
+        headers=({"Authorization": f"Bearer {config.api_token}"} if config.api_token else {}),
+    ) as client:
+        connection = client.portal.call(_begin, config)
+
+        async def get_test_db_session():
+            # Commits inside requests only release a savepoint of the outer transaction
+            async with AsyncSession(
+                bind=connection, expire_on_commit=False, join_transaction_mode="create_savepoint"
+            ) as session:
+                yield session
+
+        APP.dependency_overrides[get_db_session] = get_test_db_session
+        try:
+            yield client
+        finally:
+            del APP.dependency_overrides[get_db_session]
+            client.portal.call(_rollback, connection)
@@ -0,0 +1,37 @@
+import pytest
+
+from mini_leaderboard.log import logger
+
+
+@pytest.fixture
+def access_log():
+    records = []
+    sink = logger.add(lambda message: records.append(message.record), filter=lambda record: "access" in record["extra"])
+    yield records
+    logger.remove(sink)
+
+
+def test_access_log(client, access_log):
+    response = client.get("/api/v1/leaderboard/list", params={"project_id": "p"}, headers={"X-Request-ID": "req-1"})
+    assert response.status_code == 200
+    (record,) = access_log
+    assert record["level"].name == "INFO"
+    assert record["extra"]["method"] == "GET"
+    assert record["extra"]["path"] == "/api/v1/leaderboard/list"
+    assert record["extra"]["status"] == 200
+    assert record["extra"]["request_id"] == "req-1"
+    assert record["extra"]["duration_ms"] > 0
+
+
+def test_access_log_sampling(client, access_log, monkeypatch):
+    """Test successful requests are sampled away while errors are always logged."""
+    monkeypatch.setenv("ACCESS_LOG_SAMPLE_RATE", "0")
+    assert client.get("/api/v1/leaderboard/list", params={"project_id": "p"}).status_code == 200
+    assert client.get("/api/v1/leaderboard/list").status_code == 422
+    (record,) = access_log
+    assert (record["level"].name, record["extra"]["status"]) == ("WARNING", 422)
+
+    # Slow requests
+    monkeypatch.setenv("SLOW_REQUEST_MS", "0")
+    assert client.get("/api/v1/leaderboard/list", params={"project_id": "p"}).status_code == 200
+    assert [record["extra"]["status"] for record in access_log] == [422, 200]
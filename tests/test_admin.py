@@ -0,0 +1,50 @@
+from fastapi.testclient import TestClient
+
+from mini_leaderboard.config import get_config
+from mini_leaderboard.querylog import fingerprint, get_query_log
+from mini_leaderboard.routers.api.params import QueryStatsResponse
+
+
+def test_fingerprint():
+    """Test literals, parameters and IN lists are stripped."""
+    key, normalized = fingerprint(
+        "SELECT * FROM vote\n WHERE project_id = %(project_id)s AND item_id IN (%(a)s, %(b)s) AND name = 'x''y' LIMIT 10"
+    )
+    assert normalized == "SELECT * FROM vote WHERE project_id = ? AND item_id IN (...) AND name = ? LIMIT ?"
+    assert (
+        key
+        == fingerprint("SELECT * FROM vote WHERE project_id = %(p)s AND item_id IN (%(c)s) AND name = 'z' LIMIT 5")[0]
+    )
+    assert fingerprint("SELECT param_1 FROM t2")[1] == "SELECT param_1 FROM t2"
+
+
+def test_query_stats(app, monkeypatch):
+    """Test statements are aggregated and slow SELECTs are explained."""
+    monkeypatch.setenv("QUERY_STATS", "true")
+    monkeypatch.setenv("SLOW_QUERY_MS", "0")
+    config = get_config()
+    with TestClient(app) as client:
+        for i in range(3):
+            client.post("/api/v1/messageboard/add", json={"name": "Test User", "message": f"hi {i}", "project_id": "p"})
+            client.get("/api/v1/messageboard/list", params={"project_id": "p"})
+        assert client.portal.call(get_query_log(config).explain_pending, config) > 0
+
+        response = client.get("/api/v1/admin/queries")
+        assert response.status_code == 200
+        stats = QueryStatsResponse.model_validate(response.json())
+        assert stats.enabled
+        listing = next(query for query in stats.queries if query.statement.startswith("SELECT messageboard."))
+        assert listing.count == 3
+        assert listing.max_ms >= listing.p99_ms > 0
+        assert "Scan" in listing.plan
+        insert = next(query for query in stats.queries if query.statement.startswith("INSERT INTO messageboard"))
+        assert insert.count == 3
+        assert insert.plan is None
+
+        assert client.delete("/api/v1/admin/queries").status_code == 204
+        assert client.get("/api/v1/admin/queries").json()["queries"] == []
+
+
+def test_query_stats_disabled(client):
+    """Test the endpoint reports disabled statistics."""
+    assert client.get("/api/v1/admin/queries").json() == {"enabled": False, "queries": []}
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+from pydantic import ValidationError
+
+from mini_leaderboard.admission import AdmissionLimiter, is_limited
+from mini_leaderboard.config import get_config
+
+
+async def test_limiter_queues_and_sheds():
+    """Test slots are handed over in order and excess requests are turned away."""
+    limiter = AdmissionLimiter(slots=1, queue_size=1, timeout=0.2)
+    assert await limiter.acquire()
+
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    assert limiter.queued == 1
+    # The queue is full
+    assert not await limiter.acquire()
+    assert limiter.rejected == 1
+
+    limiter.release()
+    assert await waiter
+    assert (limiter.active, limiter.queued) == (1, 0)
+
+    # Waiting past the deadline
+    assert not await limiter.acquire()
+    assert limiter.timed_out == 1
+    limiter.release()
+    assert limiter.active == 0
+
+
+async def test_limiter_cancelled_waiter():
+    """Test a cancelled waiter does not keep or leak a slot."""
+    limiter = AdmissionLimiter(slots=1, queue_size=10, timeout=5)
+    assert await limiter.acquire()
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    await asyncio.sleep(0)
+    assert limiter.queued == 0
+    limiter.release()
+    assert limiter.active == 0
+
+
+def test_limited_paths():
+    assert is_limited("/api/v1/leaderboard/list")
+    assert not is_limited("/api/v1/leaderboard/subscribe")
+    assert not is_limited("/api/v1/admin/admission")
+    assert not is_limited("/")
+
+
+def test_saturated_requests_get_503(client, monkeypatch):
+    """Test requests over budget are shed with Retry-After."""
+    monkeypatch.setenv("ADMISSION_CONTROL", "true")
+    monkeypatch.setenv("ADMISSION_QUEUE_SIZE", "0")
+    monkeypatch.setenv("DB_POOL_SIZE", "1")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "1")
+    assert client.get("/api/v1/leaderboard/list", params={"project_id": "p"}).status_code == 200
+
+    stats = client.get("/api/v1/admin/admission").json()
+    assert stats["enabled"]
+    assert stats["read"] == {"slots": 1, "active": 0, "queued": 0, "rejected": 0, "timed_out": 0}
+
+    # Hold the only read slot
+    from mini_leaderboard.admission import get_admission_limiters
+
+    read, _ = get_admission_limiters(get_config())
+    read.active = read.slots
+    try:
+        response = client.get("/api/v1/leaderboard/list", params={"project_id": "p"})
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        # Writes have their own budget
+        response = client.post("/api/v1/leaderboard/add", json={"name": "a", "score": 1, "project_id": "p"})
+        assert response.status_code == 201
+    finally:
+        read.active = 0
+    assert client.get("/api/v1/admin/admission").json()["read"]["rejected"] == 1
+
+
+def test_write_slots_leave_room_for_reads(monkeypatch):
+    """Test write slots taking the whole pool capacity are rejected."""
+    monkeypatch.setenv("DB_POOL_SIZE", "2")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "1")
+    monkeypatch.setenv("ADMISSION_WRITE_SLOTS", "2")
+    assert get_config().admission_write_slots == 2
+
+    monkeypatch.setenv("ADMISSION_WRITE_SLOTS", "3")
+    with pytest.raises(ValidationError, match="ADMISSION_WRITE_SLOTS"):
+        get_config()
@@ -0,0 +1,77 @@
+import pytest
+from sqlalchemy import event
+
+from mini_leaderboard.config import get_config
+from mini_leaderboard.dbutils import get_engine
+from mini_leaderboard.routers.api.params import DashboardResponse
+
+
+def fill_project(client, project_id: str, size: int):
+    for i in range(size):
+        client.post("/api/v1/leaderboard/add", json={"name": f"User {i}", "score": i, "project_id": project_id})
+        client.post("/api/v1/messageboard/add", json={"name": f"User {i}", "message": "hi", "project_id": project_id})
+        client.post(
+            "/api/v1/form/submit",
+            json={
+                "project_id": project_id,
+                "email": f"user{i}@example.com",
+                "project_link": "https://example.com",
+                "social_post_link": "https://example.com/post",
+            },
+        )
+        for _ in range(i + 1):
+            client.post("/api/v1/vote/add", json={"project_id": project_id, "item_id": f"item-{i}"})
+
+
+@pytest.mark.parametrize("vote_shards", ["1", "4"])
+def test_get_dashboard(client, monkeypatch, vote_shards):
+    """Test the dashboard matches the per-project endpoints."""
+    monkeypatch.setenv("VOTE_SHARDS", vote_shards)
+    fill_project(client, "a", 4)
+    fill_project(client, "b", 2)
+
+    response = client.get("/api/v1/dashboard", params={"project_id": ["a", "b", "empty", "a"], "top": 3, "messages": 2})
+    assert response.status_code == 200
+    dashboard = DashboardResponse.model_validate(response.json())
+    assert list(dashboard.projects) == ["a", "b", "empty"]
+
+    for project_id, size in [("a", 4), ("b", 2), ("empty", 0)]:
+        project = dashboard.projects[project_id].model_dump(mode="json")
+        params = {"project_id": project_id}
+        leaderboard = client.get("/api/v1/leaderboard/list", params={**params, "page_size": 3}).json()
+        votes = client.get("/api/v1/vote/list", params={**params, "top": 3}).json()
+        messages = client.get("/api/v1/messageboard/list", params={**params, "page_size": 2}).json()
+        assert project["leaderboard"] == leaderboard["data"]
+        assert project["votes"] == votes["data"]
+        assert project["messages"] == messages["data"]
+        assert project["form_count"] == size
+
+
+def test_dashboard_uses_one_connection(client, case_id):
+    """Test the dashboard runs its statements on a single pooled connection, its one admission slot."""
+    fill_project(client, case_id, 2)
+    response = client.put("/api/v1/leaderboard/order", json={"project_id": f"{case_id}-asc", "order": "asc"})
+    assert response.status_code == 204
+
+    pool = get_engine(get_config()).sync_engine.pool
+    active = peak = 0
+
+    def checkout(*args):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+
+    def checkin(*args):
+        nonlocal active
+        active -= 1
+
+    event.listen(pool, "checkout", checkout)
+    event.listen(pool, "checkin", checkin)
+    try:
+        response = client.get("/api/v1/dashboard", params={"project_id": [case_id, f"{case_id}-asc"]})
+    finally:
+        event.remove(pool, "checkout", checkout)
+        event.remove(pool, "checkin", checkin)
+    assert response.status_code == 200
+    assert len(response.json()["projects"][case_id]["leaderboard"]) == 2
+    assert peak == 1
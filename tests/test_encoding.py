@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from mini_leaderboard.encoding import choose_coding, parse_accept, wants_msgpack
+
+
+@pytest.fixture
+def leaderboard(client):
+    for score in range(50):
+        client.post("/api/v1/leaderboard/add", json={"name": "Test User", "score": score, "project_id": "p"})
+    return client.get("/api/v1/leaderboard/list", params={"project_id": "p"}).json()
+
+
+def test_negotiation():
+    """Test Accept and Accept-Encoding parsing."""
+    assert parse_accept("application/json;q=0.5, text/*") == {"application/json": 0.5, "text/*": 1.0}
+    assert choose_coding("gzip, deflate") == "gzip"
+    assert choose_coding("identity") is None
+    assert choose_coding("gzip;q=0") is None
+    assert not wants_msgpack("application/json")
+    assert not wants_msgpack("application/json, application/msgpack;q=0.5")
+
+
+def test_gzip_above_threshold(client, leaderboard, monkeypatch):
+    """Test large bodies are compressed and small ones are not."""
+    response = client.get("/api/v1/leaderboard/list", params={"project_id": "p"}, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.json() == leaderboard
+    assert int(response.headers["content-length"]) < len(response.content) / 3
+
+    response = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+    monkeypatch.setenv("COMPRESS_MIN_SIZE", "none")
+    response = client.get("/api/v1/leaderboard/list", params={"project_id": "p"}, headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+
+def test_brotli(client, leaderboard):
+    """Test brotli is preferred when installed."""
+    pytest.importorskip("brotli")
+    response = client.get(
+        "/api/v1/leaderboard/list", params={"project_id": "p"}, headers={"Accept-Encoding": "gzip, br"}
+    )
+    assert response.headers["content-encoding"] == "br"
+    assert response.json() == leaderboard
+
+
+def test_msgpack(client, leaderboard):
+    """Test MessagePack is served when preferred by the Accept header."""
+    msgpack = pytest.importorskip("msgpack")
+    response = client.get(
+        "/api/v1/leaderboard/list",
+        params={"project_id": "p"},
+        headers={"Accept": "application/msgpack", "Accept-Encoding": "identity"},
+    )
+    assert response.headers["content-type"] == "application/msgpack"
+    assert "Accept" in response.headers["vary"]
+    assert msgpack.unpackb(response.content) == leaderboard
+    assert len(response.content) < len(json.dumps(leaderboard))
+
+
+def test_max_page_size(client, leaderboard, monkeypatch):
+    """Test page sizes above MAX_PAGE_SIZE are clamped and can be continued."""
+    monkeypatch.setenv("MAX_PAGE_SIZE", "20")
+    response = client.get("/api/v1/leaderboard/list", params={"project_id": "p", "page_size": 1000}).json()
+    assert response["data"] == leaderboard["data"][:20]
+    assert response["next_cursor"] == leaderboard["data"][19]["leaderboard_id"]
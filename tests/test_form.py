@@ -1,5 +1,9 @@
 import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import OperationalError
 
+from mini_leaderboard.controllers import form
+from mini_leaderboard.log import logger
 from mini_leaderboard.routers.api.params import AddFormParams, CountFormResponse
 
 
@@ -69,3 +73,119 @@ def test_add_and_count_form_no_name(client, project_id):
     )
     assert response.status_code == 200
     assert CountFormResponse.model_validate(response.json()).count == 0
+
+
+def test_submit_form_idempotency_key(client, project_id, case_id):
+    """Test retried form submissions are applied once."""
+    params = AddFormParams(
+        project_id=project_id,
+        email="test@user",
+        project_link="https://example.com",
+        social_post_link="https://twitter.com/example",
+    ).model_dump()
+
+    for _ in range(3):
+        response = client.post("/api/v1/form/submit", json=params, headers={"Idempotency-Key": case_id})
+        assert response.status_code == 201
+
+    response = client.get("/api/v1/form/count", params={"project_id": project_id})
+    assert CountFormResponse.model_validate(response.json()).count == 1
+
+
+@pytest.fixture
+def queued(monkeypatch):
+    monkeypatch.setenv("FORM_QUEUE", "true")
+    monkeypatch.setenv("FORM_QUEUE_BATCH_SIZE", "3")
+    monkeypatch.setenv("FORM_QUEUE_FLUSH_INTERVAL", "60")
+
+
+def test_submit_form_queued(queued, app, project_id, case_id):
+    """Test queued submissions are accepted, written in batches and drained on shutdown."""
+    params = AddFormParams(
+        project_id=project_id,
+        email="test@user",
+        project_link="https://example.com",
+        social_post_link="https://twitter.com/example",
+    ).model_dump()
+
+    with TestClient(app) as client:
+        for i in range(5):
+            response = client.post(
+                "/api/v1/form/submit", json=params, headers={"Idempotency-Key": f"{case_id}-{i % 4}"}
+            )
+            assert response.status_code == 202
+
+    with TestClient(app) as client:
+        # The repeated key is written once
+        response = client.get("/api/v1/form/count", params={"project_id": project_id})
+        assert CountFormResponse.model_validate(response.json()).count == 4
+
+        response = client.post("/api/v1/form/submit", json=params, headers={"Idempotency-Key": f"{case_id}-0"})
+        assert response.status_code == 202
+        assert response.headers["Idempotent-Replayed"] == "true"
+
+
+@pytest.fixture
+def form_log():
+    records = []
+    sink = logger.add(lambda message: records.append(message), filter="mini_leaderboard.controllers.form")
+    yield records
+    logger.remove(sink)
+
+
+def test_submit_form_queued_retried(queued, app, project_id, case_id, monkeypatch, form_log):
+    """Test a queued batch is kept and retried while the database fails, and its contents are not logged."""
+    monkeypatch.setattr(form, "RETRY_DELAY", 0)
+    write = form.FormQueue._write
+    failures = 5
+
+    async def flaky_write(self, batch):
+        nonlocal failures
+        if failures:
+            failures -= 1
+            raise OperationalError("INSERT", {}, Exception("connection refused"))
+        await write(self, batch)
+
+    monkeypatch.setattr(form.FormQueue, "_write", flaky_write)
+    params = AddFormParams(
+        project_id=project_id,
+        email="secret@user",
+        project_link="https://example.com",
+        social_post_link="https://twitter.com/example",
+    ).model_dump()
+
+    with TestClient(app) as client:
+        for i in range(3):
+            response = client.post("/api/v1/form/submit", json=params, headers={"Idempotency-Key": f"{case_id}-{i}"})
+            assert response.status_code == 202
+
+    with TestClient(app) as client:
+        response = client.get("/api/v1/form/count", params={"project_id": project_id})
+        assert CountFormResponse.model_validate(response.json()).count == 3
+    assert not failures
+    assert form_log
+    assert not any("secret@user" in message for message in form_log)
+
+
+def test_submit_form_queued_rejects_bad_row(queued, app, project_id, case_id, form_log):
+    """Test a row the database refuses is rejected alone, the rest of its batch is written."""
+    params = AddFormParams(
+        project_id=project_id,
+        email="secret@user",
+        project_link="https://example.com",
+        social_post_link="https://twitter.com/example",
+    ).model_dump()
+
+    with TestClient(app) as client:
+        for i in range(3):
+            # Postgres text cannot hold NUL
+            body = {**params, "username": "bad\x00name"} if i == 1 else params
+            response = client.post("/api/v1/form/submit", json=body, headers={"Idempotency-Key": f"{case_id}-{i}"})
+            assert response.status_code == 202
+
+    with TestClient(app) as client:
+        response = client.get("/api/v1/form/count", params={"project_id": project_id})
+        assert CountFormResponse.model_validate(response.json()).count == 2
+    (rejected,) = [message for message in form_log if "Rejected" in message]
+    assert f"{case_id}-1" in rejected
+    assert "secret@user" not in rejected
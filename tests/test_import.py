@@ -0,0 +1,54 @@
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from mini_leaderboard.cli import import_
+
+
+@pytest.fixture
+def project_id():
+    return "test-project"
+
+
+def test_import_leaderboard_ndjson(client, project_id, tmp_path):
+    """Test bulk importing leaderboard entries from NDJSON."""
+    path = tmp_path / "scores.ndjson"
+    path.write_text(
+        "\n".join(json.dumps({"name": f"User {i}", "score": i, "project_id": project_id}) for i in range(25))
+    )
+
+    runner = CliRunner()
+    result = runner.invoke(import_, ["--table", "leaderboard", "--file", str(path), "--chunk-size", "10"])
+    assert result.exit_code == 0, result.output
+    assert "25 rows imported" in result.output
+
+    response = client.get("/api/v1/leaderboard/list", params={"project_id": project_id, "page_size": 1000})
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert len(data) == 25
+    assert data[0]["score"] == 24
+    assert len({entry["leaderboard_id"] for entry in data}) == 25
+
+
+def test_import_form_csv(client, project_id, tmp_path):
+    """Test bulk importing form entries from CSV, skipping invalid rows."""
+    path = tmp_path / "forms.csv"
+    path.write_text(
+        "project_id,username,email,project_link,social_post_link\n"
+        f"{project_id},Alice,alice@example.com,https://example.com,https://twitter.com/a\n"
+        f"{project_id},,bob@example.com,https://example.com,https://twitter.com/b\n"
+        f"{project_id},Carol,,,\n"
+    )
+
+    runner = CliRunner()
+    result = runner.invoke(import_, ["--table", "form", "--file", str(path)])
+    assert result.exit_code != 0
+    assert "line 4" in result.output
+
+    result = runner.invoke(import_, ["--table", "form", "--file", str(path), "--skip-invalid"])
+    assert result.exit_code == 0, result.output
+
+    response = client.get("/api/v1/form/count", params={"project_id": project_id})
+    assert response.status_code == 200
+    assert response.json()["count"] == 2
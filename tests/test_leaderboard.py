@@ -1,4 +1,20 @@
+import random
+import re
+from collections import Counter
+
 import pytest
+from click.testing import CliRunner
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from mini_leaderboard.cli import rebuild_stats
+from mini_leaderboard.idempotency import get_idempotency_store
+from mini_leaderboard.routers.api.params import (
+    LeaderboardAroundResponse,
+    LeaderboardRankResponse,
+    LeaderboardStatsResponse,
+)
+from mini_leaderboard.stats import SUB_BUCKETS, bucket_bounds, bucket_of, percentiles_from_histogram
 
 
 @pytest.fixture
@@ -136,3 +152,282 @@ def test_get_leaderboard_with_custom_page_size(client, project_id):
     # Check the final page
     assert len(data["data"]) == 5
     assert data["next_cursor"] is None
+
+
+def test_add_leaderboard_idempotency_key(client, project_id, case_id):
+    """Test retries with the same Idempotency-Key insert only once."""
+    entry = {"name": "Test User", "score": 100, "project_id": project_id}
+    headers = {"Idempotency-Key": case_id}
+
+    response = client.post("/api/v1/leaderboard/add", json=entry, headers=headers)
+    assert response.status_code == 201
+    assert "Idempotent-Replayed" not in response.headers
+
+    # Start over with an empty in-process cache, the replay is caught by the table
+    get_idempotency_store.cache_clear()
+
+    response = client.post("/api/v1/leaderboard/add", json=entry, headers=headers)
+    assert response.status_code == 201
+    assert response.headers["Idempotent-Replayed"] == "true"
+
+    response = client.post("/api/v1/leaderboard/add", json=entry, headers={"Idempotency-Key": f"{case_id}-other"})
+    assert response.status_code == 201
+
+    # The same key with a different request is rejected, from the cache and from the table
+    response = client.post("/api/v1/leaderboard/add", json={**entry, "score": 200}, headers=headers)
+    assert response.status_code == 422
+    get_idempotency_store.cache_clear()
+    response = client.post("/api/v1/leaderboard/add", json={**entry, "score": 200}, headers=headers)
+    assert response.status_code == 422
+
+    response = client.get("/api/v1/leaderboard/list", params={"project_id": project_id})
+    assert len(response.json()["data"]) == 2
+
+    # Keys are scoped by project
+    response = client.post("/api/v1/leaderboard/add", json={**entry, "project_id": case_id}, headers=headers)
+    assert response.status_code == 201
+    assert "Idempotent-Replayed" not in response.headers
+
+
+def test_idempotency_key_scoped_by_client(monkeypatch, app, project_id, case_id):
+    """Test clients sharing API_TOKEN do not replay each other's Idempotency-Key."""
+    monkeypatch.setenv("API_TOKEN", "shared-token")
+    headers = {"Authorization": "Bearer shared-token", "Idempotency-Key": case_id}
+
+    for address, score in [("10.0.0.1", 100), ("10.0.0.2", 200)]:
+        with TestClient(app, headers=headers, client=(address, 50000)) as client:
+            entry = {"name": "Test User", "score": score, "project_id": project_id}
+            response = client.post("/api/v1/leaderboard/add", json=entry)
+            assert response.status_code == 201
+            assert "Idempotent-Replayed" not in response.headers
+            response = client.post("/api/v1/leaderboard/add", json=entry)
+            assert response.headers["Idempotent-Replayed"] == "true"
+
+    with TestClient(app, headers=headers) as client:
+        response = client.get("/api/v1/leaderboard/list", params={"project_id": project_id})
+        assert sorted(entry["score"] for entry in response.json()["data"]) == [100, 200]
+
+
+def test_rollback_client_isolation(rollback_client, reset_engine, case_id):
+    """Test writes made through rollback_client are visible in the test but never committed."""
+    for score in (10, 20):
+        response = rollback_client.post(
+            "/api/v1/leaderboard/add",
+            json={"name": "Test User", "score": score, "project_id": case_id},
+        )
+        assert response.status_code == 201
+
+    response = rollback_client.get("/api/v1/leaderboard/list", params={"project_id": case_id})
+    assert [entry["score"] for entry in response.json()["data"]] == [20, 10]
+
+    with reset_engine.connect() as connection:
+        count = connection.execute(
+            text("SELECT count(*) FROM leaderboard WHERE project_id = :project_id"), {"project_id": case_id}
+        )
+        assert count.scalar_one() == 0
+
+
+def test_get_leaderboard_stats(client, project_id):
+    """Test score statistics are maintained on add and survive a rebuild."""
+    response = client.get("/api/v1/leaderboard/stats", params={"project_id": project_id})
+    assert response.json() == {"count": 0, "min": None, "max": None, "mean": None, "percentiles": {}}
+
+    scores = [-5000, -3, 0, 1, 7, 31, 32, 33, 100, 1000, 123_456, 2**31 - 1]
+    for score in scores:
+        client.post("/api/v1/leaderboard/add", json={"name": "Test User", "score": score, "project_id": project_id})
+
+    def get_stats():
+        response = client.get(
+            "/api/v1/leaderboard/stats", params={"project_id": project_id, "percentiles": [0, 25, 100]}
+        )
+        assert response.status_code == 200
+        return LeaderboardStatsResponse.model_validate(response.json())
+
+    stats = get_stats()
+    assert (stats.count, stats.min, stats.max) == (len(scores), min(scores), max(scores))
+    assert stats.mean == pytest.approx(sum(scores) / len(scores))
+    assert stats.percentiles == {"p0": -5000, "p25": 0, "p100": 2**31 - 1}
+
+    result = CliRunner().invoke(rebuild_stats, [])
+    assert result.exit_code == 0, result.output
+    assert get_stats() == stats
+
+    response = client.get("/api/v1/leaderboard/stats", params={"project_id": project_id, "percentiles": [101]})
+    assert response.status_code == 422
+
+
+def test_rebuild_drops_counted_sketch_deltas(app, reset_engine, project_id):
+    """Test scores a rebuild counted are not merged again from the worker's unflushed delta."""
+
+    def add(score):
+        response = client.post(
+            "/api/v1/leaderboard/add", json={"name": "Test User", "score": score, "project_id": project_id}
+        )
+        assert response.status_code == 201
+
+    with TestClient(app) as client:
+        for score in range(10):
+            add(score)
+        result = CliRunner().invoke(rebuild_stats, [])
+        assert result.exit_code == 0, result.output
+        for score in range(10, 15):
+            add(score)
+
+        response = client.get(
+            "/api/v1/leaderboard/rank", params={"project_id": project_id, "score": 5, "approximate": True}
+        )
+        assert LeaderboardRankResponse.model_validate(response.json()).count == 15
+
+    # Flushed on shutdown
+    with reset_engine.connect() as connection:
+        count = connection.execute(
+            text("SELECT count FROM leaderboard_sketch WHERE project_id = :p"), {"p": project_id}
+        )
+        assert count.scalar_one() == 15
+
+
+def test_stats_buckets():
+    """Test buckets are ordered, contiguous and keep percentiles within the bucket error."""
+    previous = None
+    for score in [*range(-3000, 3000), *(2**k + d for k in range(12, 31) for d in (-1, 0, 1))]:
+        bucket = bucket_of(score)
+        low, high = bucket_bounds(bucket)
+        assert low <= score <= high
+        assert (high - low) <= max(abs(low), abs(high)) / SUB_BUCKETS
+        if previous is not None and previous[0] + 1 == score:
+            assert bucket in (previous[1], previous[1] + 1)
+        previous = score, bucket
+
+    rng = random.Random(0)  # noqa: S311
+    scores = sorted(rng.randint(0, 10**6) for _ in range(10_000))
+    histogram = sorted(Counter(bucket_of(score) for score in scores).items())
+    estimates = percentiles_from_histogram(histogram, [50, 90, 99], scores[0], scores[-1])
+    for percentile, estimate in estimates.items():
+        exact = scores[round(percentile / 100 * (len(scores) - 1))]
+        assert estimate == pytest.approx(exact, rel=1 / SUB_BUCKETS)
+
+
+def test_get_leaderboard_rank(client, project_id):
+    """Test exact and approximate ranks of a score."""
+    for score in range(300):
+        client.post("/api/v1/leaderboard/add", json={"name": "Test User", "score": score, "project_id": project_id})
+    client.post("/api/v1/leaderboard/add", json={"name": "Test User", "score": 150, "project_id": project_id})
+
+    response = client.get("/api/v1/leaderboard/rank", params={"project_id": project_id, "score": 150})
+    assert response.status_code == 200
+    exact = LeaderboardRankResponse.model_validate(response.json())
+    assert exact == LeaderboardRankResponse(rank=150, count=301, percentile=100 * 150 / 301, approximate=False)
+
+    response = client.get(
+        "/api/v1/leaderboard/rank", params={"project_id": project_id, "score": 150, "approximate": True}
+    )
+    approximate = LeaderboardRankResponse.model_validate(response.json())
+    assert approximate.approximate
+    assert approximate.count == 301
+    assert abs(approximate.rank - exact.rank) <= 0.017 * 301
+
+    # Boards without a sketch are answered exactly
+    response = client.get("/api/v1/leaderboard/rank", params={"project_id": "other", "score": 1, "approximate": True})
+    assert response.json() == {"rank": 1, "count": 0, "percentile": 0, "approximate": False}
+
+
+def test_get_leaderboard_around(client, project_id):
+    """Test the entries around an entry match the same slice of the full list."""
+    for i, score in enumerate([50, 40, 40, 40, 30, 20, 10]):
+        client.post("/api/v1/leaderboard/add", json={"name": f"User {i}", "score": score, "project_id": project_id})
+    full = client.get("/api/v1/leaderboard/list", params={"project_id": project_id}).json()["data"]
+
+    for position, k in [(2, 1), (0, 2), (6, 3), (3, 10)]:
+        response = client.get(
+            "/api/v1/leaderboard/around",
+            params={"project_id": project_id, "leaderboard_id": full[position]["leaderboard_id"], "k": k},
+        )
+        assert response.status_code == 200
+        around = LeaderboardAroundResponse.model_validate(response.json())
+        start = max(position - k, 0)
+        assert [entry.model_dump(mode="json") for entry in around.data] == full[start : position + k + 1]
+        assert around.position == position - start
+
+    response = client.get(
+        "/api/v1/leaderboard/around",
+        params={"project_id": "other", "leaderboard_id": full[0]["leaderboard_id"]},
+    )
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize("order", ["desc", "asc"])
+@pytest.mark.parametrize("tiebreak", ["first", "last"])
+def test_leaderboard_order(client, case_id, order, tiebreak):
+    """Test listing, paging, neighbours, ranks and the dashboard follow the project order."""
+    # Orders are cached per worker, a fresh project keeps the cache out of the picture
+    project_id = case_id
+    assert client.get("/api/v1/leaderboard/order", params={"project_id": project_id}).json() == {
+        "order": "desc",
+        "tiebreak": "first",
+    }
+    response = client.put(
+        "/api/v1/leaderboard/order", json={"project_id": project_id, "order": order, "tiebreak": tiebreak}
+    )
+    assert response.status_code == 204
+    assert client.get("/api/v1/leaderboard/order", params={"project_id": project_id}).json() == {
+        "order": order,
+        "tiebreak": tiebreak,
+    }
+
+    scores = [30, 10, 20, 10, 30, 10, 40]
+    for i, score in enumerate(scores):
+        client.post("/api/v1/leaderboard/add", json={"name": f"User {i}", "score": score, "project_id": project_id})
+    expected = sorted(
+        range(len(scores)),
+        key=lambda i: (-scores[i] if order == "desc" else scores[i], i if tiebreak == "first" else -i),
+    )
+
+    full = client.get("/api/v1/leaderboard/list", params={"project_id": project_id}).json()["data"]
+    assert [entry["name"] for entry in full] == [f"User {i}" for i in expected]
+
+    paged, cursor = [], None
+    while True:
+        params = {"project_id": project_id, "page_size": 2, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/api/v1/leaderboard/list", params=params).json()
+        paged += page["data"]
+        if not (cursor := page["next_cursor"]):
+            break
+    assert paged == full
+
+    for position in range(len(full)):
+        response = client.get(
+            "/api/v1/leaderboard/around",
+            params={"project_id": project_id, "leaderboard_id": full[position]["leaderboard_id"], "k": 2},
+        )
+        around = response.json()
+        start = max(position - 2, 0)
+        assert around["data"] == full[start : position + 3]
+        assert around["position"] == position - start
+
+    for approximate in (False, True):
+        params = {"project_id": project_id, "score": 10, "approximate": approximate}
+        rank = client.get("/api/v1/leaderboard/rank", params=params).json()
+        assert rank["rank"] == (5 if order == "desc" else 1)
+        assert rank["percentile"] == pytest.approx(100 * (0 if order == "desc" else 4) / 7)
+
+    dashboard = client.get("/api/v1/dashboard", params={"project_id": [project_id, "other"], "top": 3}).json()
+    assert dashboard["projects"][project_id]["leaderboard"] == full[:3]
+
+
+def test_leaderboard_ids(client, project_id):
+    """Test UUID ids are served as 32-character hex and malformed ids match nothing."""
+    client.post("/api/v1/leaderboard/add", json={"name": "Test User", "score": 1, "project_id": project_id})
+    (entry,) = client.get("/api/v1/leaderboard/list", params={"project_id": project_id}).json()["data"]
+    assert re.fullmatch(r"[0-9a-f]{32}", entry["leaderboard_id"])
+
+    around = client.get(
+        "/api/v1/leaderboard/around", params={"project_id": project_id, "leaderboard_id": entry["leaderboard_id"]}
+    )
+    assert around.json()["data"] == [entry]
+
+    for malformed in ["not-an-id", entry["leaderboard_id"][:-1]]:
+        params = {"project_id": project_id, "leaderboard_id": malformed}
+        assert client.get("/api/v1/leaderboard/around", params=params).status_code == 404
+        # An unknown cursor starts from the top
+        params = {"project_id": project_id, "cursor": malformed}
+        assert client.get("/api/v1/leaderboard/list", params=params).json()["data"] == [entry]
@@ -0,0 +1,171 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+import uvicorn
+from sqlalchemy import create_engine, text
+
+from mini_leaderboard.admission import get_admission_limiters
+from mini_leaderboard.config import get_config
+from mini_leaderboard.live import Broadcaster, format_sse, get_broadcaster, get_conninfo
+from mini_leaderboard.routers.api.params import AddVoteParams
+
+
+@pytest.fixture
+def live(monkeypatch):
+    monkeypatch.setenv("LIVE_UPDATES", "true")
+
+
+def test_dispatch_to_project_subscribers():
+    """Test notifications only reach subscribers of the same kind and project."""
+    broadcaster = Broadcaster("", queue_size=2)
+    with (
+        broadcaster.subscribe("vote", "p1") as queue,
+        broadcaster.subscribe("vote", "p2") as other,
+    ):
+        broadcaster.dispatch('{"kind": "vote", "project_id": "p1", "data": {"item_id": "a", "delta": 1}}')
+        broadcaster.dispatch('{"kind": "leaderboard", "project_id": "p1", "data": {}}')
+        assert queue.get_nowait()["data"] == {"item_id": "a", "delta": 1}
+        assert queue.empty()
+        assert other.empty()
+
+        # A subscriber that falls behind is asked to resync
+        for _ in range(3):
+            broadcaster.dispatch('{"kind": "vote", "project_id": "p1", "data": {"item_id": "a", "delta": 1}}')
+        assert queue.get_nowait()["kind"] == "resync"
+
+        # So is one whose change did not fit in a notification
+        broadcaster.dispatch('{"kind": "vote", "project_id": "p2", "resync": true}')
+        assert other.get_nowait() == {"kind": "resync", "project_id": "p2", "data": {}}
+    assert not broadcaster._subscribers
+
+
+def test_format_sse():
+    assert format_sse("vote", {"item_id": "a"}) == 'event: vote\ndata: {"item_id": "a"}\n\n'
+
+
+async def test_vote_pushed_to_subscribers(live, client):
+    """Test a vote is delivered to subscribers through LISTEN/NOTIFY."""
+    broadcaster = Broadcaster(get_conninfo(get_config()))
+    task = asyncio.create_task(broadcaster.run())
+    try:
+        await asyncio.wait_for(broadcaster.listening.wait(), 5)
+        with broadcaster.subscribe("vote", "test-project") as queue:
+            response = client.post(
+                "/api/v1/vote/add",
+                json=AddVoteParams(project_id="test-project", item_id="test-item").model_dump(),
+            )
+            assert response.status_code == 201
+            message = await asyncio.wait_for(queue.get(), 5)
+        assert message["data"] == {"item_id": "test-item", "delta": 1}
+    finally:
+        task.cancel()
+
+
+async def test_resync_after_reconnect(live, app, monkeypatch):
+    """Test subscribers are asked to resync once a dropped LISTEN connection is back."""
+    monkeypatch.setattr("mini_leaderboard.live.RECONNECT_DELAY", 0)
+    broadcaster = Broadcaster(get_conninfo(get_config()))
+    task = asyncio.create_task(broadcaster.run())
+    engine = create_engine(get_config().get_db_url())
+    try:
+        await asyncio.wait_for(broadcaster.listening.wait(), 5)
+        with broadcaster.subscribe("vote", "test-project") as queue:
+            with engine.connect() as conn:
+                conn.execute(
+                    text(
+                        "SELECT pg_terminate_backend(pid) FROM pg_stat_activity WHERE query = 'LISTEN mini_leaderboard'"
+                    )
+                )
+            message = await asyncio.wait_for(queue.get(), 5)
+        assert message == {"kind": "resync", "project_id": "test-project", "data": {}}
+    finally:
+        task.cancel()
+        engine.dispose()
+
+
+@pytest.fixture
+async def server(live, app):
+    """The app served by uvicorn on a free port, as streaming responses need a real server"""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    await asyncio.wait_for(get_broadcaster().listening.wait(), 5)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    config = get_config()
+    headers = {"Authorization": f"Bearer {config.api_token}"} if config.api_token else {}
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", headers=headers) as client:
+        yield client
+    server.should_exit = True
+    await task
+
+
+async def read_events(response: httpx.Response):
+    """Parse a Server-Sent Events stream into (event, data) pairs"""
+    event = None
+    async for line in response.aiter_lines():
+        if line.startswith("event: "):
+            event = line.removeprefix("event: ")
+        elif line.startswith("data: "):
+            yield event, json.loads(line.removeprefix("data: "))
+
+
+async def test_subscribe_over_sse(server, case_id):
+    """Test entries added through the API are streamed to subscribers, oversized ones as a resync."""
+    async with server.stream("GET", "/api/v1/leaderboard/subscribe", params={"project_id": case_id}) as stream:
+        assert stream.status_code == 200
+        events = read_events(stream)
+        assert await asyncio.wait_for(events.__anext__(), 5) == ("snapshot", [])
+
+        entry = {"name": "Test User", "score": 100, "project_id": case_id}
+        response = await server.post("/api/v1/leaderboard/add", json=entry)
+        assert response.status_code == 201
+        event, data = await asyncio.wait_for(events.__anext__(), 5)
+        assert event == "leaderboard"
+        assert data["name"] == "Test User"
+        assert data["score"] == 100
+
+        # pg_notify rejects payloads of 8000 bytes or more
+        response = await server.post("/api/v1/leaderboard/add", json={**entry, "name": "x" * 10_000})
+        assert response.status_code == 201
+        assert await asyncio.wait_for(events.__anext__(), 5) == ("resync", {})
+
+
+def test_oversized_change_is_written(live, client):
+    """Test a change too large for pg_notify is still written."""
+    entry = {"name": "x" * 10_000, "score": 100, "project_id": "test-project"}
+    response = client.post("/api/v1/leaderboard/add", json=entry)
+    assert response.status_code == 201
+
+    response = client.get("/api/v1/leaderboard/list", params={"project_id": "test-project"})
+    assert response.json()["data"][0]["name"] == entry["name"]
+
+
+def test_subscribe_disabled(client):
+    response = client.get("/api/v1/vote/subscribe", params={"project_id": "test-project"})
+    assert response.status_code == 404
+
+
+def test_subscribe_waits_for_read_slot(live, client, monkeypatch):
+    """Test a subscription's snapshot takes a read slot and the stream asks to retry when none is free."""
+    monkeypatch.setenv("ADMISSION_CONTROL", "true")
+    monkeypatch.setenv("ADMISSION_QUEUE_SIZE", "0")
+    monkeypatch.setenv("DB_POOL_SIZE", "1")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "1")
+    read, _ = get_admission_limiters(get_config())
+    read.active = read.slots
+    try:
+        response = client.get("/api/v1/leaderboard/subscribe", params={"project_id": "test-project"})
+        assert response.status_code == 200
+        assert response.text == "retry: 1000\n\n"
+    finally:
+        read.active = 0
+    assert read.rejected == 1
+
+
+@pytest.mark.parametrize("kind", ["leaderboard", "vote"])
+def test_subscribe_snapshot_size_bounded(live, client, kind):
+    response = client.get(f"/api/v1/{kind}/subscribe", params={"project_id": "test-project", "top": 101})
+    assert response.status_code == 422
@@ -0,0 +1,150 @@
+from pathlib import Path
+
+import alembic.command
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from click.testing import CliRunner
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table, Text, UniqueConstraint, create_engine, func, text
+
+from mini_leaderboard.cli import drop, init
+from mini_leaderboard.config import get_config
+from mini_leaderboard.dbutils import ALEMBIC_DIR, INITIAL_REVISION, get_alembic_config, upgrade_in_place
+from mini_leaderboard.orm import Base
+from mini_leaderboard.sketch import KLLSketch
+
+# The schema `init` created with `Base.metadata.create_all` before migrations were versioned
+BASELINE = MetaData()
+Table(
+    "leaderboard",
+    BASELINE,
+    Column("id_", Integer, autoincrement=True, primary_key=True),
+    Column("leaderboard_id", Text, nullable=False, index=True, unique=True),
+    Column("project_id", Text),
+    Column("name", Text),
+    Column("score", Integer),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("updated_at", DateTime(timezone=True), server_default=func.now()),
+)
+Table(
+    "messageboard",
+    BASELINE,
+    Column("id_", Integer, autoincrement=True, primary_key=True),
+    Column("message_id", Text, nullable=False, index=True, unique=True),
+    Column("project_id", Text),
+    Column("name", Text),
+    Column("message", Text),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("updated_at", DateTime(timezone=True), server_default=func.now()),
+)
+Table(
+    "form",
+    BASELINE,
+    Column("id_", Integer, autoincrement=True, primary_key=True),
+    Column("project_id", Text),
+    Column("username", Text),
+    Column("email", Text),
+    Column("project_link", Text),
+    Column("social_post_link", Text),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("updated_at", DateTime(timezone=True), server_default=func.now()),
+)
+Table(
+    "vote",
+    BASELINE,
+    Column("id_", Integer, autoincrement=True, primary_key=True),
+    Column("project_id", Text, nullable=False, index=True),
+    Column("item_id", Text, nullable=False, index=True),
+    Column("vote_count", Integer),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("updated_at", DateTime(timezone=True), server_default=func.now()),
+    UniqueConstraint("project_id", "item_id", name="uix_project_item"),
+)
+
+
+@pytest.fixture
+def engine(app):
+    engine = create_engine(get_config().get_db_url())
+    yield engine
+    engine.dispose()
+
+
+def head(db_url: str) -> str:
+    return ScriptDirectory.from_config(get_alembic_config(db_url)).get_current_head()
+
+
+def current(engine) -> set[str]:
+    with engine.connect() as conn:
+        return set(MigrationContext.configure(conn).get_current_heads())
+
+
+def test_migrations_match_models(engine):
+    """Test the shipped migrations produce exactly the schema of the ORM models."""
+    with engine.connect() as conn:
+        assert compare_metadata(MigrationContext.configure(conn), Base.metadata) == []
+
+
+def test_init_is_a_no_op_at_head(engine):
+    """Test init leaves an up to date database and the package directory untouched."""
+    db_url = get_config().get_db_url()
+    versions = sorted(Path(ALEMBIC_DIR, "versions").iterdir())
+
+    upgrade_in_place(db_url)
+    assert current(engine) == {head(db_url)}
+    assert sorted(Path(ALEMBIC_DIR, "versions").iterdir()) == versions
+
+
+def test_init_stamps_unversioned_database(engine):
+    """Test a database whose revision was regenerated by an older init is adopted."""
+    db_url = get_config().get_db_url()
+    # Older inits created the initial schema under a random revision id
+    alembic.command.downgrade(get_alembic_config(db_url), INITIAL_REVISION)
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE alembic_version SET version_num = 'a1b2c3d4e5f6'"))
+
+    upgrade_in_place(db_url)
+    assert current(engine) == {head(db_url)}
+
+
+def test_init_upgrades_baseline_database(engine):
+    """Test init brings a database created by the first, unversioned init to the models' schema."""
+    db_url = get_config().get_db_url()
+    with engine.begin() as conn:
+        conn.execute(text("DROP SCHEMA public CASCADE"))
+        conn.execute(text("CREATE SCHEMA public"))
+        BASELINE.create_all(conn)
+        # It recorded the schema under a random revision id
+        conn.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) PRIMARY KEY)"))
+        conn.execute(text("INSERT INTO alembic_version VALUES ('a1b2c3d4e5f6')"))
+        conn.execute(text("INSERT INTO vote (project_id, item_id, vote_count) VALUES ('p', 'i', 3)"))
+        conn.execute(
+            text(
+                "INSERT INTO leaderboard (leaderboard_id, project_id, name, score)"
+                " SELECT gen_random_uuid()::text, 'p', 'user', i FROM generate_series(1, 1000) AS i"
+            )
+        )
+
+    result = CliRunner().invoke(init)
+    assert result.exit_code == 0, result.output
+    assert current(engine) == {head(db_url)}
+    with engine.connect() as conn:
+        assert compare_metadata(MigrationContext.configure(conn), Base.metadata) == []
+        assert conn.execute(text("SELECT shard, vote_count FROM vote")).all() == [(0, 3)]
+        # The backfilled sketch is readable by the current one
+        data = conn.execute(text("SELECT data FROM leaderboard_sketch WHERE project_id = 'p'")).scalar_one()
+    sketch = KLLSketch.from_bytes(data)
+    assert sketch.n == 1000
+    assert abs(sketch.rank(500) - 499) <= 50
+
+
+def test_drop_truncates_all_tables(client, engine):
+    """Test drop empties every table and restarts id sequences."""
+    client.post("/api/v1/leaderboard/add", json={"name": "Test User", "score": 1, "project_id": "p"})
+
+    result = CliRunner().invoke(drop, ["--yes"])
+    assert result.exit_code == 0, result.output
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM leaderboard")).scalar_one() == 0
+        assert conn.execute(text("SELECT nextval(pg_get_serial_sequence('leaderboard', 'id_'))")).scalar_one() == 1
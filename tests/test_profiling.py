@@ -0,0 +1,46 @@
+from click.testing import CliRunner
+from sqlalchemy import text
+
+from mini_leaderboard.app import app as APP
+from mini_leaderboard.cli import profile
+from mini_leaderboard.config import get_config
+from mini_leaderboard.profiling import profile_endpoint, seed_project
+from mini_leaderboard.sketch import KLLSketch
+
+
+def test_profile(app, tmp_path, reset_engine, monkeypatch):
+    """Test the profile command seeds a project and reports allocations per request."""
+    monkeypatch.setenv("SKETCH_K", "50")
+    cprofile = tmp_path / "list.prof"
+    args = ["/api/v1/leaderboard/list", "--seed", "50", "--param", "page_size=20", "--requests", "5", "--warmup", "1"]
+    result = CliRunner().invoke(profile, [*args, "--cprofile", str(cprofile)])
+    assert result.exit_code == 0, result.output
+    assert "Requests: 5 (200: 5)" in result.output
+    assert "Peak allocation per request" in result.output
+    assert "Retained per request" in result.output
+    assert "function calls" in result.output
+    assert cprofile.stat().st_size > 0
+
+    # Seeded with the server's sketch size
+    with reset_engine.connect() as connection:
+        data = connection.execute(text("SELECT data FROM leaderboard_sketch")).scalar_one()
+    assert KLLSketch.from_bytes(data).k == 50
+
+
+async def test_profile_report(app):
+    """Test peak and retained allocations are measured and plausible."""
+    config = get_config()
+    seed_project(config.get_db_url(), "p", 100)
+    report = await profile_endpoint(
+        APP,
+        "GET",
+        "/api/v1/leaderboard/list",
+        params={"project_id": "p", "page_size": 100},
+        headers={"Authorization": f"Bearer {config.api_token}"} if config.api_token else None,
+        requests=5,
+        warmup=2,
+    )
+    assert report.status_codes == {200: 5}
+    # A page of 100 entries allocates at least its JSON, and little of it outlives the requests
+    assert 10_000 < report.mean_peak_bytes <= report.max_peak_bytes
+    assert report.retained_bytes / report.requests < report.mean_peak_bytes
@@ -0,0 +1,109 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+
+from mini_leaderboard.config import get_config
+from mini_leaderboard.ratelimit import RateLimiter, ReplayFilter, WriteLimiter
+from mini_leaderboard.routers.api.params import AddVoteParams
+
+
+def test_rate_limiter():
+    """Test token buckets refill over time and are tracked per key."""
+    limiter = RateLimiter(rate=1, burst=2)
+    assert limiter.take("a", now=0) == 0
+    assert limiter.take("a", now=0) == 0
+    assert limiter.take("a", now=0) == 1
+    assert limiter.take("b", now=0) == 0
+    assert limiter.take("a", now=1) == 0
+
+
+def test_rate_limiter_evicts_least_recently_used():
+    """Test the number of tracked keys is bounded."""
+    limiter = RateLimiter(rate=1, burst=1, max_keys=2)
+    for key in ["a", "b", "c"]:
+        assert limiter.take(key, now=0) == 0
+    # "a" was evicted and starts again with a full bucket
+    assert limiter.take("a", now=0) == 0
+    assert limiter.take("c", now=0) > 0
+
+
+def test_replay_filter():
+    """Test replays are detected within the window and forgotten after it."""
+    replays = ReplayFilter(window=10, capacity=1000)
+    assert not replays.seen("client-item", now=0)
+    replays.add("client-item", now=0)
+    assert replays.seen("client-item", now=5)
+    assert not replays.seen("other-item", now=5)
+    # Remembered for one more window after rotation
+    assert replays.seen("client-item", now=15)
+    assert not replays.seen("client-item", now=40)
+
+
+def test_vote_replay_rejected(monkeypatch, client):
+    """Test duplicate votes are rejected before reaching the database."""
+    monkeypatch.setenv("VOTE_DEDUP_WINDOW", "60")
+    params = AddVoteParams(project_id="test-project", item_id="test-item").model_dump()
+
+    response = client.post("/api/v1/vote/add", json=params)
+    assert response.status_code == 201
+    response = client.post("/api/v1/vote/add", json=params)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "60"
+
+    response = client.get("/api/v1/vote/count", params=params)
+    assert response.json()["vote_count"] == 1
+
+
+def test_concurrent_vote_replays_rejected(monkeypatch, client, case_id):
+    """Test replays sent while the first vote is still being written are rejected."""
+    monkeypatch.setenv("VOTE_DEDUP_WINDOW", "60")
+    params = AddVoteParams(project_id="test-project", item_id=case_id).model_dump()
+
+    with ThreadPoolExecutor(10) as executor:
+        responses = list(executor.map(lambda _: client.post("/api/v1/vote/add", json=params), range(10)))
+    assert sorted(response.status_code for response in responses) == [201] + [429] * 9
+
+    response = client.get("/api/v1/vote/count", params=params)
+    assert response.json()["vote_count"] == 1
+
+
+def test_votes_recorded_after_success(monkeypatch):
+    """Test a vote is held while in flight and only remembered once recorded, so failed votes can be retried."""
+    monkeypatch.setenv("VOTE_DEDUP_WINDOW", "60")
+    limiter = WriteLimiter(get_config())
+    assert limiter.check("client", "project", "item") is None
+    # In flight
+    assert limiter.check("client", "project", "item") == ("Duplicate vote", 60)
+    limiter.finish_vote("client", "project", "item", recorded=False)
+    assert limiter.check("client", "project", "item") is None
+
+    limiter.finish_vote("client", "project", "item", recorded=True)
+    assert limiter.check("client", "project", "item") == ("Duplicate vote", 60)
+    assert limiter.check("other", "project", "item") is None
+
+
+def test_vote_replay_by_trusted_header(monkeypatch, client):
+    """Test clients are told apart by the configured proxy header."""
+    monkeypatch.setenv("VOTE_DEDUP_WINDOW", "60")
+    monkeypatch.setenv("CLIENT_ID_HEADER", "X-Forwarded-For")
+    params = AddVoteParams(project_id="test-project", item_id="test-item").model_dump()
+
+    response = client.post("/api/v1/vote/add", json=params, headers={"X-Forwarded-For": "spoofed, 10.0.0.1"})
+    assert response.status_code == 201
+    response = client.post("/api/v1/vote/add", json=params, headers={"X-Forwarded-For": "10.0.0.2"})
+    assert response.status_code == 201
+    # Only the address the proxy appended counts
+    response = client.post("/api/v1/vote/add", json=params, headers={"X-Forwarded-For": "other, 10.0.0.1"})
+    assert response.status_code == 429
+
+
+def test_vote_replay_per_client_with_shared_token(monkeypatch, app):
+    """Test clients sharing API_TOKEN are still told apart by their address."""
+    monkeypatch.setenv("VOTE_DEDUP_WINDOW", "60")
+    monkeypatch.setenv("API_TOKEN", "shared-token")
+    params = AddVoteParams(project_id="test-project", item_id="test-item").model_dump()
+
+    for address, status_codes in [("10.0.0.1", [201, 429]), ("10.0.0.2", [201, 429])]:
+        with TestClient(app, headers={"Authorization": "Bearer shared-token"}, client=(address, 50000)) as client:
+            for status_code in status_codes:
+                assert client.post("/api/v1/vote/add", json=params).status_code == status_code
@@ -0,0 +1,45 @@
+import random
+
+from mini_leaderboard.sketch import KLLSketch
+
+
+def test_sketch_rank_error():
+    """Test ranks stay within the documented error and the sketch stays small."""
+    rng = random.Random(0)  # noqa: S311
+    values = [rng.randint(-(10**6), 10**6) for _ in range(100_000)]
+    sketch = KLLSketch.from_values(values)
+    assert sketch.n == len(values)
+    assert sketch._size < 3 * sketch.k
+
+    values.sort()
+    for probe in values[:: len(values) // 50]:
+        exact = sum(1 for value in values if value < probe)
+        assert abs(sketch.rank(probe) - exact) <= 0.017 * len(values)
+
+
+def test_sketch_merge_and_serialize():
+    """Test merged and deserialized sketches answer like the sketch of all values."""
+    left = KLLSketch.from_values(range(0, 50_000, 2))
+    right = KLLSketch.from_values(range(1, 50_000, 2))
+    left.merge(right)
+    assert left.n == 50_000
+    assert abs(left.rank(25_000) - 25_000) <= 0.017 * 50_000
+
+    restored = KLLSketch.from_bytes(left.to_bytes())
+    assert restored.n == left.n
+    assert [restored.rank(v) for v in range(0, 50_000, 1000)] == [left.rank(v) for v in range(0, 50_000, 1000)]
+
+    small = KLLSketch.from_values([5, 1, 3])
+    assert (small.rank(3), small.rank(3, inclusive=True)) == (1, 2)
+
+
+def test_sketch_quantile():
+    """Test quantiles are within the rank error."""
+    rng = random.Random(1)  # noqa: S311
+    values = sorted(rng.randint(0, 10**6) for _ in range(50_000))
+    sketch = KLLSketch.from_values(values)
+    for q in (0.01, 0.5, 0.99):
+        estimate = sketch.quantile(q)
+        assert abs(sum(1 for value in values if value < estimate) / len(values) - q) <= 0.017
+    assert KLLSketch().quantile(0.5) is None
+    assert KLLSketch.from_values([7]).quantile(0.99) == 7
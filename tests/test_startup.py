@@ -0,0 +1,63 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import mini_leaderboard
+
+# Cumulative import time of `mini_leaderboard.cli` in microseconds, about 0.25s when measured
+CLI_IMPORT_BUDGET_US = 1_000_000
+
+
+def import_times(module: str) -> dict[str, int]:
+    """Cumulative import time in microseconds of every module loaded by importing module"""
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_cli_import_is_cheap():
+    """Test the CLI entry point does not import the server or migration stack."""
+    times = import_times("mini_leaderboard.cli")
+    for heavy in ("uvicorn", "fastapi", "sqlalchemy", "alembic", "psycopg", "mini_leaderboard.app"):
+        assert heavy not in times, f"{heavy} is imported by mini_leaderboard.cli"
+    assert times["mini_leaderboard.cli"] < CLI_IMPORT_BUDGET_US
+
+
+@pytest.mark.parametrize("module", ["mini_leaderboard.app", "mini_leaderboard.dbutils"])
+def test_server_does_not_import_alembic(module):
+    """Test alembic is only imported by `init`."""
+    assert "alembic" not in import_times(module)
+
+
+def test_log_settings_from_dotenv(tmp_path):
+    """Test the log level and format are read from .env."""
+    (tmp_path / ".env").write_text("MINI_LEADERBOARD_LOG_LEVEL=WARNING\nMINI_LEADERBOARD_LOG_FORMAT=json\n")
+    env = {k: v for k, v in os.environ.items() if not k.startswith(("MINI_LEADERBOARD_LOG_", "LOGURU_"))}
+    env["PYTHONPATH"] = str(Path(mini_leaderboard.__file__).parents[1])
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "from mini_leaderboard import log; print(log.USER_DEFINED_LOG_LEVEL, log.USER_DEFINED_LOG_FORMAT)",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=tmp_path,
+        env=env,
+    )
+    assert result.stdout.split() == ["WARNING", "json"]
@@ -0,0 +1,48 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from mini_leaderboard.tracing import REQUEST_ID_HEADER
+
+
+def test_request_id(client):
+    """Test a request ID is generated or propagated."""
+    assert len(client.get("/").headers[REQUEST_ID_HEADER]) == 32
+    assert client.get("/", headers={REQUEST_ID_HEADER: "abc-123"}).headers[REQUEST_ID_HEADER] == "abc-123"
+    assert client.get("/", headers={REQUEST_ID_HEADER: "a b"}).headers[REQUEST_ID_HEADER] != "a b"
+
+
+def test_trace_spans(app, monkeypatch, tmp_path):
+    """Test a traced request exports a span tree down to the SQL statements."""
+    trace_file = tmp_path / "traces.jsonl"
+    # Set before startup so the engine is instrumented, spans are flushed on shutdown
+    monkeypatch.setenv("TRACE_EXPORT", str(trace_file))
+    with TestClient(app) as client:
+        client.post("/api/v1/messageboard/add", json={"name": "Test User", "message": "hi", "project_id": "p"})
+        response = client.get(
+            "/api/v1/messageboard/list", params={"project_id": "p"}, headers={REQUEST_ID_HEADER: "list-request"}
+        )
+        assert response.status_code == 200
+
+    spans = [json.loads(line) for line in trace_file.read_text().splitlines()]
+    root = next(span for span in spans if span["attributes"].get("request_id") == "list-request")
+    assert root["name"] == "GET /api/v1/messageboard/list"
+    assert root["attributes"]["status_code"] == 200
+
+    trace = {span["span_id"]: span for span in spans if span["trace_id"] == root["trace_id"]}
+    names = {span["name"] for span in trace.values()}
+    assert {"middleware verify_token", "route", "dependencies", "endpoint", "pool checkout", "sql", "commit"} <= names
+    assert "serialization" in names
+
+    sql = next(span for span in trace.values() if span["name"] == "sql")
+    assert "FROM messageboard" in sql["attributes"]["statement"]
+    ancestors = []
+    parent = sql["parent_id"]
+    while parent:
+        ancestors.append(trace[parent]["name"])
+        parent = trace[parent]["parent_id"]
+    assert ancestors[-1] == root["name"]
+    assert "endpoint" in ancestors
+    for span in trace.values():
+        assert span["start_ns"] <= span["end_ns"]
+        assert "unfinished" not in span["attributes"]
@@ -1,6 +1,10 @@
+import time
+
 import pytest
+from sqlalchemy import create_engine, text
 
-from mini_leaderboard.routers.api.params import AddVoteParams, VoteCountResponse, VoteListResponse
+from mini_leaderboard.config import get_config
+from mini_leaderboard.routers.api.params import AddVoteParams, VoteCountResponse, VoteCountsResponse, VoteListResponse
 
 
 @pytest.fixture
@@ -118,3 +122,124 @@ def test_list_votes_empty_project(client):
 
     vote_list = VoteListResponse.model_validate(response.json())
     assert len(vote_list.data) == 0  # Should have no items
+
+
+def test_list_votes_pagination(client, project_id):
+    """Test paging through votes ordered by item_id and by vote count."""
+    # item{i} gets i + 1 votes
+    for i in range(5):
+        for _ in range(i + 1):
+            response = client.post(
+                "/api/v1/vote/add",
+                json=AddVoteParams(project_id=project_id, item_id=f"item{i}").model_dump(),
+            )
+            assert response.status_code == 201
+
+    # Default order is by item_id
+    response = client.get("/api/v1/vote/list", params={"project_id": project_id, "page_size": 2})
+    assert response.status_code == 200
+    vote_list = VoteListResponse.model_validate(response.json())
+    assert [vote.item_id for vote in vote_list.data] == ["item0", "item1"]
+    assert vote_list.next_cursor == "item1"
+
+    # Walk the most voted items page by page
+    item_ids = []
+    cursor = None
+    while True:
+        params = {"project_id": project_id, "page_size": 2, "order": "votes_desc"}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/v1/vote/list", params=params)
+        assert response.status_code == 200
+        vote_list = VoteListResponse.model_validate(response.json())
+        item_ids.extend(vote.item_id for vote in vote_list.data)
+        cursor = vote_list.next_cursor
+        if cursor is None:
+            break
+    assert item_ids == ["item4", "item3", "item2", "item1", "item0"]
+
+
+def test_list_votes_top(client, project_id):
+    """Test the top-K shortcut."""
+    for item_id, votes in [("a", 1), ("b", 3), ("c", 2)]:
+        for _ in range(votes):
+            response = client.post(
+                "/api/v1/vote/add",
+                json=AddVoteParams(project_id=project_id, item_id=item_id).model_dump(),
+            )
+            assert response.status_code == 201
+
+    response = client.get("/api/v1/vote/list", params={"project_id": project_id, "top": 2})
+    assert response.status_code == 200
+    vote_list = VoteListResponse.model_validate(response.json())
+    assert [(vote.item_id, vote.vote_count) for vote in vote_list.data] == [("b", 3), ("c", 2)]
+    assert vote_list.next_cursor is None
+
+
+def test_get_vote_counts(client, project_id):
+    """Test getting vote counts for many items at once."""
+    for item_id in ["item1", "item1", "item2"]:
+        response = client.post(
+            "/api/v1/vote/add",
+            json=AddVoteParams(project_id=project_id, item_id=item_id).model_dump(),
+        )
+        assert response.status_code == 201
+
+    response = client.get(
+        "/api/v1/vote/counts",
+        params={"project_id": project_id, "item_id": ["item1", "item2", "nonexistent-item"]},
+    )
+    assert response.status_code == 200
+    assert VoteCountsResponse.model_validate(response.json()).vote_counts == {
+        "item1": 2,
+        "item2": 1,
+        "nonexistent-item": 0,
+    }
+
+
+@pytest.fixture
+def sharded(monkeypatch):
+    monkeypatch.setenv("VOTE_SHARDS", "4")
+    monkeypatch.setenv("VOTE_FOLD_INTERVAL", "0.1")
+
+
+def test_sharded_votes(sharded, client, project_id):
+    """Test that sharded counters are summed and folded back into one row."""
+    for _ in range(20):
+        response = client.post(
+            "/api/v1/vote/add",
+            json=AddVoteParams(project_id=project_id, item_id="hot-item").model_dump(),
+        )
+        assert response.status_code == 201
+    response = client.post(
+        "/api/v1/vote/add",
+        json=AddVoteParams(project_id=project_id, item_id="cold-item").model_dump(),
+    )
+    assert response.status_code == 201
+
+    response = client.get("/api/v1/vote/count", params={"project_id": project_id, "item_id": "hot-item"})
+    assert VoteCountResponse.model_validate(response.json()).vote_count == 20
+
+    response = client.get("/api/v1/vote/list", params={"project_id": project_id, "order": "votes_desc"})
+    vote_list = VoteListResponse.model_validate(response.json())
+    assert [(vote.item_id, vote.vote_count) for vote in vote_list.data] == [("hot-item", 20), ("cold-item", 1)]
+
+    engine = create_engine(get_config().get_db_url())
+    with engine.connect() as conn:
+        for _ in range(50):
+            unfolded = conn.execute(text("SELECT count(*) FROM vote WHERE shard > 0")).scalar_one()
+            if not unfolded:
+                break
+            time.sleep(0.1)
+        assert unfolded == 0
+        rows = conn.execute(
+            text("SELECT item_id, vote_count FROM vote WHERE project_id = :project_id ORDER BY item_id"),
+            {"project_id": project_id},
+        ).all()
+    engine.dispose()
+    assert [tuple(row) for row in rows] == [("cold-item", 1), ("hot-item", 20)]
+
+    response = client.get(
+        "/api/v1/vote/counts", params={"project_id": project_id, "item_id": ["hot-item", "cold-item"]}
+    )
+    assert VoteCountsResponse.model_validate(response.json()).vote_counts == {"hot-item": 20, "cold-item": 1}
@@ -0,0 +1,51 @@
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+from mini_leaderboard import warmup
+from mini_leaderboard.config import get_config
+from mini_leaderboard.dbutils import get_engine
+
+
+def wait_until_ready(client: TestClient, timeout: float = 10) -> None:
+    deadline = time.monotonic() + timeout
+    while client.get("/ready").status_code != 200:
+        assert time.monotonic() < deadline, "worker did not become ready"
+        time.sleep(0.01)
+
+
+def test_ready_without_warmup(client):
+    assert client.get("/ready").json() == {"ready": True}
+
+
+def test_warmup(app, monkeypatch):
+    """Test warm-up opens pooled connections and queries the hot projects before the worker is ready."""
+    monkeypatch.setenv("DB_WARMUP_CONNECTIONS", "3")
+    monkeypatch.setenv("WARMUP_PROJECT_IDS", "hot, other")
+    monkeypatch.setenv("QUERY_STATS", "true")
+    with TestClient(app) as client:
+        wait_until_ready(client)
+        config = get_config()
+        assert get_engine(config).sync_engine.pool.checkedin() == 3
+
+        stats = client.get("/api/v1/admin/queries").json()["queries"]
+        # First pages of 2 projects on 3 connections, until they are prepared
+        leaderboard = next(query for query in stats if "ORDER BY leaderboard.score DESC" in query["statement"])
+        assert leaderboard["count"] == 2 * 3 * (config.db_prepare_threshold + 1)
+
+
+def test_not_ready_while_warming_up(app, monkeypatch):
+    monkeypatch.setenv("WARMUP_PROJECT_IDS", "hot")
+    release = asyncio.Event()
+
+    async def slow_warm_up(config):
+        await release.wait()
+
+    monkeypatch.setattr(warmup, "warm_up", slow_warm_up)
+    with TestClient(app) as client:
+        assert client.get("/ready").status_code == 503
+        # Other routes are served meanwhile
+        assert client.get("/").status_code == 200
+        client.portal.call(release.set)
+        wait_until_ready(client)